@@ -16,6 +16,10 @@ from common.response.response_chema import (
 )
 from common.response.response_code import CustomResponseCode
 from core.mongo_db import MongoDB
+from utils.response_cache import cache_response, response_cache
+
+# Тег кэша ответов по коллекции users в MongoDB
+MONGO_USERS_CACHE_TAG = 'mongo_users'
 
 router = APIRouter()
 
@@ -25,6 +29,7 @@ router = APIRouter()
     summary='Получить все из MongoDB',
     description="Получаем данные из MongoDB в виде коллекции",
 )
+@cache_response(ttl=30, tags=(MONGO_USERS_CACHE_TAG,))
 async def get_all_from_mongo(db: MongoDB, filter: MongoPaginateSchema = Depends()) -> ResponseModel:
     """returns a set of documents belonging to page number `page_num`
     where size of each page is `page_size`.
@@ -62,6 +67,7 @@ async def create_in_mongo(db: MongoDB) -> ResponseModel:
         "password": "<PASSWORD>",
         "is_active": True,
     })
+    await response_cache.invalidate(MONGO_USERS_CACHE_TAG)
     result = db["users"].find_one(
         {"_id": user.inserted_id}
     )
@@ -75,6 +81,7 @@ async def create_in_mongo(db: MongoDB) -> ResponseModel:
     summary='Получить конкретную запись по id из MongoDB',
     description="Получаем данные из MongoDB в виде коллекции",
 )
+@cache_response(ttl=30, tags=(MONGO_USERS_CACHE_TAG,))
 async def get_by_id_from_mongo(id: int, db: MongoDB) -> ResponseModel:
     user = db["users"].find_one({"_id": id})
     if user is None:
@@ -102,6 +109,8 @@ async def update_by_id_from_mongo(
         update_result = db["users"].update_one(
             {"_id": id}, {"$set": data_dict}
         )
+        if update_result.modified_count:
+            await response_cache.invalidate(MONGO_USERS_CACHE_TAG)
 
         if update_result.modified_count == 0:
             return await response_base.fail(
@@ -129,6 +138,8 @@ async def delete_by_id_from_mongo(
     db: MongoDB
 ) -> ResponseModel:
     delete_result = db["users"].delete_one({"_id": id})
+    if delete_result.deleted_count:
+        await response_cache.invalidate(MONGO_USERS_CACHE_TAG)
 
     if delete_result.deleted_count == 0:
         return await response_base.fail(
@@ -4,11 +4,14 @@ from sqlalchemy.exc import IntegrityError
 from starlette import status
 from loguru import logger
 
+from api.permission.repository import PERMISSIONS_CACHE_TAG
 from api.permission.schemas import PermissionCreateSchema
 from api.permission.service import PermissionService
 from common.response.response_chema import ResponseModel, response_base
 from common.response.response_code import CustomResponseCode
-from core.db import get_db
+from core.db import get_db, get_db_read
+from utils.etag import etag_validator
+from utils.response_cache import cache_response
 from models.permission import Permission
 from middleware.auth_jwt_middleware import JWTBearer
 
@@ -18,17 +21,24 @@ router = APIRouter()
 @router.get(
     "/",
     summary="Get all permissions",
-    description="Get all permissions from database",
-    dependencies=[Depends(JWTBearer())],
+    description="Get all permissions from database. Supports If-None-Match",
+    dependencies=[
+        Depends(JWTBearer()),
+        Depends(etag_validator(PermissionService.get_permissions_version)),
+    ],
     responses={
         status.HTTP_200_OK: {
             "model": Permission,
             "description": "Permission form database",
         },
+        status.HTTP_304_NOT_MODIFIED: {
+            "description": "Permissions have not changed since the ETag from If-None-Match",
+        },
     },
 )
+@cache_response(ttl=60, tags=(PERMISSIONS_CACHE_TAG,))
 async def get_permissions(
-        db: AsyncSession = Depends(get_db)
+        db: AsyncSession = Depends(get_db_read)
 ) -> ResponseModel:
     try:
         permissions = await PermissionService.get_permissions(db)
@@ -51,9 +61,10 @@ async def get_permissions(
     description="Get permission by id",
     dependencies=[Depends(JWTBearer())],
 )
+@cache_response(ttl=60, tags=(PERMISSIONS_CACHE_TAG,))
 async def get_permission_by_id(
         permission_id: int,
-        db: AsyncSession = Depends(get_db)
+        db: AsyncSession = Depends(get_db_read)
 ) -> ResponseModel:
     try:
         permission = await PermissionService.get_permission_by_id(db, permission_id)
@@ -3,6 +3,11 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from models.permission import Permission
+from utils.etag import table_version
+from utils.response_cache import response_cache
+
+# Тег кэша ответов, которые зависят от таблицы permissions
+PERMISSIONS_CACHE_TAG = 'permissions'
 
 
 class PermissionRepository:
@@ -18,6 +23,17 @@ class PermissionRepository:
         result = await db.execute(query)
         return result.scalars().all()
 
+    """
+    Version of the permissions table for conditional GET
+
+    :param db: AsyncSession
+    :return: (count, last change time)
+    """
+    @staticmethod
+    async def get_permissions_version(db: AsyncSession) -> tuple:
+        result = await db.execute(select(*table_version(Permission)))
+        return tuple(result.one())
+
     """
     Get single permission by id
     
@@ -52,6 +68,7 @@ class PermissionRepository:
         permission = Permission(**data)
         db.add(permission)
         await db.commit()
+        await response_cache.invalidate(PERMISSIONS_CACHE_TAG)
         return permission
 
     @staticmethod
@@ -73,6 +90,7 @@ class PermissionRepository:
             return False
         await db.delete(obj)
         await db.commit()
+        await response_cache.invalidate(PERMISSIONS_CACHE_TAG)
         return True
 
 
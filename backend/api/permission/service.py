@@ -1,19 +1,27 @@
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import Request
 
 from api.permission.repository import permission_repository
 from api.permission.schemas import (
     PermissionSchema
 )
+from utils.singleflight import singleflight
 
 
 class PermissionService:
     @staticmethod
+    @singleflight()
     async def get_permissions(db: AsyncSession):
         permissions = await permission_repository.get_permissions(db)
         # return [Permission(permission) for permission in permissions]
         return [PermissionSchema(**permission.__dict__) for permission in permissions]
 
     @staticmethod
+    async def get_permissions_version(request: Request, db: AsyncSession) -> tuple:
+        return await permission_repository.get_permissions_version(db)
+
+    @staticmethod
+    @singleflight()
     async def get_permission_by_id(
             db: AsyncSession,
             permission_id: int
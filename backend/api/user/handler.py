@@ -9,26 +9,37 @@ from fastapi.params import Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
 from loguru import logger
 
+from api.permission.repository import PERMISSIONS_CACHE_TAG
 from api.user.schemas import (
     AuthSchemaBase,
     AuthSchemaCreate,
     AuthLoginSchema,
     PaginationSchema,
+    UserExportSchema,
+    UserImportSchema,
 )
 from api.user.service import (
     UserService,
+    USERS_CACHE_TAG,
     user_service
 )
 from common.response.response_chema import (
     response_base,
     ResponseModel
 )
+from common.exception.errors import PayloadTooLargeError, ServiceUnavailableError, TooManyRequestsError
 from common.response.response_code import CustomResponseCode
-from core.db import get_db
+from common.security.jwt_keys import jwt_keys
+from common.security.login_throttle import login_throttle
+from core.config import settings
+from core.db import get_db, get_db_read
 # from middleware.PermissionChecker import PermissionChecker
-from middleware.auth_jwt_middleware import JWTBearer
+from middleware.auth_jwt_middleware import JWTBearer, StaffJWTBearer
+from utils.etag import PRIVATE_CACHE_HEADERS, etag_validator
+from utils.response_cache import cache_response
 
 router = APIRouter()
 
@@ -52,6 +63,7 @@ router = APIRouter()
     ### ❌ **Возможные ошибки:**
     - **400**: Пользователь с таким email уже существует
     - **422**: Невалидные данные (неправильный формат email, слишком короткий пароль и т.д.)
+    - **503**: Очередь хэширования паролей переполнена, повторите запрос позже (заголовок Retry-After)
     """,
     responses={
         status.HTTP_201_CREATED: {
@@ -124,6 +136,8 @@ async def registration(
 ) -> ResponseModel:
     try:
         created_user = await UserService().registration(credentials, db)
+    except ServiceUnavailableError:
+        raise
     except HTTPException as e:
         logger.info(f"Registration error: {e}")
         return await response_base.fail(
@@ -160,7 +174,10 @@ async def registration(
     4. Сохранение токенов в Redis
     
     ### 🔒 **Безопасность:**
-    - Пароли хэшируются с использованием bcrypt
+    - Пароли хэшируются с использованием bcrypt в отдельном пуле процессов.
+      При переполненной очереди возвращается **503** с заголовком Retry-After
+    - Число попыток входа ограничено для email и для IP в скользящем окне.
+      Сверх лимита возвращается **429** с заголовком Retry-After, без обращения к БД и bcrypt
     - Токены подписываются секретным ключом
     - Поддержка отзыва токенов
     """,
@@ -195,11 +212,22 @@ async def registration(
                     }
                 }
             }
+        },
+        status.HTTP_429_TOO_MANY_REQUESTS: {
+            "description": "⏳ Слишком много попыток входа",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "detail": "Too many login attempts"
+                    }
+                }
+            }
         }
     },
     tags=["👤 Authentication"]
 )
 async def login(
+        request: Request,
         credentials: Annotated[AuthLoginSchema, Body(
             description="Учетные данные для входа",
             examples=[
@@ -216,13 +244,24 @@ async def login(
         db: AsyncSession = Depends(get_db)
 ) -> ResponseModel:
     try:
+        if settings.LOGIN_THROTTLE_ENABLED:
+            await login_throttle.check(credentials.email, request.client.host if request.client else None)
+
         result = await UserService().login(credentials, db)
 
+        if settings.LOGIN_THROTTLE_ENABLED:
+            await login_throttle.reset(credentials.email)
         logger.info(f"Login successful for user: {credentials.email}")
         return await response_base.success(
             res=CustomResponseCode.HTTP_200,
-            data=result.model_dump()
+            data=result
         )
+    except ServiceUnavailableError:
+        logger.warning(f"Login rejected, password hashing is overloaded: {credentials.email}")
+        raise
+    except TooManyRequestsError:
+        logger.warning(f"Login throttled: {credentials.email}")
+        raise
     except HTTPException as e:
         logger.error(f"Login error: {e}")
         return await response_base.fail(
@@ -250,6 +289,9 @@ async def login(
     ### 🛡️ **Безопасность:**
     - Эндпоинт защищен JWT авторизацией
     - Пользователь может получить только свой профиль
+    
+    ### ♻️ **Кэширование:**
+    - Ответ содержит `ETag`, с `If-None-Match` вернется 304 без тела, если профиль не менялся
     """,
     responses={
         status.HTTP_200_OK: {
@@ -272,6 +314,9 @@ async def login(
                 }
             }
         },
+        status.HTTP_304_NOT_MODIFIED: {
+            "description": "♻️ Профиль не изменился с ETag из If-None-Match"
+        },
         status.HTTP_401_UNAUTHORIZED: {
             "description": "🚫 Не авторизован - отсутствует или невалидный токен",
             "content": {
@@ -283,19 +328,24 @@ async def login(
             }
         }
     },
-    dependencies=[Depends(JWTBearer())],
+    dependencies=[
+        Depends(JWTBearer()),
+        Depends(etag_validator(UserService.get_me_version, private=True)),
+    ],
     tags=["👥 Users"]
 )
 async def me(
         request: Request,
-        db: AsyncSession = Depends(get_db)
+        db: AsyncSession = Depends(get_db_read)
 ) -> ResponseModel:
     try:
         user = await UserService.me(request.state.user_id, db)
-        return await response_base.success(
+        response = await response_base.success(
             res=CustomResponseCode.HTTP_200,
             data=user
         )
+        response.headers.update(PRIVATE_CACHE_HEADERS)
+        return response
     except HTTPException as e:
         return await response_base.fail(
             res=CustomResponseCode.HTTP_400,
@@ -371,7 +421,10 @@ async def logout(
     Возвращает постраничный список всех зарегистрированных пользователей.
     
     ### 📄 **Пагинация:**
-    - **page**: Номер страницы (от 1 до 1000, по умолчанию: 1)
+    - **cursor**: Курсор keyset-пагинации. Передайте пустое значение (`?cursor=`) для первой страницы,
+      затем `next_cursor` / `prev_cursor` из ответа. Ответ: `{"items": [...], "next_cursor": ..., "prev_cursor": ...}`
+    - **page**: Номер страницы (от 1 до 1000, по умолчанию: 1). Устаревший режим LIMIT/OFFSET
+      без `cursor`, оставлен для обратной совместимости
     - **limit**: Количество пользователей на страницу (от 1 до 100, по умолчанию: 10)
     
     ### 📊 **Возвращаемые данные:**
@@ -383,6 +436,9 @@ async def logout(
     - Административные панели
     - Списки участников
     - Аналитика и отчеты
+    
+    ### ♻️ **Кэширование:**
+    - Ответ содержит `ETag`, повторный запрос с `If-None-Match` вернет 304 без тела, если данные не менялись
     """,
     responses={
         status.HTTP_200_OK: {
@@ -400,7 +456,8 @@ async def logout(
                                 "created_time": "2024-01-15T10:30:00+03:00",
                                 "updated_time": None,
                                 "is_superuser": False,
-                                "is_staff": False
+                                "is_staff": False,
+                                "permissions": ["read"]
                             },
                             {
                                 "id": 2,
@@ -409,13 +466,17 @@ async def logout(
                                 "created_time": "2024-01-16T14:22:00+03:00",
                                 "updated_time": "2024-01-16T16:45:00+03:00",
                                 "is_superuser": False,
-                                "is_staff": True
+                                "is_staff": True,
+                                "permissions": []
                             }
                         ]
                     }
                 }
             }
         },
+        status.HTTP_304_NOT_MODIFIED: {
+            "description": "♻️ Список не изменился с ETag из If-None-Match"
+        },
         status.HTTP_422_UNPROCESSABLE_ENTITY: {
             "description": "🚫 Невалидные параметры пагинации",
             "content": {
@@ -434,12 +495,38 @@ async def logout(
             }
         }
     },
+    dependencies=[Depends(etag_validator(UserService.get_users_version))],
     tags=["👥 Users"]
 )
+@cache_response(ttl=30, tags=(USERS_CACHE_TAG, PERMISSIONS_CACHE_TAG))
 async def get_users(
         pagination: Annotated[PaginationSchema, Depends()],
-        db: AsyncSession = Depends(get_db)
+        db: AsyncSession = Depends(get_db_read)
 ) -> ResponseModel:
+    if pagination.cursor is not None:
+        try:
+            page = await UserService().get_users_by_cursor(
+                db,
+                pagination.limit,
+                pagination.cursor,
+            )
+            logger.info(f"Retrieved {len(page.items)} users by cursor, limit: {pagination.limit}")
+            return await response_base.success(
+                res=CustomResponseCode.HTTP_200,
+                data=page
+            )
+        except ValueError as e:
+            return await response_base.fail(
+                res=CustomResponseCode.HTTP_400,
+                data=f"Failed to retrieve users: {e}"
+            )
+        except Exception as e:
+            logger.error(f"Error retrieving users by cursor: {e}")
+            return await response_base.fail(
+                res=CustomResponseCode.HTTP_500,
+                data=f"Failed to retrieve users: {e}"
+            )
+
     try:
         users = await UserService().get_all_users(
             db,
@@ -459,6 +546,160 @@ async def get_users(
         )
 
 
+@router.get(
+    "/export",
+    summary="📤 Потоковая выгрузка пользователей",
+    description="""
+    ## 🎯 **Выгрузка всей таблицы пользователей с разрешениями**
+    
+    Отдает всех пользователей одним потоком в формате NDJSON (по объекту на строку) или CSV.
+    
+    ### ⚙️ **Параметры:**
+    - **format**: `ndjson` (по умолчанию) или `csv`
+    - **chunk_size**: Размер пачки чтения из БД (от 100 до 10000, по умолчанию: 1000)
+    
+    ### 🚀 **Производительность:**
+    - Чтение серверным курсором, потребление памяти не зависит от размера таблицы
+    - Разрешения загружаются одним запросом на пачку пользователей
+    
+    ### 🔒 **Доступ:**
+    - Только суперпользователь или сотрудник (is_superuser / is_staff)
+    """,
+    responses={
+        status.HTTP_200_OK: {
+            "description": "✅ Поток пользователей",
+            "content": {
+                "application/x-ndjson": {
+                    "example": '{"id":1,"email":"john.doe@company.com","username":"john_doe","is_superuser":false,'
+                               '"is_staff":false,"created_time":"2024-01-15T10:30:00+03:00","updated_time":null,'
+                               '"permissions":["read"]}'
+                },
+                "text/csv": {
+                    "example": "id,email,username,is_superuser,is_staff,created_time,updated_time,permissions"
+                },
+            }
+        },
+        status.HTTP_403_FORBIDDEN: {
+            "description": "🚫 Нет прав суперпользователя или сотрудника",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "detail": "Superuser or staff privileges required"
+                    }
+                }
+            }
+        },
+    },
+    dependencies=[Depends(StaffJWTBearer())],
+    tags=["👥 Users"]
+)
+async def export_users(
+        export: Annotated[UserExportSchema, Depends()],
+) -> StreamingResponse:
+    media_type = 'text/csv' if export.format == 'csv' else 'application/x-ndjson'
+    logger.info(f"Users export started, format: {export.format}, chunk_size: {export.chunk_size}")
+    return StreamingResponse(
+        UserService.export_users(export.format, export.chunk_size),
+        media_type=media_type,
+        headers={'Content-Disposition': f'attachment; filename="users.{export.format}"'},
+    )
+
+
+@router.post(
+    "/import",
+    summary="📥 Массовый импорт пользователей",
+    description="""
+    ## 🎯 **Импорт большого количества пользователей одним запросом**
+    
+    Тело запроса читается потоком: NDJSON (`{"email": ..., "password": ..., "username": ...}` на строку)
+    или CSV с заголовком `email,password,username`.
+    
+    ### 🚀 **Производительность:**
+    - Пароли пачки хэшируются параллельно
+    - Запись пачками через `INSERT ... ON CONFLICT DO NOTHING RETURNING`
+    
+    ### 📊 **Отчет:**
+    - **inserted**: Сколько пользователей создано
+    - **conflicts**: Строки с уже существующим email или username
+    - **errors**: Невалидные строки и строки, которые отклонила БД
+    - **rows_per_second**: Скорость импорта
+    
+    Пачки фиксируются по мере чтения: **inserted** - число уже записанных строк.
+    Строка длиннее `USER_IMPORT_MAX_LINE_BYTES` прерывает импорт с ответом 413.
+    
+    ### 🔒 **Доступ:**
+    - Только суперпользователь или сотрудник (is_superuser / is_staff)
+    - Поля привилегий в строках игнорируются, пользователи создаются без них
+    """,
+    responses={
+        status.HTTP_200_OK: {
+            "description": "✅ Импорт завершен",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "code": 200,
+                        "msg": "OK",
+                        "data": {
+                            "total": 3,
+                            "inserted": 1,
+                            "conflicts_count": 1,
+                            "errors_count": 1,
+                            "conflicts": [
+                                {"line": 2, "email": "john.doe@company.com", "reason": "User with this email or username already exists"}
+                            ],
+                            "errors": [
+                                {"line": 3, "email": "bad", "reason": "email: value is not a valid email address"}
+                            ],
+                            "elapsed_seconds": 0.412,
+                            "rows_per_second": 7.3
+                        }
+                    }
+                }
+            }
+        },
+        status.HTTP_403_FORBIDDEN: {
+            "description": "🚫 Нет прав суперпользователя или сотрудника",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "detail": "Superuser or staff privileges required"
+                    }
+                }
+            }
+        },
+        status.HTTP_413_REQUEST_ENTITY_TOO_LARGE: {
+            "description": "🚫 Строка длиннее USER_IMPORT_MAX_LINE_BYTES, предыдущие пачки уже записаны"
+        },
+    },
+    dependencies=[Depends(StaffJWTBearer())],
+    tags=["👥 Users"]
+)
+async def import_users(
+        request: Request,
+        params: Annotated[UserImportSchema, Depends()],
+        db: AsyncSession = Depends(get_db)
+) -> ResponseModel:
+    try:
+        result = await UserService.bulk_import(request.stream(), params.format, db)
+    except PayloadTooLargeError as e:
+        logger.warning(f"Users import rejected: {e.detail}")
+        raise
+    except Exception as e:
+        logger.error(f"Users import error: {e}")
+        return await response_base.fail(
+            res=CustomResponseCode.HTTP_500,
+            data=f"Failed to import users: {e}"
+        )
+    logger.info(
+        f"Users import finished: {result.inserted}/{result.total} inserted, "
+        f"{result.conflicts_count} conflicts, {result.errors_count} errors, {result.rows_per_second} rows/s"
+    )
+    return await response_base.success(
+        res=CustomResponseCode.HTTP_200,
+        data=result
+    )
+
+
 @router.post(
     "/token/refresh",
     summary="🔄 Обновление токенов",
@@ -540,7 +781,7 @@ async def token_refresh(
         logger.info(f"Token refreshed successfully for user: {request.state.user_id}")
         return await response_base.success(
             res=CustomResponseCode.HTTP_200,
-            data=result.model_dump()
+            data=result
         )
     except HTTPException as e:
         logger.error(f"Token refresh error: {e}")
@@ -551,3 +792,48 @@ async def token_refresh(
             res=CustomResponseCode.HTTP_400,
             data=f"Token refresh failed: {e}"
         )
+
+
+@router.get(
+    "/jwks.json",
+    summary="🔑 Открытые ключи подписи токенов",
+    description="""
+    ## 🎯 **JSON Web Key Set**
+    
+    Открытые ключи, которыми другие сервисы проверяют access токены локально, без Redis и общего секрета.
+    Токен указывает свой ключ в заголовке `kid`.
+    
+    ### ⚙️ **Ротация:**
+    - Новые токены подписываются ключом `JWT_SIGNING_KID`
+    - Ключи из `JWT_PUBLIC_KEYS` публикуются, пока живут подписанные ими токены
+    - При алгоритме HS256 список ключей пуст
+    """,
+    responses={
+        status.HTTP_200_OK: {
+            "description": "✅ Набор ключей",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "keys": [
+                            {
+                                "kty": "OKP",
+                                "crv": "Ed25519",
+                                "x": "11qYAYKxCrfVS_7TyWQHOg7hcvPapiMlrwIaaPcHURo",
+                                "kid": "2024-01",
+                                "alg": "EdDSA",
+                                "use": "sig"
+                            }
+                        ]
+                    }
+                }
+            }
+        },
+    },
+    tags=["👤 Authentication"]
+)
+async def jwks() -> Response:
+    return Response(
+        content=jwt_keys.jwks(),
+        media_type='application/json',
+        headers={'Cache-Control': f'public, max-age={settings.JWKS_CACHE_SECONDS}'},
+    )
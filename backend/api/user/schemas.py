@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Annotated
+from typing import Annotated, Literal
 
 from pydantic import EmailStr, Field, validator
 
@@ -121,6 +121,11 @@ class PaginationSchema(SchemaBase):
     """📄 Схема пагинации для постраничного вывода"""
     page: Annotated[int, Field(ge=1, le=1000)] = 1
     limit: Annotated[int, Field(ge=1, le=100)] = 10
+    cursor: Annotated[str | None, Field(
+        max_length=200,
+        description="Курсор keyset-пагинации. Пустое значение - первая страница, "
+                    "далее next_cursor / prev_cursor из предыдущего ответа. Если задан, page игнорируется"
+    )] = None
 
     @validator('page')
     def validate_page(cls, v):
@@ -133,3 +138,52 @@ class PaginationSchema(SchemaBase):
         if v < 1:
             raise ValueError('Limit must be greater than 0')
         return v
+
+
+class UserListItemSchema(SchemaBase):
+    """👥 Пользователь в списке: без пароля и токенов, разрешения - по имени"""
+    id: int
+    email: str
+    username: str
+    is_superuser: bool
+    is_staff: bool
+    created_time: datetime | None = None
+    updated_time: datetime | None = None
+    permissions: list[str] = []
+
+
+class CursorPageSchema(SchemaBase):
+    """📄 Страница keyset-пагинации"""
+    items: list[UserListItemSchema]
+    next_cursor: str | None = None
+    prev_cursor: str | None = None
+
+
+class UserExportSchema(SchemaBase):
+    """📤 Параметры потоковой выгрузки пользователей"""
+    format: Literal['ndjson', 'csv'] = 'ndjson'
+    chunk_size: Annotated[int, Field(ge=100, le=10000)] = 1000
+
+
+class UserImportSchema(SchemaBase):
+    """📥 Параметры массового импорта пользователей"""
+    format: Literal['ndjson', 'csv'] = 'ndjson'
+
+
+class ImportRowIssueSchema(SchemaBase):
+    """⚠️ Строка импорта, которая не была записана"""
+    line: int
+    email: str | None = None
+    reason: str
+
+
+class UserImportResultSchema(SchemaBase):
+    """📥 Итог массового импорта пользователей"""
+    total: int = 0
+    inserted: int = 0
+    conflicts_count: int = 0
+    errors_count: int = 0
+    conflicts: list[ImportRowIssueSchema] = []
+    errors: list[ImportRowIssueSchema] = []
+    elapsed_seconds: float = 0.0
+    rows_per_second: float = 0.0
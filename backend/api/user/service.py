@@ -1,6 +1,19 @@
+import asyncio
+import codecs
+import csv
+import io
+import time
+from collections import defaultdict
+from collections.abc import AsyncIterator
+from typing import Literal
+
+import msgspec
 from fastapi import HTTPException
+from pydantic import ValidationError
 
-from sqlalchemy import select
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from starlette.requests import Request
@@ -11,21 +24,135 @@ from api.user.schemas import (
     AuthLoginSchema,
     MeSchema,
     GetLoginToken,
-    GetNewToken
+    GetNewToken,
+    CursorPageSchema,
+    ImportRowIssueSchema,
+    UserImportResultSchema,
+    UserListItemSchema
 )
 from common.security.jwt import (
     get_hash_password,
+    get_hash_passwords,
     password_verify,
-    create_access_token_redis,
-    create_refresh_token_redis,
-    get_token,
+    create_token_pair_redis,
+    rotate_token_pair_redis,
     decode_jwt,
-    decode_refresh_jwt
+    decode_refresh_jwt,
+    revoke_user_tokens
 )
-from common.exception.errors import TokenError
+from common.exception.errors import PayloadTooLargeError, ServiceUnavailableError, TokenError
+from common.log import log
+from common.security.password import password_needs_rehash
 from core.config import settings
-from core.db_redis import redis_client
+from core.db import async_db_session, get_read_session_maker
+from models.permission import Permission
 from models.user import User
+from models.user_permission import UserPermission
+from utils.cursor import decode_cursor, encode_cursor
+from utils.etag import table_version
+from utils.response_cache import response_cache
+from utils.timezone import timezone
+
+
+async def _iter_lines(stream: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[str]:
+    """
+    Строки потока с переводом строки на конце. Байты декодируются инкрементально,
+    поэтому UTF-8 символ на границе чанков не портится
+
+    :raises PayloadTooLargeError: строка длиннее max_line_bytes
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    buffer = b''
+    line_no = 0
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            line_no += 1
+            if len(line) > max_line_bytes:
+                raise PayloadTooLargeError(msg=f'Line {line_no} is longer than {max_line_bytes} bytes')
+            yield decoder.decode(line + b'\n')
+        if len(buffer) > max_line_bytes:
+            raise PayloadTooLargeError(msg=f'Line {line_no + 1} is longer than {max_line_bytes} bytes')
+    tail = decoder.decode(buffer, final=True)
+    if tail:
+        yield tail
+
+
+async def _iter_csv_records(lines: AsyncIterator[str], max_line_bytes: int) -> AsyncIterator[tuple[int, list[str]]]:
+    """
+    Записи CSV: (номер первой строки, значения).
+
+    Поле в кавычках может содержать перевод строки, поэтому физические строки
+    копятся, пока число кавычек в записи не станет четным (экранированная
+    кавычка "" не меняет четность), и только потом разбираются csv.reader.
+    """
+    record: list[str] = []
+    record_size = 0
+    quotes = 0
+    line_no = start = 0
+    async for line in lines:
+        line_no += 1
+        if not record:
+            start = line_no
+        record.append(line)
+        record_size += len(line)
+        quotes += line.count('"')
+        if quotes % 2:
+            if record_size > max_line_bytes:
+                raise PayloadTooLargeError(msg=f'Record at line {start} is longer than {max_line_bytes} bytes')
+            continue
+        yield start, next(csv.reader(record), [])
+        record, record_size, quotes = [], 0, 0
+    if record:
+        yield start, next(csv.reader(record), [])
+
+
+async def _iter_import_rows(
+        stream: AsyncIterator[bytes],
+        import_format: Literal['ndjson', 'csv'],
+) -> AsyncIterator[tuple[int, dict | str]]:
+    """
+    Строки тела импорта: (номер строки, данные) или (номер строки, текст ошибки)
+
+    :raises PayloadTooLargeError: строка или запись CSV длиннее USER_IMPORT_MAX_LINE_BYTES
+    """
+    max_line_bytes = settings.USER_IMPORT_MAX_LINE_BYTES
+    lines = _iter_lines(stream, max_line_bytes)
+    if import_format == 'csv':
+        header = None
+        async for line_no, values in _iter_csv_records(lines, max_line_bytes):
+            if not any(value.strip() for value in values):
+                continue
+            if header is None:
+                header = [value.strip() for value in values]
+                continue
+            yield line_no, dict(zip(header, values))
+        return
+
+    line_no = 0
+    async for line in lines:
+        line_no += 1
+        if not line.strip():
+            continue
+        try:
+            row = msgspec.json.decode(line)
+        except msgspec.DecodeError as e:
+            yield line_no, f'Invalid JSON: {e}'
+            continue
+        yield line_no, row if isinstance(row, dict) else 'Row must be a JSON object'
+
+
+EXPORT_FIELDS = ('id', 'email', 'username', 'is_superuser', 'is_staff', 'created_time', 'updated_time', 'permissions')
+
+
+# Тег кэша ответов, которые зависят от таблицы users
+USERS_CACHE_TAG = 'users'
+# Из строк импорта читаются только учетные данные: is_superuser, is_staff и прочие поля отбрасываются
+IMPORT_FIELDS = ('email', 'password', 'username')
+
+# Ссылки на фоновые задачи, чтобы их не собрал GC до завершения
+_background_tasks: set[asyncio.Task] = set()
 
 
 class UserService:
@@ -49,6 +176,7 @@ class UserService:
         )
         db.add(user)
         await db.commit()
+        await response_cache.invalidate(USERS_CACHE_TAG)
         return AuthSchemaCreatedNewUser(
             id=user.id,
             email=user.email,
@@ -57,6 +185,130 @@ class UserService:
             updated_time=user.updated_time,
         )
 
+    @staticmethod
+    async def bulk_import(
+            stream: AsyncIterator[bytes],
+            import_format: Literal['ndjson', 'csv'],
+            db: AsyncSession
+    ) -> UserImportResultSchema:
+        """
+        Массовый импорт пользователей из потока NDJSON или CSV (email, password, username).
+
+        Строки пишутся пачками по USER_IMPORT_BATCH_SIZE одним
+        INSERT ... ON CONFLICT DO NOTHING RETURNING, пароли пачки хэшируются параллельно.
+        Существующие email / username попадают в conflicts, невалидные строки - в errors.
+        Каждая пачка фиксируется отдельно, inserted - число зафиксированных строк.
+        Поля кроме IMPORT_FIELDS игнорируются: импорт не выдает привилегий.
+
+        :param stream: тело запроса
+        :param import_format:
+        :param db:
+        :return:
+        :raises PayloadTooLargeError: строка длиннее USER_IMPORT_MAX_LINE_BYTES,
+            пачки до нее уже зафиксированы (их число - в тексте ошибки)
+        """
+        started = time.perf_counter()
+        report = UserImportResultSchema()
+        batch: list[tuple[int, AuthSchemaBase]] = []
+
+        try:
+            async for line_no, row in _iter_import_rows(stream, import_format):
+                report.total += 1
+                if isinstance(row, str):
+                    UserService._report_issue(report, 'errors', line_no, None, row)
+                    continue
+                try:
+                    credentials = AuthSchemaBase(**{field: row[field] for field in IMPORT_FIELDS if field in row})
+                except ValidationError as e:
+                    error = e.errors()[0]
+                    reason = f"{'.'.join(str(loc) for loc in error['loc'])}: {error['msg']}"
+                    UserService._report_issue(report, 'errors', line_no, row.get('email'), reason)
+                    continue
+                batch.append((line_no, credentials))
+                if len(batch) >= settings.USER_IMPORT_BATCH_SIZE:
+                    await UserService._import_batch(batch, report, db)
+                    batch = []
+        except PayloadTooLargeError as e:
+            raise PayloadTooLargeError(msg=f'{e.detail}, {report.inserted} users were imported before it')
+        if batch:
+            await UserService._import_batch(batch, report, db)
+
+        report.elapsed_seconds = round(time.perf_counter() - started, 3)
+        if report.elapsed_seconds:
+            report.rows_per_second = round(report.total / report.elapsed_seconds, 1)
+        return report
+
+    @staticmethod
+    async def _insert_users(rows: list[dict], db: AsyncSession) -> set[str]:
+        query = insert(User).values(rows).on_conflict_do_nothing().returning(User.email)
+        result = await db.execute(query)
+        inserted = set(result.scalars().all())
+        await db.commit()
+        return inserted
+
+    @staticmethod
+    async def _import_batch(
+            batch: list[tuple[int, AuthSchemaBase]],
+            report: UserImportResultSchema,
+            db: AsyncSession
+    ) -> None:
+        password_hashes = await get_hash_passwords([credentials.password for _, credentials in batch])
+        now = timezone.now()
+        rows = [
+            {
+                'email': credentials.email,
+                'username': credentials.username,
+                'password': password_hash,
+                'refresh_token': None,
+                'created_time': now,
+            }
+            for (_, credentials), password_hash in zip(batch, password_hashes)
+        ]
+        failed: set[int] = set()
+        try:
+            inserted = await UserService._insert_users(rows, db)
+        except SQLAlchemyError as e:
+            # Пачку отклонила БД (например, слишком длинное значение): повторяем
+            # по строке, чтобы записать остальные и назвать виноватые
+            await db.rollback()
+            log.warning('Users import batch failed, retrying row by row: {}', e)
+            inserted = set()
+            for (line_no, credentials), row in zip(batch, rows):
+                try:
+                    inserted |= await UserService._insert_users([row], db)
+                except SQLAlchemyError as row_error:
+                    await db.rollback()
+                    reason = str(getattr(row_error, 'orig', row_error)).splitlines()[0]
+                    UserService._report_issue(report, 'errors', line_no, credentials.email, reason)
+                    failed.add(line_no)
+        if inserted:
+            await response_cache.invalidate(USERS_CACHE_TAG)
+
+        for line_no, credentials in batch:
+            if line_no in failed:
+                continue
+            if credentials.email in inserted:
+                # Дубликаты внутри пачки: вставлена только первая строка с этим email
+                inserted.remove(credentials.email)
+                report.inserted += 1
+            else:
+                UserService._report_issue(
+                    report, 'conflicts', line_no, credentials.email, 'User with this email or username already exists'
+                )
+
+    @staticmethod
+    def _report_issue(
+            report: UserImportResultSchema,
+            kind: Literal['conflicts', 'errors'],
+            line: int,
+            email: str | None,
+            reason: str
+    ) -> None:
+        setattr(report, f'{kind}_count', getattr(report, f'{kind}_count') + 1)
+        issues = getattr(report, kind)
+        if len(issues) < settings.USER_IMPORT_MAX_REPORTED_ROWS:
+            issues.append(ImportRowIssueSchema(line=line, email=email if isinstance(email, str) else None, reason=reason))
+
     @staticmethod
     async def get_user_by_email(
             email: str,
@@ -74,7 +326,7 @@ class UserService:
             db: AsyncSession,
             limit: int = 10,
             page: int = 1,
-    ):
+    ) -> list[UserListItemSchema]:
         skip = (page - 1) * limit
         query = (
             select(User)
@@ -82,8 +334,149 @@ class UserService:
             .options(selectinload(User.permissions))
         ).limit(limit).offset(skip)
         result = await db.execute(query)
-        users = result.scalars().all()
-        return users
+        return [UserService.to_list_item(user) for user in result.scalars().all()]
+
+    @staticmethod
+    def to_list_item(user: User) -> UserListItemSchema:
+        """
+        Схема пользователя для списка. Разрешения должны быть загружены заранее (selectinload)
+
+        :param user:
+        :return:
+        """
+        return UserListItemSchema(
+            id=user.id,
+            email=user.email,
+            username=user.username,
+            is_superuser=user.is_superuser,
+            is_staff=user.is_staff,
+            created_time=user.created_time,
+            updated_time=user.updated_time,
+            permissions=[permission.name for permission in user.permissions],
+        )
+
+    @staticmethod
+    async def get_users_by_cursor(
+            db: AsyncSession,
+            limit: int = 10,
+            cursor: str | None = None,
+    ) -> CursorPageSchema:
+        """
+        Keyset-пагинация по User.id (от новых к старым).
+
+        Каждая страница - диапазон по первичному ключу, поэтому стоимость не
+        зависит от глубины, а вставка новых пользователей не сдвигает страницы.
+
+        :param db:
+        :param limit:
+        :param cursor: токен из next_cursor / prev_cursor, пустой - первая страница
+        :return: страница схем, а не ORM объектов: сессия закрывается раньше сериализации ответа
+        :raises ValueError: поврежденный курсор
+        """
+        position = decode_cursor(cursor) if cursor else {}
+        after_id = position.get('after_id')
+        before_id = position.get('before_id')
+        for value in (after_id, before_id):
+            # bool - подкласс int, но id им не бывает
+            if value is not None and (not isinstance(value, int) or isinstance(value, bool)):
+                raise ValueError('Invalid cursor')
+
+        query = select(User).options(selectinload(User.permissions)).limit(limit + 1)
+        if before_id is not None:
+            # Назад: берем ближайшие более новые записи и разворачиваем
+            query = query.where(User.id > before_id).order_by(User.id.asc())
+        else:
+            query = query.order_by(User.id.desc())
+            if after_id is not None:
+                query = query.where(User.id < after_id)
+
+        result = await db.execute(query)
+        users = list(result.scalars().all())
+        has_more = len(users) > limit
+        users = users[:limit]
+        if before_id is not None:
+            users.reverse()
+
+        next_cursor = prev_cursor = None
+        if users:
+            if has_more or before_id is not None:
+                next_cursor = encode_cursor(after_id=users[-1].id)
+            if after_id is not None or (before_id is not None and has_more):
+                prev_cursor = encode_cursor(before_id=users[0].id)
+        return CursorPageSchema(
+            items=[UserService.to_list_item(user) for user in users],
+            next_cursor=next_cursor,
+            prev_cursor=prev_cursor,
+        )
+
+    @staticmethod
+    async def export_users(
+            export_format: Literal['ndjson', 'csv'] = 'ndjson',
+            chunk_size: int = 1000,
+    ) -> AsyncIterator[bytes]:
+        """
+        Потоковая выгрузка всех пользователей с их разрешениями.
+
+        Пользователи читаются серверным курсором по chunk_size строк, разрешения
+        догружаются одним запросом на пачку, поэтому память не растет с размером таблицы.
+        Сессия открывается внутри генератора: зависимость get_db закрывается раньше,
+        чем StreamingResponse начнет отдавать тело.
+
+        :param export_format: ndjson или csv
+        :param chunk_size: размер пачки (yield_per)
+        :return:
+        """
+        session_maker = await get_read_session_maker()
+        async with session_maker() as session:
+            if export_format == 'csv':
+                yield UserService._export_csv_chunk([EXPORT_FIELDS])
+
+            result = await session.stream_scalars(
+                select(User).order_by(User.id).execution_options(yield_per=chunk_size)
+            )
+            async for users in result.partitions():
+                permissions = await UserService._get_permission_names([user.id for user in users], session)
+                rows = [
+                    {
+                        'id': user.id,
+                        'email': user.email,
+                        'username': user.username,
+                        'is_superuser': user.is_superuser,
+                        'is_staff': user.is_staff,
+                        'created_time': user.created_time,
+                        'updated_time': user.updated_time,
+                        'permissions': permissions.get(user.id, []),
+                    }
+                    for user in users
+                ]
+                # Объекты пачки больше не нужны, не держим их в identity map
+                session.expunge_all()
+
+                if export_format == 'csv':
+                    yield UserService._export_csv_chunk(
+                        [[*(row[field] for field in EXPORT_FIELDS[:-1]), '|'.join(row['permissions'])] for row in rows]
+                    )
+                else:
+                    yield b''.join(msgspec.json.encode(row) + b'\n' for row in rows)
+
+    @staticmethod
+    async def _get_permission_names(user_ids: list[int], db: AsyncSession) -> dict[int, list[str]]:
+        query = (
+            select(UserPermission.user_id, Permission.name)
+            .join(Permission, Permission.id == UserPermission.permission_id)
+            .where(UserPermission.user_id.in_(user_ids))
+        )
+        result = await db.execute(query)
+        permissions = defaultdict(list)
+        for user_id, name in result:
+            permissions[user_id].append(name)
+        return permissions
+
+    @staticmethod
+    def _export_csv_chunk(rows: list) -> bytes:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue().encode()
 
     @staticmethod
     async def login(
@@ -99,8 +492,14 @@ class UserService:
         if not is_verify_password:
             raise HTTPException(status_code=400, detail="Incorrect password")
 
-        access_token, access_token_expire_time = await create_access_token_redis(str(user.id))
-        refresh_token, refresh_token_expire_time = await create_refresh_token_redis(str(user.id))
+        if password_needs_rehash(user.password):
+            task = asyncio.create_task(UserService.rehash_password(user.id, credentials.password, user.password))
+            _background_tasks.add(task)
+            task.add_done_callback(_background_tasks.discard)
+
+        access_token, access_token_expire_time, refresh_token, refresh_token_expire_time = (
+            await create_token_pair_redis(str(user.id))
+        )
         # todo await user_dao.update_login_time(db, obj.username) need create method for last login
         # todo await db.refresh(current_user)
         return GetLoginToken(
@@ -110,13 +509,38 @@ class UserService:
             refresh_token_expire_time=refresh_token_expire_time,
         )
 
+    @staticmethod
+    async def rehash_password(user_id: int, password: str, old_hash: str) -> None:
+        """
+        Перехэшировать пароль текущими параметрами после успешного входа.
+        Выполняется в фоне со своей сессией, ответ на вход его не ждет.
+
+        :param user_id:
+        :param password: проверенный пароль
+        :param old_hash: хэш, с которым пароль проверялся
+        :return:
+        """
+        try:
+            new_hash = await get_hash_password(password)
+            async with async_db_session() as session:
+                # Если пароль успели сменить, новый хэш не записывается
+                result = await session.execute(
+                    update(User)
+                    .where(User.id == user_id, User.password == old_hash)
+                    .values(password=new_hash)
+                )
+                await session.commit()
+            if result.rowcount:
+                await response_cache.invalidate(USERS_CACHE_TAG)
+        except ServiceUnavailableError:
+            # Пул хэширования перегружен, перехэширование повторится при следующем входе
+            pass
+        except Exception as e:
+            log.error('Password rehash for user {} failed: {}', user_id, e)
+
     @staticmethod
     async def logout(*, request: Request) -> None:
-        prefix = f'{settings.TOKEN_REDIS_PREFIX}:{request.state.user_id}:'
-        refresh_tokens = f'{settings.TOKEN_REFRESH_REDIS_PREFIX}:{request.state.user_id}:*'
-        await redis_client.delete_prefix(prefix)
-        for key in redis_client.scan_iter(refresh_tokens):
-            redis_client.delete(key)
+        await revoke_user_tokens(request.state.user_id)
 
     @staticmethod
     async def get_user_by_id(
@@ -134,6 +558,35 @@ class UserService:
             return None
         return user
 
+    @staticmethod
+    async def get_me_version(request: Request, db: AsyncSession) -> tuple:
+        """
+        Версия профиля текущего пользователя для conditional GET /me
+
+        :param request: request.state.user_id выставлен JWTBearer
+        :param db:
+        :return: id пользователя входит в версию: у пользователей одной пачки импорта
+            одинаковые created_time, и без id их версии совпали бы
+        """
+        result = await db.execute(select(*table_version(User, User.id == request.state.user_id)))
+        return request.state.user_id, *result.one()
+
+    @staticmethod
+    async def get_users_version(request: Request, db: AsyncSession) -> tuple:
+        """
+        Версия списка пользователей вместе с их разрешениями для conditional GET /users
+
+        :param request:
+        :param db:
+        :return:
+        """
+        result = await db.execute(select(
+            *table_version(User),
+            *table_version(UserPermission),
+            *table_version(Permission),
+        ))
+        return tuple(result.one())
+
     @staticmethod
     async def me(user_id: int, db: AsyncSession) -> MeSchema:
         user = await UserService.get_user_by_id(user_id, db)
@@ -150,43 +603,28 @@ class UserService:
             refresh_token: str,
             db: AsyncSession
     ) -> GetNewToken:
-        # Валидация refresh токена
+        # Валидация подписи и срока refresh токена, наличие в Redis проверяется при ротации
         try:
-            # Декодируем refresh токен
             decoded_refresh = await decode_refresh_jwt(refresh_token)
-            if not decoded_refresh:
-                raise HTTPException(status_code=400, detail="Invalid or expired refresh token")
-            
-            # Получаем user_id из refresh токена
-            refresh_user_id = decoded_refresh.get("user_id")
-            if not refresh_user_id:
-                raise HTTPException(status_code=400, detail="Invalid refresh token structure")
-            
-            # Проверяем что токен есть в Redis
-            redis_refresh_key = f'{settings.TOKEN_REFRESH_REDIS_PREFIX}:{refresh_user_id}:{refresh_token}'
-            redis_refresh_token = redis_client.get(redis_refresh_key)
-            if not redis_refresh_token or redis_refresh_token != refresh_token:
-                raise HTTPException(status_code=400, detail="Refresh token not found or invalid")
-                
-        except TokenError:
-            raise HTTPException(status_code=400, detail="Invalid refresh token")
         except Exception:
             raise HTTPException(status_code=400, detail="Invalid refresh token")
-        
+        if not decoded_refresh or not decoded_refresh.get("user_id"):
+            raise HTTPException(status_code=400, detail="Invalid refresh token structure")
+        if str(decoded_refresh["user_id"]) != str(request.state.user_id):
+            raise HTTPException(status_code=400, detail="Refresh token belongs to another user")
+
         user = await UserService.get_user_by_id(request.state.user_id, db)
         if user is None:
             raise HTTPException(status_code=404, detail=f"User with id {request.state.user_id} not found")
-            
-        old_token = await get_token(request)
-        
-        # Создаем новые токены только после успешной валидации
-        new_access_token, new_access_token_expire_time = await create_access_token_redis(str(user.id))
-        new_refresh_token, new_refresh_token_expire_time = await create_refresh_token_redis(
-            str(user.id),
-            old_token,
-            refresh_token
-        )
-        
+
+        # Старая пара удаляется и новая сохраняется одним Lua скриптом
+        try:
+            new_access_token, new_access_token_expire_time, new_refresh_token, new_refresh_token_expire_time = (
+                await rotate_token_pair_redis(str(user.id), refresh_token)
+            )
+        except TokenError:
+            raise HTTPException(status_code=400, detail="Refresh token not found or invalid")
+
         data = GetNewToken(
             access_token=new_access_token,
             access_token_expire_time=new_access_token_expire_time,
@@ -73,3 +73,31 @@ class TokenError(HTTPError):
 
     def __init__(self, *, msg: str = 'Not Authenticated', headers: dict[str, Any] | None = None):
         super().__init__(code=self.code, msg=msg, headers=headers or {'WWW-Authenticate': 'Bearer'})
+
+
+class ServiceUnavailableError(HTTPError):
+    code = StandardResponseCode.HTTP_503
+
+    def __init__(self, *, msg: str = 'Service Unavailable', retry_after: int = 1, headers: dict[str, Any] | None = None):
+        super().__init__(code=self.code, msg=msg, headers=headers or {'Retry-After': str(retry_after)})
+
+
+class TooManyRequestsError(HTTPError):
+    code = StandardResponseCode.HTTP_429
+
+    def __init__(self, *, msg: str = 'Too Many Requests', retry_after: int = 1, headers: dict[str, Any] | None = None):
+        super().__init__(code=self.code, msg=msg, headers=headers or {'Retry-After': str(retry_after)})
+
+
+class PayloadTooLargeError(HTTPError):
+    code = StandardResponseCode.HTTP_413
+
+    def __init__(self, *, msg: str = 'Payload Too Large', headers: dict[str, Any] | None = None):
+        super().__init__(code=self.code, msg=msg, headers=headers)
+
+
+class NotModifiedError(HTTPError):
+    code = StandardResponseCode.HTTP_304
+
+    def __init__(self, *, etag: str, headers: dict[str, Any] | None = None):
+        super().__init__(code=self.code, headers=headers or {'ETag': etag})
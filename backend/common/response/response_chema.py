@@ -8,11 +8,11 @@ from pydantic import BaseModel, ConfigDict
 
 from common.response.response_code import CustomResponse, CustomResponseCode
 from core.config import settings
-from utils.serializer import MsgSpecJSONResponse
+from utils.serializer import MsgSpecJSONResponse, orm_payload
 
 _ExcludeData = set[int | str] | dict[int | str, Any]
 
-__all__ = ['ResponseModel', 'response_base']
+__all__ = ['ResponseModel', 'ApiResponse', 'response_base']
 
 
 class ResponseModel(BaseModel):
@@ -35,7 +35,8 @@ class ResponseModel(BaseModel):
             return ResponseModel(code=res.code, msg=res.msg, data={'test': 'test'})
     """
 
-    # TODO: json_encoders 配置失效: https://github.com/tiangolo/fastapi/discussions/10252
+    # json_encoders не применяются FastAPI: https://github.com/tiangolo/fastapi/discussions/10252
+    # Поэтому response_base отдает ApiResponse, которую кодирует msgspec, а модель описывает схему ответа
     model_config = ConfigDict(json_encoders={datetime: lambda x: x.strftime(settings.DATETIME_FORMAT)})
 
     code: int = CustomResponseCode.HTTP_200.code
@@ -43,6 +44,22 @@ class ResponseModel(BaseModel):
     data: Any | None = None
 
 
+class ApiResponse(MsgSpecJSONResponse):
+    """
+    Ответ response_base.
+
+    Возвращается из обработчика как есть: FastAPI не валидирует его по response_model
+    и не прогоняет через jsonable_encoder, data кодируется msgspec напрямую
+    (pydantic схемы и ORM объекты через enc_hook).
+    """
+
+    def __init__(self, *, code: int, msg: str, data: Any | None = None, **kwargs):
+        self.code = code
+        self.msg = msg
+        self.data = data
+        super().__init__({'code': code, 'msg': msg, 'data': orm_payload(data)}, **kwargs)
+
+
 class ResponseBase:
     """
     E.g. ::
@@ -52,20 +69,20 @@ class ResponseBase:
     """
 
     @staticmethod
-    async def __response(*, res: CustomResponseCode | CustomResponse = None, data: Any | None = None) -> ResponseModel:
+    async def __response(*, res: CustomResponseCode | CustomResponse = None, data: Any | None = None) -> ApiResponse:
         """
         :param res:
         :param data:
         :return:
         """
-        return ResponseModel(code=res.code, msg=res.msg, data=data)
+        return ApiResponse(code=res.code, msg=res.msg, data=data)
 
     async def success(
         self,
         *,
         res: CustomResponseCode | CustomResponse = CustomResponseCode.HTTP_200,
         data: Any | None = None,
-    ) -> ResponseModel:
+    ) -> ApiResponse:
         return await self.__response(res=res, data=data)
 
     async def fail(
@@ -73,7 +90,7 @@ class ResponseBase:
         *,
         res: CustomResponseCode | CustomResponse = CustomResponseCode.HTTP_400,
         data: Any = None,
-    ) -> ResponseModel:
+    ) -> ApiResponse:
         return await self.__response(res=res, data=data)
 
     @staticmethod
@@ -1,5 +1,12 @@
+from datetime import datetime
+
 from pydantic import BaseModel, ConfigDict
 
+from core.config import settings
+
 
 class SchemaBase(BaseModel):
-    model_config = ConfigDict(use_enum_values=True)
+    model_config = ConfigDict(
+        use_enum_values=True,
+        json_encoders={datetime: lambda x: x.strftime(settings.DATETIME_FORMAT)},
+    )
@@ -0,0 +1,108 @@
+"""
+Подбор параметров хэширования паролей под бюджет времени на этом железе.
+
+    python -m common.security.calibrate --scheme bcrypt --target-ms 250
+
+Выводит строки для .env: самые дорогие параметры, при которых медиана
+одного хэша укладывается в бюджет.
+"""
+import argparse
+import statistics
+import time
+
+from passlib.hash import argon2, bcrypt
+
+from core.config import settings
+
+SAMPLE_PASSWORD = 'calibration-Passw0rd'
+
+
+def measure_ms(handler, samples: int) -> float:
+    """
+    Медиана времени одного хэша, мс
+
+    :param handler: passlib handler с уже заданными параметрами
+    :param samples:
+    :return:
+    """
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        handler.hash(SAMPLE_PASSWORD)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def calibrate_bcrypt(target_ms: float, samples: int) -> dict[str, int | float]:
+    """
+    Каждый следующий rounds вдвое дороже, перебор останавливается на превышении бюджета
+
+    :param target_ms:
+    :param samples:
+    :return:
+    """
+    best = {'PASSWORD_BCRYPT_ROUNDS': 10, 'measured_ms': measure_ms(bcrypt.using(rounds=10), samples)}
+    for rounds in range(11, 18):
+        elapsed = measure_ms(bcrypt.using(rounds=rounds), samples)
+        if elapsed > target_ms:
+            break
+        best = {'PASSWORD_BCRYPT_ROUNDS': rounds, 'measured_ms': elapsed}
+    return best
+
+
+def calibrate_argon2(target_ms: float, samples: int, memory_cost: int, parallelism: int) -> dict[str, int | float]:
+    """
+    Память фиксирована (или уменьшается, если не укладывается даже time_cost=1), подбирается time_cost
+
+    :param target_ms:
+    :param samples:
+    :param memory_cost: КиБ
+    :param parallelism:
+    :return:
+    """
+    while True:
+        best = None
+        for time_cost in range(1, 11):
+            handler = argon2.using(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism)
+            elapsed = measure_ms(handler, samples)
+            if elapsed > target_ms:
+                break
+            best = {
+                'PASSWORD_ARGON2_TIME_COST': time_cost,
+                'PASSWORD_ARGON2_MEMORY_COST': memory_cost,
+                'PASSWORD_ARGON2_PARALLELISM': parallelism,
+                'measured_ms': elapsed,
+            }
+        if best is not None or memory_cost <= 8 * parallelism:
+            return best or {
+                'PASSWORD_ARGON2_TIME_COST': 1,
+                'PASSWORD_ARGON2_MEMORY_COST': memory_cost,
+                'PASSWORD_ARGON2_PARALLELISM': parallelism,
+                'measured_ms': elapsed,
+            }
+        memory_cost //= 2
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description='Calibrate password hash parameters')
+    parser.add_argument('--scheme', choices=['bcrypt', 'argon2'], default=settings.PASSWORD_HASH_SCHEME)
+    parser.add_argument('--target-ms', type=float, default=settings.PASSWORD_HASH_TARGET_MS)
+    parser.add_argument('--samples', type=int, default=5)
+    parser.add_argument('--memory-cost', type=int, default=settings.PASSWORD_ARGON2_MEMORY_COST)
+    parser.add_argument('--parallelism', type=int, default=settings.PASSWORD_ARGON2_PARALLELISM)
+    args = parser.parse_args(argv)
+
+    if args.scheme == 'bcrypt':
+        result = calibrate_bcrypt(args.target_ms, args.samples)
+    else:
+        result = calibrate_argon2(args.target_ms, args.samples, args.memory_cost, args.parallelism)
+
+    measured_ms = result.pop('measured_ms')
+    print(f'# {args.scheme}: {measured_ms:.1f} ms per hash, target {args.target_ms:.0f} ms')
+    print(f"PASSWORD_HASH_SCHEME='{args.scheme}'")
+    for name, value in result.items():
+        print(f'{name}={value}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,79 +1,212 @@
 # JWT authorizes dependency injection
+import secrets
 import time
-from datetime import datetime, timedelta
+from datetime import timedelta
 from typing import Dict
 
 from fastapi.security.utils import get_authorization_scheme_param
 from starlette.requests import Request
 
 import jwt
-from passlib.context import CryptContext
+import msgspec
 
 from fastapi import Depends
 from fastapi.security import HTTPBearer
 
 from common.exception.errors import TokenError
+from common.security.password import (
+    hash_password,
+    password_hash_pool,
+    verify_password
+)
+from common.security.jwt_keys import jwt_keys
+from common.security.token_cache import session_generations, token_cache
 from core.config import settings
 from core.db_redis import redis_client
+from core.redis_pubsub import redis_pubsub
 from utils.timezone import timezone
 
-pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
-
 DependsJwtAuth = Depends(HTTPBearer())
 
+# В Redis хранится только факт существования refresh токена, сам токен не нужен
+TOKEN_REDIS_VALUE = '1'
+
+# Claim "typ": access и refresh токены подписываются одним ключом и иначе неотличимы
+ACCESS_TOKEN_TYPE = 'access'
+REFRESH_TOKEN_TYPE = 'refresh'
+
+# Отзывает все сессии пользователя одной атомарной операцией: увеличивает поколение
+# (access токены с меньшим gen перестают приниматься) и удаляет refresh токены по индексу.
+# Ключи берутся из индекса, а не из KEYS: скрипт рассчитан на один экземпляр Redis.
+# KEYS: индекс, поколение. Возвращает новое поколение.
+REVOKE_USER_TOKENS_LUA = """
+local keys = redis.call('ZRANGE', KEYS[1], 0, -1)
+for i = 1, #keys, 1000 do
+    redis.call('DEL', unpack(keys, i, math.min(i + 999, #keys)))
+end
+redis.call('DEL', KEYS[1])
+return redis.call('INCR', KEYS[2])
+"""
+revoke_user_tokens_script = redis_client.register_script(REVOKE_USER_TOKENS_LUA)
+
+# Атомарная ротация refresh токена.
+# KEYS: старый refresh, новый refresh, индекс, маркер ротации
+# ARGV: значение refresh, ttl refresh, now, ttl индекса, окно повторного использования, новая пара (json)
+# Возвращает {1} - ротация выполнена, {0, пара} - токен уже обменян параллельным запросом, {-1} - токен невалиден
+ROTATE_REFRESH_TOKEN_LUA = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    local rotated = redis.call('GET', KEYS[4])
+    if rotated then
+        return {0, rotated}
+    end
+    return {-1}
+end
+local now = tonumber(ARGV[3])
+redis.call('DEL', KEYS[1])
+redis.call('ZREM', KEYS[3], KEYS[1])
+redis.call('SET', KEYS[2], ARGV[1], 'EX', ARGV[2])
+redis.call('ZADD', KEYS[3], now + tonumber(ARGV[2]), KEYS[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[3], '-inf', now)
+redis.call('EXPIRE', KEYS[3], ARGV[4])
+if tonumber(ARGV[5]) > 0 then
+    redis.call('SET', KEYS[4], ARGV[6], 'EX', ARGV[5])
+end
+return {1}
+"""
+rotate_refresh_token_script = redis_client.register_script(ROTATE_REFRESH_TOKEN_LUA)
+
+
+def new_jti() -> str:
+    """Short random JWT ID, used as the Redis key of the refresh token instead of the token itself"""
+    return secrets.token_urlsafe(settings.TOKEN_JTI_BYTES)
+
+
+def get_token_jti(token: str, token_type: str | None = None) -> str:
+    """
+    Get jti of a token signed by this service
+
+    :param token:
+    :param token_type: expected "typ" claim, any type if None
+    :return:
+    :raises TokenError: bad signature, token without jti or of another type
+    """
+    try:
+        payload = jwt_keys.decode(token)
+        if token_type is not None and payload.get("typ") != token_type:
+            raise TokenError(msg='Token error')
+        return payload["jti"]
+    except (jwt.PyJWTError, KeyError):
+        raise TokenError(msg='Token error')
+
+
+def session_generation_key(sub: str | int) -> str:
+    return f'{settings.TOKEN_GENERATION_REDIS_PREFIX}:{sub}'
+
+
+async def get_session_generation(sub: str | int) -> int:
+    """
+    Current session generation of the user, from the worker cache or Redis
+
+    :param sub:
+    :return:
+    """
+    generation = session_generations.get(sub)
+    if generation is None:
+        generation = int(await redis_client.get(session_generation_key(sub)) or 0)
+        session_generations.put(sub, generation)
+    return generation
+
 
-async def sign_jwt(user_id: int) -> Dict[str, str]:
+async def sign_jwt(user_id: int, gen: int = 0) -> Dict[str, str]:
     payload = {
         "user_id": user_id,
+        "jti": new_jti(),
+        "gen": gen,
+        "typ": ACCESS_TOKEN_TYPE,
         "expires": time.time() + int(settings.TOKEN_TIME_EXPIRES)
     }
-    token = jwt.encode(payload, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
+    token = jwt_keys.encode(payload)
 
     token_info = dict()
     token_info["access_token"] = token
     token_info["token_type"] = 'Bearer'
     token_info["user_id"] = user_id
+    token_info["jti"] = payload["jti"]
     token_info["expires"] = timezone.datetime_to_format(timezone.now() + timedelta(seconds=settings.TOKEN_TIME_EXPIRES))
 
     return token_info
 
 
-async def create_jwt_refresh_token(user_id: int) -> Dict[str, str]:
+async def create_jwt_refresh_token(user_id: int, gen: int = 0) -> Dict[str, str]:
     payload = {
         "user_id": user_id,
+        "jti": new_jti(),
+        "gen": gen,
+        "typ": REFRESH_TOKEN_TYPE,
         "expires": time.time() + int(settings.TOKEN_REFRESH_EXPIRE_SECONDS)
     }
-    token = jwt.encode(payload, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
+    token = jwt_keys.encode(payload)
 
     token_info = dict()
     token_info["refresh_token"] = token
     token_info["token_type"] = 'Bearer'
     token_info["user_id"] = user_id
+    token_info["jti"] = payload["jti"]
     token_info["expires"] = timezone.datetime_to_format(timezone.now() + timedelta(seconds=settings.TOKEN_REFRESH_EXPIRE_SECONDS))
 
     return token_info
 
 
 async def decode_jwt(token: str) -> dict:
+    """
+    Decode access token and check that its session generation is not revoked.
+
+    Verified tokens are kept in the worker's token_cache and generations in
+    session_generations, so the usual request does not touch Redis at all.
+    Refresh tokens are rejected by their "typ" claim.
+    """
     try:
-        decoded_token = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
-        token_from_redis = redis_client.get(f'{settings.TOKEN_REDIS_PREFIX}:{decoded_token["user_id"]}:{token}')
-        if token_from_redis is None:
-            raise TokenError("Invalid authentication token")
-        return decoded_token if decoded_token["expires"] >= time.time() else None
+        decoded_token = token_cache.get(token)
+        if decoded_token is None:
+            decoded_token = jwt_keys.decode(token)
+            if decoded_token.get("typ") != ACCESS_TOKEN_TYPE or decoded_token["expires"] < time.time():
+                return None
+            token_cache.put(token, decoded_token)
+        if decoded_token.get("gen", 0) < await get_session_generation(decoded_token["user_id"]):
+            raise TokenError("Session revoked")
+        return decoded_token
     except Exception as e:
         return {}
 
 
+def decode_jwt_stateless(token: str) -> dict:
+    """
+    Verify access token signature and expiry locally, without Redis.
+
+    Revocation (logout) is not visible here, so a token stays usable
+    until it expires; keep TOKEN_TIME_EXPIRES short when this mode is used.
+    Refresh tokens are rejected by their "typ" claim.
+    """
+    try:
+        decoded_token = jwt_keys.decode(token)
+        if decoded_token.get("typ") != ACCESS_TOKEN_TYPE:
+            return {}
+        return decoded_token if decoded_token["expires"] >= time.time() else {}
+    except Exception:
+        return {}
+
+
 async def decode_refresh_jwt(token: str) -> dict:
     """
     Decode refresh token without Redis validation
     
     :param token: The refresh token to decode
-    :return: Decoded token payload or empty dict if invalid
+    :return: Decoded token payload or empty dict if invalid or not a refresh token
     """
     try:
-        decoded_token = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
+        decoded_token = jwt_keys.decode(token)
+        if decoded_token.get("typ") != REFRESH_TOKEN_TYPE:
+            return {}
         return decoded_token if decoded_token["expires"] >= time.time() else {}
     except Exception as e:
         return {}
@@ -86,7 +219,17 @@ async def get_hash_password(password: str) -> str:
     :param password:
     :return:
     """
-    return pwd_context.hash(password)
+    return await password_hash_pool.run(hash_password, password)
+
+
+async def get_hash_passwords(passwords: list[str]) -> list[str]:
+    """
+    Hash several passwords in parallel in the password hash pool
+
+    :param passwords:
+    :return: hashes in the same order
+    """
+    return await password_hash_pool.run_many(hash_password, [(password,) for password in passwords])
 
 
 async def password_verify(plain_password: str, hashed_password: str) -> bool:
@@ -97,67 +240,119 @@ async def password_verify(plain_password: str, hashed_password: str) -> bool:
     :param hashed_password: The hash ciphers to compare
     :return:
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    return await password_hash_pool.run(verify_password, plain_password, hashed_password)
+
 
+def token_index_key(sub: str | int) -> str:
+    """Sorted set of the user's refresh token keys scored by expiry time"""
+    return f'{settings.TOKEN_INDEX_REDIS_PREFIX}:{sub}'
 
-async def create_access_token_redis(sub: str, expires_delta: timedelta | None = None, **kwargs) -> tuple[str, str]:
+
+def refresh_token_key(sub: str | int, jti: str) -> str:
+    return f'{settings.TOKEN_REFRESH_REDIS_PREFIX}:{sub}:{jti}'
+
+
+async def store_tokens_redis(sub: str | int, *tokens: tuple[str, int]) -> None:
     """
-    Generate encryption token
+    Save token keys and add them to the user's token index in one round trip
 
-    :param sub: The subject/userid of the JWT
-    :param expires_delta: Increased expiry time
+    :param sub:
+    :param tokens: (key, ttl)
     :return:
     """
-    token_info = await sign_jwt(user_id=int(sub))
-    key = f'{settings.TOKEN_REDIS_PREFIX}:{sub}:{token_info["access_token"]}'
-    redis_client.setex(key, settings.TOKEN_TIME_EXPIRES, token_info["access_token"])
-    return token_info["access_token"], token_info["expires"]
+    now = time.time()
+    index_key = token_index_key(sub)
+    async with redis_client.pipeline(transaction=True) as pipe:
+        for key, ttl in tokens:
+            pipe.setex(key, ttl, TOKEN_REDIS_VALUE)
+            pipe.zadd(index_key, {key: now + ttl})
+        pipe.zremrangebyscore(index_key, '-inf', now)
+        pipe.expire(index_key, max(settings.TOKEN_REFRESH_EXPIRE_SECONDS, *(ttl for _, ttl in tokens)))
+        await pipe.execute()
+
 
+async def delete_tokens_redis(sub: str | int, *keys: str) -> None:
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.delete(*keys)
+        pipe.zrem(token_index_key(sub), *keys)
+        await pipe.execute()
 
-async def create_refresh_token_redis(
-    sub: str,
-    token: str | None = None,
-    refresh_token: str | None = None
-) -> tuple[str, str]:
+
+async def revoke_user_tokens(sub: str | int) -> int:
     """
-    Generate refresh token
+    Revoke all sessions of the user ("log out everywhere", password change).
 
-    :param sub: The subject/userid of the JWT
-    :param expire_time: expiry time
-    :return:
+    One Redis write bumps the session generation and drops refresh tokens;
+    the new generation is broadcast so every worker rejects older access tokens.
+
+    :param sub:
+    :return: new session generation
     """
-    token_info = await create_jwt_refresh_token(user_id=int(sub))
+    generation = int(await revoke_user_tokens_script(keys=[token_index_key(sub), session_generation_key(sub)]))
+    session_generations.put(sub, generation)
+    await redis_pubsub.publish(settings.TOKEN_INVALIDATION_CHANNEL, f'gen:{sub}:{generation}')
+    return generation
 
-    if refresh_token is not None and token is not None:
-        token_key = f'{settings.TOKEN_REDIS_PREFIX}:{sub}:{token}'
-        refresh_token_key = f'{settings.TOKEN_REFRESH_REDIS_PREFIX}:{sub}:{refresh_token}'
-        redis_client.delete(token_key)
-        redis_client.delete(refresh_token_key)
 
-    key = f'{settings.TOKEN_REFRESH_REDIS_PREFIX}:{sub}:{token_info["refresh_token"]}'
-    redis_client.setex(key, settings.TOKEN_REFRESH_EXPIRE_SECONDS, token_info["refresh_token"])
-    return token_info["refresh_token"], token_info["expires"]
+async def create_token_pair_redis(sub: str) -> tuple[str, str, str, str]:
+    """
+    Generate access and refresh tokens, only the refresh token is saved in Redis
+
+    :param sub: The subject/userid of the JWT
+    :return: access token, access expire time, refresh token, refresh expire time
+    """
+    gen = await get_session_generation(sub)
+    access_info = await sign_jwt(user_id=int(sub), gen=gen)
+    refresh_info = await create_jwt_refresh_token(user_id=int(sub), gen=gen)
+    await store_tokens_redis(sub, (refresh_token_key(sub, refresh_info["jti"]), settings.TOKEN_REFRESH_EXPIRE_SECONDS))
+    return access_info["access_token"], access_info["expires"], refresh_info["refresh_token"], refresh_info["expires"]
 
 
-async def create_new_token(sub: str, token: str, refresh_token: str, **kwargs) -> tuple[str, str, datetime, datetime]:
+async def rotate_token_pair_redis(sub: str, refresh_token: str) -> tuple[str, str, str, str]:
     """
-    Generate new token
+    Exchange a refresh token for a new token pair atomically, in one round trip.
 
-    :param sub:
-    :param token
-    :param refresh_token:
-    :return:
+    The old refresh token works exactly once. Concurrent refreshes with the same
+    token within TOKEN_REFRESH_REUSE_SECONDS get the pair issued by the first one.
+    The old access token stays valid until it expires.
+
+    :param sub: The subject/userid of the JWT
+    :param refresh_token: current refresh token
+    :return: access token, access expire time, refresh token, refresh expire time
+    :raises TokenError: refresh token is unknown, revoked, already used or not a refresh token
     """
-    redis_refresh_token = await redis_client.get(f'{settings.TOKEN_REFRESH_REDIS_PREFIX}:{sub}:{refresh_token}')
-    if not redis_refresh_token or redis_refresh_token != refresh_token:
-        raise TokenError(msg='Refresh Token error')
-    new_access_token, new_access_token_expire_time = await create_access_token_redis(sub, **kwargs)
-    new_refresh_token, new_refresh_token_expire_time = await create_refresh_token_redis(sub, **kwargs)
-    token_key = f'{settings.TOKEN_REDIS_PREFIX}:{sub}:{token}'
-    refresh_token_key = f'{settings.TOKEN_REDIS_PREFIX}:{sub}:{refresh_token}'
-    await redis_client.delete(token_key)
-    await redis_client.delete(refresh_token_key)
-    return new_access_token, new_refresh_token, new_access_token_expire_time, new_refresh_token_expire_time
+    refresh_jti = get_token_jti(refresh_token, REFRESH_TOKEN_TYPE)
+    gen = await get_session_generation(sub)
+    access_info = await sign_jwt(user_id=int(sub), gen=gen)
+    refresh_info = await create_jwt_refresh_token(user_id=int(sub), gen=gen)
+    new_pair = (
+        access_info["access_token"],
+        access_info["expires"],
+        refresh_info["refresh_token"],
+        refresh_info["expires"],
+    )
+    result = await rotate_refresh_token_script(
+        keys=[
+            refresh_token_key(sub, refresh_jti),
+            refresh_token_key(sub, refresh_info["jti"]),
+            token_index_key(sub),
+            f'{settings.TOKEN_REFRESH_ROTATED_REDIS_PREFIX}:{sub}:{refresh_jti}',
+        ],
+        args=[
+            TOKEN_REDIS_VALUE,
+            settings.TOKEN_REFRESH_EXPIRE_SECONDS,
+            int(time.time()),
+            settings.TOKEN_REFRESH_EXPIRE_SECONDS,
+            settings.TOKEN_REFRESH_REUSE_SECONDS,
+            msgspec.json.encode(new_pair).decode(),
+        ],
+    )
+    status = int(result[0])
+    if status == 1:
+        return new_pair
+    if status == 0:
+        return tuple(msgspec.json.decode(result[1]))
+    raise TokenError(msg='Refresh Token error')
 
 
 async def get_token(request: Request) -> str:
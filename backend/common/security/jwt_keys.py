@@ -0,0 +1,137 @@
+import json
+from pathlib import Path
+from typing import Any
+
+import jwt
+
+from core.config import settings
+
+try:
+    from cryptography.hazmat.primitives import serialization
+except ImportError:  # cryptography нужна только для EdDSA / RS256
+    serialization = None
+
+__all__ = ['ASYMMETRIC_ALGORITHMS', 'JWTKeySet', 'jwt_keys']
+
+ASYMMETRIC_ALGORITHMS = ('EdDSA', 'RS256')
+
+
+def _read_key(value: str) -> bytes:
+    """PEM строка или путь к PEM файлу"""
+    if value.lstrip().startswith('-----BEGIN'):
+        return value.encode()
+    return Path(value).read_bytes()
+
+
+class JWTKeySet:
+    """
+    Ключи подписи JWT.
+
+    HS256 подписывает общим JWT_SECRET, как раньше. Для EdDSA / RS256 токен
+    подписывается активным ключом JWT_SIGNING_KID и получает его ``kid`` в заголовке,
+    а проверяется любым из известных публичных ключей: при ротации новый ключ
+    делается активным, старый остается в JWT_PUBLIC_KEYS до истечения его токенов.
+    """
+
+    def __init__(
+        self,
+        algorithm: str,
+        secret: str,
+        signing_kid: str = '',
+        private_keys: dict[str, str] | None = None,
+        public_keys: dict[str, str] | None = None,
+    ):
+        self.algorithm = algorithm
+        self.secret = secret
+        self.signing_kid = signing_kid
+        self._private_key_sources = private_keys or {}
+        self._public_key_sources = public_keys or {}
+        self._private_keys: dict[str, Any] | None = None
+        self._public_keys: dict[str, Any] | None = None
+        self._jwks: bytes | None = None
+
+    @property
+    def asymmetric(self) -> bool:
+        return self.algorithm in ASYMMETRIC_ALGORITHMS
+
+    def _load(self) -> None:
+        if self._public_keys is not None:
+            return
+        if serialization is None:
+            raise RuntimeError(f'JWT algorithm {self.algorithm} requires the cryptography package')
+        private_keys = {
+            kid: serialization.load_pem_private_key(_read_key(source), password=None)
+            for kid, source in self._private_key_sources.items()
+        }
+        public_keys = {kid: key.public_key() for kid, key in private_keys.items()}
+        for kid, source in self._public_key_sources.items():
+            public_keys.setdefault(kid, serialization.load_pem_public_key(_read_key(source)))
+        if self.signing_kid not in private_keys:
+            raise RuntimeError(f'JWT signing key {self.signing_kid!r} is not configured')
+        self._private_keys = private_keys
+        self._public_keys = public_keys
+
+    def validate(self) -> None:
+        """
+        Загрузить ключи асимметричного алгоритма при старте, а не на первом запросе
+
+        :return:
+        :raises RuntimeError: нет пакета cryptography или активного ключа подписи
+        """
+        if self.asymmetric:
+            self._load()
+
+    def encode(self, payload: dict) -> str:
+        if not self.asymmetric:
+            return jwt.encode(payload, self.secret, algorithm=self.algorithm)
+        self._load()
+        return jwt.encode(
+            payload,
+            self._private_keys[self.signing_kid],
+            algorithm=self.algorithm,
+            headers={'kid': self.signing_kid},
+        )
+
+    def decode(self, token: str) -> dict:
+        """
+        Проверить подпись и вернуть payload
+
+        :param token:
+        :return:
+        :raises jwt.PyJWTError: неверная подпись или неизвестный kid
+        """
+        if not self.asymmetric:
+            return jwt.decode(token, self.secret, algorithms=[self.algorithm])
+        self._load()
+        kid = jwt.get_unverified_header(token).get('kid')
+        key = self._public_keys.get(kid)
+        if key is None:
+            raise jwt.InvalidKeyError(f'Unknown kid {kid!r}')
+        return jwt.decode(token, key, algorithms=[self.algorithm])
+
+    def jwks(self) -> bytes:
+        """
+        JSON Web Key Set с публичными ключами, сериализуется один раз
+
+        :return:
+        """
+        if self._jwks is None:
+            keys = []
+            if self.asymmetric:
+                self._load()
+                algorithm = jwt.get_algorithm_by_name(self.algorithm)
+                for kid, key in self._public_keys.items():
+                    jwk = json.loads(algorithm.to_jwk(key))
+                    jwk.update(kid=kid, alg=self.algorithm, use='sig')
+                    keys.append(jwk)
+            self._jwks = json.dumps({'keys': keys}).encode()
+        return self._jwks
+
+
+jwt_keys = JWTKeySet(
+    algorithm=settings.JWT_ALGORITHM,
+    secret=settings.JWT_SECRET,
+    signing_kid=settings.JWT_SIGNING_KID,
+    private_keys=settings.JWT_PRIVATE_KEYS,
+    public_keys=settings.JWT_PUBLIC_KEYS,
+)
@@ -0,0 +1,154 @@
+import secrets
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from common.exception.errors import TooManyRequestsError
+from common.security.password import password_hash_pool
+from core.config import settings
+from core.db_redis import redis_client
+
+__all__ = ['LoginThrottleStats', 'LoginThrottle', 'login_throttle']
+
+# Скользящее окно попыток входа на sorted set, по одному на email и на IP.
+# Попытка засчитывается во все ключи, только если ни один из них не превысил лимит.
+# KEYS: ключи окон. ARGV: now (мс), окно (мс), id попытки, затем лимит для каждого ключа.
+# Возвращает для каждого ключа, через сколько мс в его окне освободится место (0 - лимит не исчерпан).
+SLIDING_WINDOW_LUA = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local retry_after = {}
+local blocked = false
+for i, key in ipairs(KEYS) do
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+    retry_after[i] = 0
+    if redis.call('ZCARD', key) >= tonumber(ARGV[3 + i]) then
+        local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+        retry_after[i] = math.max(1, tonumber(oldest[2]) + window - now)
+        blocked = true
+    end
+end
+if not blocked then
+    for _, key in ipairs(KEYS) do
+        redis.call('ZADD', key, now, ARGV[3])
+        redis.call('PEXPIRE', key, window)
+    end
+end
+return retry_after
+"""
+
+
+@dataclass
+class LoginThrottleStats:
+    """Счетчики ограничения попыток входа"""
+
+    allowed: int = 0
+    rejected: int = 0
+    rejected_locally: int = 0  # Отклонено по локальному кэшу, без запроса в Redis
+
+    @property
+    def password_checks_avoided(self) -> int:
+        return self.rejected
+
+    @property
+    def hash_seconds_avoided(self) -> float:
+        """Оценка сэкономленного времени bcrypt по среднему времени проверки пароля"""
+        hash_stats = password_hash_pool.stats
+        if not hash_stats.completed:
+            return 0.0
+        return self.rejected * hash_stats.hash_seconds_total / hash_stats.completed
+
+
+class LoginThrottle:
+    """
+    Ограничение попыток входа по email и по IP клиента.
+
+    Проверяется до обращения к БД и bcrypt, поэтому перебор паролей не тратит CPU
+    на хэширование. Заблокированные ключи запоминаются в воркере до окончания
+    блокировки, и повторные попытки отклоняются без запроса в Redis.
+    """
+
+    def __init__(self, prefix: str, window: int, email_limit: int, ip_limit: int, local_cache_size: int):
+        self.prefix = prefix
+        self.window = window
+        self.email_limit = email_limit
+        self.ip_limit = ip_limit
+        self.local_cache_size = local_cache_size
+        self.stats = LoginThrottleStats()
+        self._blocked: OrderedDict[str, float] = OrderedDict()
+        self._script = redis_client.register_script(SLIDING_WINDOW_LUA)
+
+    def _keys(self, email: str, ip: str | None) -> dict[str, int]:
+        keys = {f'{self.prefix}:email:{email.strip().lower()}': self.email_limit}
+        if ip:
+            keys[f'{self.prefix}:ip:{ip}'] = self.ip_limit
+        return keys
+
+    def _blocked_for(self, keys: dict[str, int]) -> float:
+        now = time.time()
+        retry_after = 0.0
+        for key in keys:
+            blocked_until = self._blocked.get(key)
+            if blocked_until is None:
+                continue
+            if blocked_until <= now:
+                del self._blocked[key]
+            else:
+                retry_after = max(retry_after, blocked_until - now)
+        return retry_after
+
+    def _block(self, key: str, retry_after: float) -> None:
+        self._blocked[key] = time.time() + retry_after
+        self._blocked.move_to_end(key)
+        while len(self._blocked) > self.local_cache_size:
+            self._blocked.popitem(last=False)
+
+    async def check(self, email: str, ip: str | None) -> None:
+        """
+        Засчитать попытку входа
+
+        :param email:
+        :param ip: адрес клиента
+        :return:
+        :raises TooManyRequestsError: лимит попыток исчерпан
+        """
+        keys = self._keys(email, ip)
+        retry_after = self._blocked_for(keys)
+        if retry_after:
+            self.stats.rejected += 1
+            self.stats.rejected_locally += 1
+            raise TooManyRequestsError(msg='Too many login attempts', retry_after=int(retry_after) + 1)
+
+        now_ms = int(time.time() * 1000)
+        retry_after_ms = await self._script(
+            keys=list(keys),
+            args=[now_ms, self.window * 1000, f'{now_ms}:{secrets.token_hex(4)}', *keys.values()],
+        )
+        # Локально блокируется только ключ, исчерпавший лимит: перебор с одного IP
+        # не должен блокировать вход этого email с других адресов
+        for key, key_retry_after_ms in zip(keys, retry_after_ms):
+            if int(key_retry_after_ms):
+                self._block(key, int(key_retry_after_ms) / 1000)
+        retry_after_ms = max(int(value) for value in retry_after_ms)
+        if retry_after_ms:
+            self.stats.rejected += 1
+            raise TooManyRequestsError(msg='Too many login attempts', retry_after=retry_after_ms // 1000 + 1)
+        self.stats.allowed += 1
+
+    async def reset(self, email: str) -> None:
+        """
+        Сбросить счетчик email после успешного входа
+
+        :param email:
+        :return:
+        """
+        await redis_client.delete(f'{self.prefix}:email:{email.strip().lower()}')
+
+
+login_throttle = LoginThrottle(
+    prefix=settings.LOGIN_THROTTLE_REDIS_PREFIX,
+    window=settings.LOGIN_THROTTLE_WINDOW_SECONDS,
+    email_limit=settings.LOGIN_THROTTLE_EMAIL_LIMIT,
+    ip_limit=settings.LOGIN_THROTTLE_IP_LIMIT,
+    local_cache_size=settings.LOGIN_THROTTLE_LOCAL_CACHE_SIZE,
+)
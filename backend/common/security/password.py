@@ -0,0 +1,181 @@
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from passlib.context import CryptContext
+
+from common.exception.errors import ServiceUnavailableError
+from core.config import settings
+
+__all__ = [
+    'PASSWORD_HASH_SCHEMES',
+    'build_pwd_context',
+    'pwd_context',
+    'password_needs_rehash',
+    'PasswordHashStats',
+    'PasswordHashPool',
+    'password_hash_pool',
+]
+
+PASSWORD_HASH_SCHEMES = ('bcrypt', 'argon2')
+
+
+def build_pwd_context(
+    scheme: str = settings.PASSWORD_HASH_SCHEME,
+    bcrypt_rounds: int = settings.PASSWORD_BCRYPT_ROUNDS,
+    argon2_time_cost: int = settings.PASSWORD_ARGON2_TIME_COST,
+    argon2_memory_cost: int = settings.PASSWORD_ARGON2_MEMORY_COST,
+    argon2_parallelism: int = settings.PASSWORD_ARGON2_PARALLELISM,
+) -> CryptContext:
+    """
+    Контекст хэширования: новые хэши создаются схемой ``scheme`` с заданными параметрами,
+    хэши другой схемы или с другими параметрами проверяются, но needs_update() для них True.
+    Пакет argon2-cffi нужен, только если используются хэши argon2.
+
+    :return:
+    """
+    if scheme not in PASSWORD_HASH_SCHEMES:
+        raise ValueError(f'Unsupported password hash scheme {scheme!r}')
+    return CryptContext(
+        schemes=[scheme, *(other for other in PASSWORD_HASH_SCHEMES if other != scheme)],
+        deprecated='auto',
+        bcrypt__rounds=bcrypt_rounds,
+        argon2__time_cost=argon2_time_cost,
+        argon2__memory_cost=argon2_memory_cost,
+        argon2__parallelism=argon2_parallelism,
+    )
+
+
+pwd_context = build_pwd_context()
+
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Хэш создан устаревшей схемой или с другими параметрами. Только разбор строки, без хэширования"""
+    return pwd_context.needs_update(hashed_password)
+
+
+def _warmup() -> None:
+    return None
+
+
+def _run_timed(fn: Callable, args: tuple, submitted_at: float) -> tuple[float, float, Any]:
+    """
+    Выполняется в процессе пула: возвращает ожидание в очереди, время работы и результат.
+    time.monotonic() общий для процессов одной машины.
+    """
+    started = time.monotonic()
+    result = fn(*args)
+    return started - submitted_at, time.monotonic() - started, result
+
+
+@dataclass
+class PasswordHashStats:
+    """Счетчики пула хэширования паролей"""
+
+    completed: int = 0
+    rejected: int = 0
+    in_flight: int = 0
+    hash_seconds_total: float = 0.0
+    hash_seconds_max: float = 0.0
+    queue_wait_seconds_total: float = 0.0
+    queue_wait_seconds_max: float = 0.0
+
+    def record(self, queue_wait: float, duration: float) -> None:
+        self.completed += 1
+        self.hash_seconds_total += duration
+        self.hash_seconds_max = max(self.hash_seconds_max, duration)
+        self.queue_wait_seconds_total += queue_wait
+        self.queue_wait_seconds_max = max(self.queue_wait_seconds_max, queue_wait)
+
+
+class PasswordHashPool:
+    """
+    Отдельный пул процессов для bcrypt, чтобы хэширование не занимало event loop.
+
+    Одновременно принимается не больше ``workers + max_queue`` операций,
+    остальные сразу получают 503, а не копятся в очереди.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.stats = PasswordHashStats()
+        self._executor: ProcessPoolExecutor | None = None
+
+    def start(self) -> None:
+        """
+        Создать процессы заранее, при старте приложения
+
+        :return:
+        """
+        executor = self._get_executor()
+        for _ in range(self.workers):
+            executor.submit(_warmup)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def run(self, fn: Callable, *args, reject: bool = True) -> Any:
+        """
+        Выполнить fn(*args) в пуле
+
+        :param fn: функция уровня модуля (передается в другой процесс)
+        :param args:
+        :param reject: отклонять при переполненной очереди
+        :return:
+        :raises ServiceUnavailableError: очередь заполнена
+        """
+        if reject and self.stats.in_flight >= self.workers + self.max_queue:
+            self.stats.rejected += 1
+            raise ServiceUnavailableError(msg='Password hashing is overloaded, try again later')
+
+        self.stats.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            queue_wait, duration, result = await loop.run_in_executor(
+                self._get_executor(), _run_timed, fn, args, time.monotonic()
+            )
+        finally:
+            self.stats.in_flight -= 1
+        self.stats.record(queue_wait, duration)
+        return result
+
+    async def run_many(self, fn: Callable, items: list[tuple]) -> list:
+        """
+        Выполнить пачку операций (массовый импорт), не больше workers одновременно.
+
+        Пачка не отклоняется, но и не занимает всю очередь, поэтому логины
+        продолжают обслуживаться между ее частями.
+
+        :param fn:
+        :param items: аргументы для каждого вызова
+        :return: результаты в том же порядке
+        """
+        results = []
+        for i in range(0, len(items), self.workers):
+            part = items[i:i + self.workers]
+            results.extend(await asyncio.gather(*(self.run(fn, *args, reject=False) for args in part)))
+        return results
+
+
+password_hash_pool = PasswordHashPool(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+)
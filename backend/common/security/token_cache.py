@@ -0,0 +1,130 @@
+import hashlib
+import time
+from collections import OrderedDict
+
+from core.config import settings
+from core.redis_pubsub import redis_pubsub
+
+__all__ = ['VerifiedTokenCache', 'SessionGenerationCache', 'token_cache', 'session_generations']
+
+
+def token_digest(token: str) -> str:
+    return hashlib.blake2b(token.encode(), digest_size=16).hexdigest()
+
+
+class VerifiedTokenCache:
+    """
+    LRU недавно проверенных access токенов воркера.
+
+    Запись живет до ``expires`` самого токена, но не дольше ``max_ttl`` секунд.
+    Отзыв проверяется по поколению сессии и для токенов из кэша.
+    """
+
+    def __init__(self, maxsize: int, max_ttl: float):
+        self.maxsize = maxsize
+        self.max_ttl = max_ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[dict, float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, token: str) -> dict | None:
+        digest = token_digest(token)
+        entry = self._entries.get(digest)
+        if entry is None:
+            self.misses += 1
+            return None
+        payload, valid_until = entry
+        if valid_until <= time.time():
+            del self._entries[digest]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(digest)
+        self.hits += 1
+        return payload
+
+    def put(self, token: str, payload: dict) -> None:
+        valid_until = min(float(payload['expires']), time.time() + self.max_ttl)
+        digest = token_digest(token)
+        self._entries[digest] = (payload, valid_until)
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class SessionGenerationCache:
+    """
+    Поколения сессий пользователей, известные воркеру.
+
+    Токен действителен, пока его ``gen`` не меньше текущего поколения пользователя.
+    Новое поколение рассылается через pub/sub, а запись живет не дольше ``max_ttl``
+    секунд на случай потерянного сообщения.
+    """
+
+    def __init__(self, maxsize: int, max_ttl: float):
+        self.maxsize = maxsize
+        self.max_ttl = max_ttl
+        self._entries: OrderedDict[str, tuple[int, float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, user_id: int | str) -> int | None:
+        key = str(user_id)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        generation, valid_until = entry
+        if valid_until <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return generation
+
+    def put(self, user_id: int | str, generation: int) -> None:
+        key = str(user_id)
+        current = self._entries.get(key)
+        # Поколение только растет: запоздавший ответ Redis не должен откатить отзыв
+        if current is not None and current[0] > generation and current[1] > time.time():
+            return
+        self._entries[key] = (generation, time.time() + self.max_ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def handle_message(self, message: str) -> None:
+        """
+        Сообщение канала отзыва: ``gen:{user_id}:{generation}``
+
+        :param message:
+        :return:
+        """
+        kind, _, value = message.partition(':')
+        if kind == 'gen':
+            user_id, _, generation = value.partition(':')
+            self.put(user_id, int(generation))
+
+
+token_cache = VerifiedTokenCache(
+    maxsize=settings.TOKEN_CACHE_MAXSIZE,
+    max_ttl=settings.TOKEN_CACHE_TTL,
+)
+
+session_generations = SessionGenerationCache(
+    maxsize=settings.TOKEN_CACHE_MAXSIZE,
+    max_ttl=settings.TOKEN_CACHE_TTL,
+)
+redis_pubsub.subscribe(
+    settings.TOKEN_INVALIDATION_CHANNEL,
+    session_generations.handle_message,
+    on_reset=session_generations.clear,
+)
+
@@ -26,6 +26,37 @@ class Settings(BaseSettings):
     # Middleware
     MIDDLEWARE_CORS: bool = True
     MIDDLEWARE_ACCESS: bool = False
+    MIDDLEWARE_COMPRESSION: bool = True
+    MIDDLEWARE_ETAG: bool = True
+    MIDDLEWARE_CONCURRENCY_LIMIT: bool = True
+
+    # Request profiler
+    PROFILER_ENABLED: bool = False  # Профилировать запросы с заголовком PROFILER_HEADER (dev или суперпользователь)
+    PROFILER_HEADER: str = 'X-Profile'  # Значение: speedscope или collapsed, иначе PROFILER_FORMAT
+    PROFILER_FORMAT: Literal['speedscope', 'collapsed'] = 'speedscope'
+    PROFILER_INTERVAL_MS: float = 1  # Период сэмплирования стека
+
+    # Conditional GET
+    ETAG_CHEAP_VALIDATORS: bool = True  # 304 по версии строк в БД до основного запроса
+
+    # Response compression
+    COMPRESSION_MIN_SIZE: int = 1024  # Тела меньше N байт отдаются без сжатия
+    COMPRESSION_THREAD_MIN_SIZE: int = 256 * 1024  # Куски от N байт сжимаются в пуле потоков
+    # Порядок предпочтения, zstd и br только при установленных пакетах zstandard / brotli
+    COMPRESSION_ENCODINGS: list[str] = ['zstd', 'br', 'gzip']
+    COMPRESSION_LEVELS: dict[str, int] = {'zstd': 3, 'br': 4, 'gzip': 6}
+    # Префикс пути -> уровни по кодеку, например {"/api/v1/permission": {"zstd": 6, "br": 5}}
+    COMPRESSION_ROUTE_LEVELS: dict[str, dict[str, int]] = {}
+    COMPRESSION_EXCLUDED_TYPES: list[str] = [
+        'image/', 'video/', 'audio/', 'font/woff',
+        'application/zip', 'application/gzip', 'application/x-7z-compressed', 'application/x-rar',
+        'application/zstd', 'application/pdf', 'application/octet-stream', 'text/event-stream',
+    ]
+
+    # Metrics
+    METRICS_ENABLED: bool = True
+    METRICS_URL: str = '/metrics'  # Prometheus text format, вне схемы OpenAPI
+    HEALTH_URL: str = '/health'  # Проверка живости, вне схемы OpenAPI
 
     # Env MySQL
     # MYSQL_HOST: str
@@ -45,6 +76,22 @@ class Settings(BaseSettings):
     SQLALCHEMY_DATABASE_URL_FOR_ALEMBIC_TESTING: str = f'postgresql+psycopg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/test_db'
     # SQLALCHEMY_DATABASE_URL_FOR_ALEMBIC_TESTING: str = f'postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/test_db'
 
+    # Database pool
+    DATABASE_ECHO: bool = False
+    DATABASE_POOL_SIZE: int = 10  # Постоянные соединения на один воркер
+    DATABASE_POOL_MAX_OVERFLOW: int = 20  # Дополнительные соединения сверх POOL_SIZE
+    DATABASE_POOL_RECYCLE: int = 60 * 30  # Пересоздание соединения через N секунд
+    DATABASE_POOL_TIMEOUT: float = 30  # Ожидание свободного соединения в секундах
+    DATABASE_POOL_PRE_PING: bool = True
+
+    # Database read replicas
+    SQLALCHEMY_REPLICA_URLS: list[str] = []
+    DATABASE_REPLICA_STICKY_SECONDS: float = 5  # Чтение с primary после записи пользователя
+    DATABASE_REPLICA_STICKY_REDIS_PREFIX: str = 'fba_replica_sticky'  # Отметка о записи, общая для воркеров
+    DATABASE_REPLICA_MAX_LAG_SECONDS: float = 5  # Реплика с большим отставанием не используется
+    DATABASE_REPLICA_CHECK_INTERVAL: float = 5  # Период проверки отставания реплики
+    DATABASE_REPLICA_RETRY_SECONDS: float = 30  # Пауза перед повторной проверкой недоступной реплики
+
     # Env Redis
     REDIS_HOST: str
     REDIS_PORT: int
@@ -53,6 +100,9 @@ class Settings(BaseSettings):
 
     # Redis
     REDIS_TIMEOUT: int = 5
+    REDIS_MAX_CONNECTIONS: int = 50  # Размер пула соединений на один воркер
+    REDIS_POOL_TIMEOUT: int = 5  # Ожидание свободного соединения из пула
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30
 
     # FastAPI
     API_V1_STR: str = '/api/v1'
@@ -80,15 +130,83 @@ class Settings(BaseSettings):
     TOKEN_REFRESH_EXPIRE_SECONDS: int = 60 * 60 * 24 * 7  # Время жизни рефреш токена в секундах
     TOKEN_REDIS_PREFIX: str = 'fba_token'
     TOKEN_REFRESH_REDIS_PREFIX: str = 'fba_refresh_token'
+    TOKEN_INDEX_REDIS_PREFIX: str = 'fba_token_index'  # Индекс refresh токенов пользователя (sorted set)
+    TOKEN_GENERATION_REDIS_PREFIX: str = 'fba_token_gen'  # Поколение сессий пользователя, увеличивается при отзыве
+    TOKEN_REFRESH_ROTATED_REDIS_PREFIX: str = 'fba_refresh_rotated'
+    TOKEN_JTI_BYTES: int = 8  # Длина случайного jti, ключ в Redis: prefix:{sub}:{jti}
+    TOKEN_REFRESH_REUSE_SECONDS: int = 10  # Параллельный refresh тем же токеном получает ту же новую пару
     TOKEN_EXCLUDE: list[str] = [  # JWT / RBAC 白名单
         f'{API_V1_STR}/auth/login',
     ]
 
+    # Verified token cache
+    TOKEN_CACHE_MAXSIZE: int = 10000  # Токенов в LRU одного воркера
+    TOKEN_CACHE_TTL: int = 30  # Максимум секунд без повторной проверки в Redis
+    TOKEN_INVALIDATION_CHANNEL: str = 'fba_token_invalidation'
+
     # JWT
     JWT_SECRET: str = 'veryVerySecretKey'
-    JWT_ALGORITHM: str = 'HS256'
+    JWT_ALGORITHM: str = 'HS256'  # HS256, EdDSA или RS256 (для двух последних нужен пакет cryptography)
+    JWT_SIGNING_KID: str = ''  # kid ключа, которым подписываются новые токены
+    JWT_PRIVATE_KEYS: dict[str, str] = {}  # kid -> PEM или путь к PEM закрытого ключа
+    JWT_PUBLIC_KEYS: dict[str, str] = {}  # kid -> PEM открытого ключа, только для проверки (выведенные из ротации)
+    JWT_STATELESS_VERIFY: bool = False  # JWTBearer проверяет access токен только по подписи, без Redis
+    JWKS_CACHE_SECONDS: int = 300
     TOKEN_TIME_EXPIRES: int = 60
 
+    # Password hashing
+    PASSWORD_HASH_SCHEME: str = 'bcrypt'  # bcrypt или argon2, параметры подбираются python -m common.security.calibrate
+    PASSWORD_BCRYPT_ROUNDS: int = 12
+    PASSWORD_ARGON2_TIME_COST: int = 3
+    PASSWORD_ARGON2_MEMORY_COST: int = 65536  # КиБ
+    PASSWORD_ARGON2_PARALLELISM: int = 4
+    PASSWORD_HASH_TARGET_MS: int = 250  # Бюджет времени одного хэша для калибровки
+    PASSWORD_HASH_WORKERS: int = 2  # Процессы для bcrypt на один воркер приложения
+    PASSWORD_HASH_MAX_QUEUE: int = 16  # Операции сверх этого числа в очереди сразу получают 503
+
+    # Login throttle
+    LOGIN_THROTTLE_ENABLED: bool = True
+    LOGIN_THROTTLE_REDIS_PREFIX: str = 'fba_login_throttle'
+    LOGIN_THROTTLE_WINDOW_SECONDS: int = 300  # Скользящее окно
+    LOGIN_THROTTLE_EMAIL_LIMIT: int = 10  # Попыток входа на один email за окно
+    LOGIN_THROTTLE_IP_LIMIT: int = 100  # Попыток входа с одного IP за окно
+    LOGIN_THROTTLE_LOCAL_CACHE_SIZE: int = 10000  # Заблокированных ключей, которые воркер отклоняет без Redis
+
+    # Adaptive concurrency limit
+    CONCURRENCY_INITIAL_LIMIT: int = 100  # Одновременных запросов группы на один воркер
+    CONCURRENCY_MIN_LIMIT: int = 10
+    CONCURRENCY_MAX_LIMIT: int = 1000
+    CONCURRENCY_LATENCY_TARGET_MS: int = 500  # Ответ медленнее считается признаком перегрузки
+    CONCURRENCY_BACKOFF_RATIO: float = 0.9  # Во сколько раз уменьшается лимит при перегрузке
+    CONCURRENCY_RETRY_AFTER: int = 1  # Retry-After отклоненного запроса, сек
+    # Префикс пути -> группа со своим лимитом, остальные пути в группе default
+    CONCURRENCY_ROUTE_GROUPS: dict[str, str] = {
+        f'{API_V1_STR}/user': 'user',
+        f'{API_V1_STR}/permission': 'permission',
+        f'{API_V1_STR}/mongo': 'mongo',
+        f'{API_V1_STR}/minio': 'minio',
+    }
+    # Отдельная группа priority, которая не конкурирует с обычными запросами
+    CONCURRENCY_PRIORITY_PATHS: list[str] = [
+        HEALTH_URL,
+        METRICS_URL,
+        f'{API_V1_STR}/user/token/refresh',
+    ]
+
+    # Response cache
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_REDIS_PREFIX: str = 'fba_response_cache'
+    RESPONSE_CACHE_LOCAL_MAXSIZE: int = 1000  # Ответов в L1 одного воркера
+    RESPONSE_CACHE_LOCAL_TTL: int = 5  # Максимум секунд в L1, если сообщение о сбросе потерялось
+    RESPONSE_CACHE_INVALIDATION_CHANNEL: str = 'fba_response_cache_invalidation'
+    RESPONSE_CACHE_LOCK_MS: int = 5000  # Блокировка заполнения ключа и максимум ожидания чужого заполнения
+    RESPONSE_CACHE_LOCK_POLL_MS: int = 25  # Как часто ожидающий воркер проверяет кэш
+
+    # User import
+    USER_IMPORT_BATCH_SIZE: int = 1000  # Строк в одном INSERT ... ON CONFLICT
+    USER_IMPORT_MAX_REPORTED_ROWS: int = 1000  # Сколько конфликтов и ошибок вернуть построчно
+    USER_IMPORT_MAX_LINE_BYTES: int = 64 * 1024  # Длиннее - 413, строка не буферизуется целиком
+
     # Log
     LOG_STDOUT_FILENAME: str = 'fba_access.log'
     LOG_STDERR_FILENAME: str = 'fba_error.log'
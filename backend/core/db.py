@@ -1,22 +1,71 @@
 import sys
+import time
 from typing import Annotated
 
 from fastapi import Depends
-from sqlalchemy import create_engine, URL
+from sqlalchemy import create_engine, event, URL
+from sqlalchemy.exc import DBAPIError
 # from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine, AsyncSession
+from starlette.requests import Request
 
 from common.log import log
 from core.config import settings
+from core.db_pool import InstrumentedAsyncQueuePool
+from core.db_redis import redis_client
+from core.db_replica import Replica, ReplicaRouter
+from core.metrics import observe_backend
+from utils.request_timing import add_timing
 from sqlalchemy.orm import declarative_base
 
 Base = declarative_base()
 
 
+SQL_OPERATIONS = frozenset({'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'BEGIN', 'COMMIT', 'ROLLBACK'})
+
+
+def _sql_operation(statement: str) -> str:
+    words = statement.lstrip()[:16].split(None, 1)
+    operation = words[0].upper() if words else ''
+    return operation if operation in SQL_OPERATIONS else 'OTHER'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    add_timing('db', elapsed)
+    observe_backend('postgres', _sql_operation(statement), elapsed)
+
+
+def _handle_error(exception_context):
+    started = exception_context.connection.info.get('query_started') if exception_context.connection else None
+    if started:
+        elapsed = time.perf_counter() - started.pop()
+        add_timing('db', elapsed)
+        observe_backend('postgres', _sql_operation(exception_context.statement or ''), elapsed, error=True)
+
+
 def create_engine_and_session(url: str | URL):
     try:
         # Core database
-        engine = create_async_engine(url, echo=True, future=True, pool_pre_ping=True)
+        engine = create_async_engine(
+            url,
+            echo=settings.DATABASE_ECHO,
+            future=True,
+            poolclass=InstrumentedAsyncQueuePool,
+            pool_size=settings.DATABASE_POOL_SIZE,
+            max_overflow=settings.DATABASE_POOL_MAX_OVERFLOW,
+            pool_recycle=settings.DATABASE_POOL_RECYCLE,
+            pool_timeout=settings.DATABASE_POOL_TIMEOUT,
+            pool_pre_ping=settings.DATABASE_POOL_PRE_PING,
+        )
+        # Время запросов попадает в Server-Timing текущего запроса
+        event.listen(engine.sync_engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine.sync_engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(engine.sync_engine, 'handle_error', _handle_error)
         # log.success('success connect to database')
     except Exception as e:
         log.error('❌ Error to connect database {}', e)
@@ -29,8 +78,25 @@ def create_engine_and_session(url: str | URL):
 async_engine, async_db_session = create_engine_and_session(settings.SQLALCHEMY_DATABASE_URL)
 # async_engine, async_db_session = create_engine_and_session(settings.SQLALCHEMY_DATABASE_URL_FOR_ALEMBIC_TESTING)
 
+replica_router = ReplicaRouter(
+    [Replica(*create_engine_and_session(url)) for url in settings.SQLALCHEMY_REPLICA_URLS],
+    redis=redis_client,
+    sticky_prefix=settings.DATABASE_REPLICA_STICKY_REDIS_PREFIX,
+    sticky_seconds=settings.DATABASE_REPLICA_STICKY_SECONDS,
+    max_lag=settings.DATABASE_REPLICA_MAX_LAG_SECONDS,
+    check_interval=settings.DATABASE_REPLICA_CHECK_INTERVAL,
+    retry_seconds=settings.DATABASE_REPLICA_RETRY_SECONDS,
+)
+
 
-async def get_db() -> AsyncSession:
+def _read_your_writes_key(request: Request) -> str | None:
+    user_id = getattr(request.state, 'user_id', None)
+    if user_id is not None:
+        return f'user:{user_id}'
+    return f'client:{request.client.host}' if request.client else None
+
+
+async def get_db(request: Request) -> AsyncSession:
     """session generator"""
     session = async_db_session()
     try:
@@ -39,8 +105,49 @@ async def get_db() -> AsyncSession:
         await session.rollback()
         raise se
     finally:
+        if session.info.get('has_writes'):
+            await replica_router.mark_write(_read_your_writes_key(request))
         await session.close()
 
 
+async def get_read_session_maker(key: str | None = None) -> async_sessionmaker:
+    """
+    Session factory for long read-only work outside of a request dependency
+    (streaming exports): a healthy replica if there is one, otherwise the primary.
+    """
+    replica = await replica_router.choose(key)
+    return replica.session_maker if replica else async_db_session
+
+
+async def get_db_read(request: Request) -> AsyncSession:
+    """
+    Read-only session generator.
+
+    Uses a replica when one is configured, healthy and the caller has not
+    written recently, otherwise falls back to the primary.
+    """
+    replica = await replica_router.choose(_read_your_writes_key(request))
+    session = replica.session_maker() if replica else async_db_session()
+    try:
+        yield session
+    except Exception as se:
+        if replica is not None and isinstance(se, DBAPIError) and se.connection_invalidated:
+            replica_router.mark_unavailable(replica)
+        await session.rollback()
+        raise se
+    finally:
+        await session.close()
+
+
+def is_pinned_to_primary(session: AsyncSession) -> bool:
+    """
+    Session reads from the primary although replicas exist (read-your-writes,
+    a writing session) or has written in this session: its reads must not be shared
+    with callers that read from a replica.
+    """
+    return bool(session.info.get('has_writes')) or (bool(replica_router.replicas) and session.bind is async_engine)
+
+
 # Session Annotated
 CurrentSession = Annotated[AsyncSession, Depends(get_db)]
+CurrentReadSession = Annotated[AsyncSession, Depends(get_db_read)]
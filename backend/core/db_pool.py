@@ -0,0 +1,83 @@
+import time
+from dataclasses import dataclass, field
+from threading import Lock
+
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+__all__ = ['PoolStats', 'InstrumentedAsyncQueuePool', 'get_pool_stats']
+
+
+@dataclass
+class PoolStats:
+    """Счетчики ожидания соединений пула"""
+
+    acquisitions: int = 0
+    timeouts: int = 0
+    wait_seconds_total: float = 0.0
+    wait_seconds_max: float = 0.0
+    _lock: Lock = field(default_factory=Lock, repr=False)
+
+    def record_acquire(self, wait: float) -> None:
+        with self._lock:
+            self.acquisitions += 1
+            self.wait_seconds_total += wait
+            if wait > self.wait_seconds_max:
+                self.wait_seconds_max = wait
+
+    def record_timeout(self, wait: float) -> None:
+        with self._lock:
+            self.timeouts += 1
+            self.wait_seconds_total += wait
+            if wait > self.wait_seconds_max:
+                self.wait_seconds_max = wait
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """
+    AsyncAdaptedQueuePool, который считает время получения соединения и таймауты.
+
+    Время измеряется вокруг ``_do_get``: сюда входит ожидание свободного
+    соединения в очереди и открытие нового соединения в рамках overflow.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record_timeout(time.perf_counter() - start)
+            raise
+        self.stats.record_acquire(time.perf_counter() - start)
+        return connection
+
+
+def get_pool_stats(engine: AsyncEngine) -> dict:
+    """
+    Текущее состояние пула соединений движка
+
+    :param engine:
+    :return:
+    """
+    pool = engine.pool
+    result = {
+        'size': pool.size(),
+        'checked_in': pool.checkedin(),
+        'checked_out': pool.checkedout(),
+        'overflow': pool.overflow(),
+    }
+    stats: PoolStats | None = getattr(pool, 'stats', None)
+    if stats is not None:
+        result.update(
+            acquisitions=stats.acquisitions,
+            timeouts=stats.timeouts,
+            wait_seconds_total=stats.wait_seconds_total,
+            wait_seconds_max=stats.wait_seconds_max,
+            wait_seconds_avg=stats.wait_seconds_total / stats.acquisitions if stats.acquisitions else 0.0,
+        )
+    return result
@@ -1,6 +1,7 @@
 import sys
 
-from redis import Redis
+from redis.asyncio import BlockingConnectionPool, Redis
+from redis.asyncio.client import Pipeline
 from redis.exceptions import (
     TimeoutError,
     AuthenticationError
@@ -8,18 +9,41 @@ from redis.exceptions import (
 
 from common.log import log
 from core.config import settings
+from core.metrics import timed_backend
+from utils.request_timing import timed
+
+
+class TimedPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        with timed('redis'), timed_backend('redis', 'PIPELINE'):
+            return await super().execute(raise_on_error)
 
 
 class RedisCli(Redis):
     def __init__(self):
         super(RedisCli, self).__init__(
-            host=settings.REDIS_HOST,
-            port=settings.REDIS_PORT,
-            password=settings.REDIS_PASSWORD,
-            db=settings.REDIS_DATABASE,
-            socket_timeout=settings.REDIS_TIMEOUT,
-            decode_responses=True,  # Кодировка utf-8
+            connection_pool=BlockingConnectionPool(
+                host=settings.REDIS_HOST,
+                port=settings.REDIS_PORT,
+                password=settings.REDIS_PASSWORD,
+                db=settings.REDIS_DATABASE,
+                socket_timeout=settings.REDIS_TIMEOUT,
+                socket_connect_timeout=settings.REDIS_TIMEOUT,
+                health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+                timeout=settings.REDIS_POOL_TIMEOUT,  # Ожидание свободного соединения из пула
+                decode_responses=True,  # Кодировка utf-8
+            )
         )
+        # Пул создан клиентом, поэтому и закрывается вместе с ним в aclose()
+        self.auto_close_connection_pool = True
+
+    async def execute_command(self, *args, **options):
+        with timed('redis'), timed_backend('redis', str(args[0]).upper()):
+            return await super().execute_command(*args, **options)
+
+    def pipeline(self, transaction: bool = True, shard_hint: str | None = None) -> TimedPipeline:
+        return TimedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
 
     async def open(self):
         """
@@ -39,27 +63,6 @@ class RedisCli(Redis):
             log.error('❌ Ошибка. Неверное соединение с базой данных Redis {}', e)
             sys.exit()
 
-    async def delete_prefix(self, prefix: str, exclude: str | list = None):
-        """
-        Удалить все ключи, указанные в предыдущем разделе.
-
-        :param prefix:
-        :param exclude:
-        :return:
-        """
-        keys = []
-        for key in self.scan_iter(match=f'{prefix}*'):
-            if isinstance(exclude, str):
-                if key != exclude:
-                    keys.append(key)
-            elif isinstance(exclude, list):
-                if key not in exclude:
-                    keys.append(key)
-            else:
-                keys.append(key)
-        for key in keys:
-            self.delete(key)
-
 
 # Создание redis экземпляра
-redis_client = RedisCli()
\ No newline at end of file
+redis_client = RedisCli()
@@ -0,0 +1,138 @@
+import itertools
+import time
+from dataclasses import dataclass
+
+from redis.asyncio import Redis
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+from sqlalchemy.orm import Session
+
+from common.log import log
+
+__all__ = ['Replica', 'ReplicaRouter']
+
+# Отставание реплики в секундах. Если реплика проиграла весь полученный WAL,
+# отставания нет, даже если на primary давно не было записей.
+REPLICA_LAG_SQL = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+    """
+)
+
+
+@event.listens_for(Session, 'after_flush')
+def _mark_flush_writes(session: Session, flush_context) -> None:
+    session.info['has_writes'] = True
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _mark_dml_writes(orm_execute_state) -> None:
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info['has_writes'] = True
+
+
+@dataclass
+class Replica:
+    engine: AsyncEngine
+    session_maker: async_sessionmaker
+    available: bool = True
+    lag: float = 0.0
+    next_check: float = 0.0
+
+
+class ReplicaRouter:
+    """
+    Выбор реплики для читающих сессий.
+
+    Возвращает ``None`` (значит, читать нужно с primary), если реплик нет,
+    пользователь недавно писал в базу (read-your-writes) или все реплики
+    недоступны либо отстают больше чем на ``max_lag`` секунд.
+
+    Отметка о записи хранится в Redis с TTL ``sticky_seconds``, поэтому чтение
+    после записи попадает на primary, на каком бы воркере оно ни выполнялось.
+    """
+
+    def __init__(
+        self,
+        replicas: list[Replica],
+        *,
+        redis: Redis,
+        sticky_prefix: str,
+        sticky_seconds: float,
+        max_lag: float,
+        check_interval: float,
+        retry_seconds: float,
+    ):
+        self.replicas = replicas
+        self.redis = redis
+        self.sticky_prefix = sticky_prefix
+        self.sticky_seconds = sticky_seconds
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.retry_seconds = retry_seconds
+        self._cycle = itertools.cycle(replicas) if replicas else None
+
+    async def mark_write(self, key: str | None) -> None:
+        """
+        Закрепить чтения ключа (пользователя) за primary на sticky_seconds
+
+        :param key:
+        :return:
+        """
+        if key is None or not self.replicas:
+            return
+        try:
+            await self.redis.set(f'{self.sticky_prefix}:{key}', 1, px=int(self.sticky_seconds * 1000))
+        except Exception as e:
+            log.warning('Failed to mark read-your-writes key {}: {}', key, e)
+
+    async def is_sticky(self, key: str | None) -> bool:
+        if key is None:
+            return False
+        try:
+            return bool(await self.redis.exists(f'{self.sticky_prefix}:{key}'))
+        except Exception as e:
+            # Без Redis неизвестно, писал ли пользователь: читаем с primary
+            log.warning('Failed to check read-your-writes key {}: {}', key, e)
+            return True
+
+    def mark_unavailable(self, replica: Replica) -> None:
+        replica.available = False
+        replica.next_check = time.monotonic() + self.retry_seconds
+
+    async def choose(self, key: str | None = None) -> Replica | None:
+        """
+        Следующая доступная реплика по кругу или None для чтения с primary
+
+        :param key: ключ read-your-writes (id пользователя или адрес клиента)
+        :return:
+        """
+        if self._cycle is None or await self.is_sticky(key):
+            return None
+        for _ in range(len(self.replicas)):
+            replica = next(self._cycle)
+            await self._check(replica)
+            if replica.available:
+                return replica
+        return None
+
+    async def _check(self, replica: Replica) -> None:
+        now = time.monotonic()
+        if now < replica.next_check:
+            return
+        # Выставляем до await, чтобы параллельные запросы не проверяли реплику повторно
+        replica.next_check = now + self.check_interval
+        try:
+            async with replica.engine.connect() as conn:
+                lag = float(await conn.scalar(REPLICA_LAG_SQL) or 0)
+        except Exception as e:
+            log.warning('Replica {} is unavailable: {}', replica.engine.url.host, e)
+            self.mark_unavailable(replica)
+            return
+        replica.lag = lag
+        replica.available = lag <= self.max_lag
+        if not replica.available:
+            log.warning('Replica {} lags {:.1f}s behind primary', replica.engine.url.host, lag)
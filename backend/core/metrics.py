@@ -0,0 +1,170 @@
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from prometheus_client import CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+__all__ = [
+    'registry',
+    'http_requests_total',
+    'http_request_duration_seconds',
+    'observe_backend',
+    'timed_backend',
+    'render_metrics',
+]
+
+# Отдельный реестр: в /metrics попадают только метрики приложения
+registry = CollectorRegistry()
+
+BACKEND_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+http_requests_total = Counter(
+    'http_requests_total',
+    'HTTP responses by route template and status code',
+    ['method', 'route', 'status'],
+    registry=registry,
+)
+http_request_duration_seconds = Histogram(
+    'http_request_duration_seconds',
+    'HTTP request latency by route template',
+    ['method', 'route'],
+    registry=registry,
+)
+backend_call_duration_seconds = Histogram(
+    'backend_call_duration_seconds',
+    'Latency of calls to Postgres, Redis, MinIO, Mongo and Celery broker',
+    ['backend', 'operation'],
+    buckets=BACKEND_BUCKETS,
+    registry=registry,
+)
+backend_call_errors_total = Counter(
+    'backend_call_errors_total',
+    'Failed calls to backends',
+    ['backend', 'operation'],
+    registry=registry,
+)
+
+
+def observe_backend(backend: str, operation: str, seconds: float, error: bool = False) -> None:
+    backend_call_duration_seconds.labels(backend, operation).observe(seconds)
+    if error:
+        backend_call_errors_total.labels(backend, operation).inc()
+
+
+@contextmanager
+def timed_backend(backend: str, operation: str) -> Iterator[None]:
+    """
+    Замерить вызов backend
+
+    :param backend: postgres, redis, minio, mongo, celery
+    :param operation: команда / метод, значения должны быть из ограниченного набора
+    :return:
+    """
+    started = time.perf_counter()
+    error = False
+    try:
+        yield
+    except Exception:
+        error = True
+        raise
+    finally:
+        observe_backend(backend, operation, time.perf_counter() - started, error)
+
+
+class AppStatsCollector(Collector):
+    """
+    Счетчики, которые уже ведут компоненты приложения: пулы соединений БД,
+    пул хэширования паролей, кэш токенов, ограничение попыток входа, кэш ответов,
+    лимиты одновременных запросов.
+    Читаются только в момент запроса /metrics.
+    """
+
+    def collect(self):
+        # Импорт здесь: эти модули сами пишут в метрики при вызовах backend
+        from common.security.login_throttle import login_throttle
+        from common.security.password import password_hash_pool
+        from common.security.token_cache import token_cache
+        from core.db import async_engine, replica_router
+        from core.db_pool import get_pool_stats
+        from middleware.concurrency_middleware import concurrency_limiters
+        from utils.response_cache import response_cache
+        from utils.singleflight import single_flight
+
+        pool_gauges = {
+            name: GaugeMetricFamily(f'db_pool_{name}', f'Database pool {name.replace("_", " ")}', labels=['engine'])
+            for name in ('size', 'checked_in', 'checked_out', 'overflow', 'wait_seconds_max')
+        }
+        pool_counters = {
+            name: CounterMetricFamily(f'db_pool_{name}', f'Database pool {name.replace("_", " ")}', labels=['engine'])
+            for name in ('acquisitions', 'timeouts', 'wait_seconds')
+        }
+        engines = [('primary', async_engine)]
+        engines.extend((f'replica{i}', replica.engine) for i, replica in enumerate(replica_router.replicas))
+        for engine_name, engine in engines:
+            stats = get_pool_stats(engine)
+            for name, gauge in pool_gauges.items():
+                if name in stats:
+                    gauge.add_metric([engine_name], stats[name])
+            if 'acquisitions' in stats:
+                pool_counters['acquisitions'].add_metric([engine_name], stats['acquisitions'])
+                pool_counters['timeouts'].add_metric([engine_name], stats['timeouts'])
+                pool_counters['wait_seconds'].add_metric([engine_name], stats['wait_seconds_total'])
+        yield from pool_gauges.values()
+        yield from pool_counters.values()
+
+        hash_stats = password_hash_pool.stats
+        yield CounterMetricFamily('password_hash_completed', 'Password hash operations', value=hash_stats.completed)
+        yield CounterMetricFamily('password_hash_rejected', 'Password hash operations rejected on full queue',
+                                  value=hash_stats.rejected)
+        yield GaugeMetricFamily('password_hash_in_flight', 'Password hash operations running or queued',
+                                value=hash_stats.in_flight)
+        yield CounterMetricFamily('password_hash_seconds', 'Time spent hashing', value=hash_stats.hash_seconds_total)
+        yield CounterMetricFamily('password_hash_queue_wait_seconds', 'Time spent waiting for a hash worker',
+                                  value=hash_stats.queue_wait_seconds_total)
+
+        yield CounterMetricFamily('token_cache_hits', 'Verified token cache hits', value=token_cache.hits)
+        yield CounterMetricFamily('token_cache_misses', 'Verified token cache misses', value=token_cache.misses)
+        yield GaugeMetricFamily('token_cache_size', 'Tokens in the verified token cache', value=len(token_cache))
+
+        throttle_stats = login_throttle.stats
+        yield CounterMetricFamily('login_throttle_allowed', 'Login attempts allowed', value=throttle_stats.allowed)
+        yield CounterMetricFamily('login_throttle_rejected', 'Login attempts rejected', value=throttle_stats.rejected)
+        yield CounterMetricFamily('login_throttle_rejected_locally', 'Login attempts rejected without Redis',
+                                  value=throttle_stats.rejected_locally)
+        yield CounterMetricFamily('login_throttle_hash_seconds_avoided', 'Estimated password hash time saved',
+                                  value=throttle_stats.hash_seconds_avoided)
+
+        hits = CounterMetricFamily('response_cache_hits', 'Cached responses served', labels=['layer'])
+        hits.add_metric(['local'], response_cache.hits_local)
+        hits.add_metric(['redis'], response_cache.hits_redis)
+        yield hits
+        yield CounterMetricFamily('response_cache_misses', 'Response cache misses', value=response_cache.misses)
+        yield GaugeMetricFamily('response_cache_local_size', 'Responses in the worker L1 cache',
+                                value=len(response_cache.local))
+        yield CounterMetricFamily('response_cache_lock_waits', 'Misses that waited for another worker to fill',
+                                  value=response_cache.lock_waits)
+        yield CounterMetricFamily('response_cache_lock_wait_hits', 'Waits that ended with the filled response',
+                                  value=response_cache.lock_wait_hits)
+
+        limit = GaugeMetricFamily('concurrency_limit', 'Adaptive in-flight limit', labels=['group'])
+        in_flight = GaugeMetricFamily('concurrency_in_flight', 'Requests in flight', labels=['group'])
+        shed = CounterMetricFamily('concurrency_shed', 'Requests rejected with 503 over the limit', labels=['group'])
+        for group, limiter in concurrency_limiters.items():
+            limit.add_metric([group], int(limiter.limit))
+            in_flight.add_metric([group], limiter.in_flight)
+            shed.add_metric([group], limiter.shed)
+        yield from (limit, in_flight, shed)
+
+        yield CounterMetricFamily('singleflight_calls', 'Coalesced calls that ran', value=single_flight.calls)
+        yield CounterMetricFamily('singleflight_shared', 'Calls that waited for an identical in-flight call',
+                                  value=single_flight.shared)
+        yield GaugeMetricFamily('singleflight_in_flight', 'Coalesced calls running now', value=len(single_flight))
+
+
+registry.register(AppStatsCollector())
+
+
+def render_metrics() -> bytes:
+    return generate_latest(registry)
@@ -3,6 +3,15 @@ from minio.error import S3Error
 
 from common.log import log
 from core.config import settings
+from core.metrics import timed_backend
+
+
+class InstrumentedMinio(Minio):
+    """Minio, который пишет время каждого HTTP запроса к хранилищу в метрики"""
+
+    def _url_open(self, method: str, region: str, *args, **kwargs):
+        with timed_backend('minio', method):
+            return super()._url_open(method, region, *args, **kwargs)
 
 
 def minio_client() -> Minio:
@@ -10,7 +19,7 @@ def minio_client() -> Minio:
     Minio client
     :return: Minio
     """
-    client = Minio(
+    client = InstrumentedMinio(
         settings.MINIO_HOST,
         access_key=settings.MINIO_ACCESS_KEY,
         secret_key=settings.MINIO_SECRET_KEY,
@@ -6,11 +6,12 @@ from minio.error import S3Error
 from io import BytesIO
 
 from core.config import settings
+from core.minio_client import InstrumentedMinio
 
 
 class MinIOClient:
     def __init__(self):
-        self.client = Minio(
+        self.client = InstrumentedMinio(
             settings.MINIO_HOST,
             access_key=settings.MINIO_ACCESS_KEY,
             secret_key=settings.MINIO_SECRET_KEY,
@@ -1,14 +1,31 @@
 from typing import Annotated
 
 from fastapi import Depends
-from pymongo import MongoClient
+from pymongo import MongoClient, monitoring
 
 from common.log import log
 from core.config import settings
+from core.metrics import observe_backend
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Время команд MongoDB по данным драйвера"""
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        observe_backend('mongo', event.command_name, event.duration_micros / 1_000_000)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        observe_backend('mongo', event.command_name, event.duration_micros / 1_000_000, error=True)
+
+
+mongo_command_metrics = MongoCommandMetrics()
 
 
 async def mongo_db() -> MongoClient:
-    client = MongoClient(settings.MONGO_URI)
+    client = MongoClient(settings.MONGO_URI, event_listeners=[mongo_command_metrics])
     db = client[settings.MONGO_DB]
     try:
         yield db
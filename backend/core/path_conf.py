@@ -11,4 +11,6 @@ ALEMBIC_Versions_DIR = os.path.join(BasePath, 'alembic', 'versions')
 
 LOG_DIR = os.path.join(BasePath, 'log')
 
+PROFILE_DIR = os.path.join(LOG_DIR, 'profiles')
+
 STATIC_DIR = os.path.join(BasePath, 'static')
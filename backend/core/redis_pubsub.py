@@ -0,0 +1,89 @@
+import asyncio
+from typing import Awaitable, Callable
+
+from common.log import log
+from core.db_redis import redis_client
+
+__all__ = ['RedisPubSub', 'redis_pubsub']
+
+MessageHandler = Callable[[str], Awaitable[None] | None]
+ResetHandler = Callable[[], None]
+
+
+class RedisPubSub:
+    """
+    Рассылка сообщений между воркерами через Redis pub/sub.
+
+    Обработчики регистрируются при импорте модулей, подписка запускается в lifespan.
+    После переподключения вызываются on_reset обработчики: сообщения, пришедшие
+    пока соединения не было, потеряны, и локальные кэши нужно сбросить.
+    """
+
+    def __init__(self):
+        self._handlers: dict[str, list[MessageHandler]] = {}
+        self._reset_handlers: list[ResetHandler] = []
+        self._task: asyncio.Task | None = None
+
+    def subscribe(self, channel: str, handler: MessageHandler, on_reset: ResetHandler | None = None) -> None:
+        """
+        Зарегистрировать обработчик канала
+
+        :param channel:
+        :param handler: вызывается с текстом сообщения
+        :param on_reset: вызывается после переподключения к Redis
+        :return:
+        """
+        self._handlers.setdefault(channel, []).append(handler)
+        if on_reset is not None:
+            self._reset_handlers.append(on_reset)
+
+    async def publish(self, channel: str, message: str) -> None:
+        await redis_client.publish(channel, message)
+
+    async def start(self) -> None:
+        if self._handlers and self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _listen(self) -> None:
+        connected_before = False
+        while True:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(*self._handlers)
+                if connected_before:
+                    self._reset()
+                connected_before = True
+                async for message in pubsub.listen():
+                    await self._dispatch(message['channel'], message['data'])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.error('Redis pub/sub connection lost: {}', e)
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    async def _dispatch(self, channel: str, data: str) -> None:
+        for handler in self._handlers.get(channel, []):
+            try:
+                result = handler(data)
+                if result is not None:
+                    await result
+            except Exception as e:
+                log.error('Redis pub/sub handler for {} failed: {}', channel, e)
+
+    def _reset(self) -> None:
+        for handler in self._reset_handlers:
+            handler()
+
+
+redis_pubsub = RedisPubSub()
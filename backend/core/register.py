@@ -5,11 +5,24 @@ from fastapi import FastAPI
 __all__ = ['register_app']
 
 from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST
 
+from common.security.jwt_keys import jwt_keys
+from common.security.password import password_hash_pool
 from core.config import settings
+from core.db_redis import redis_client
+from core.metrics import render_metrics
+from core.redis_pubsub import redis_pubsub
 from core.path_conf import STATIC_DIR
 
 from middleware.access_middleware import AccessMiddleware
+from middleware.compression_middleware import CompressionMiddleware
+from middleware.concurrency_middleware import ConcurrencyLimitMiddleware
+from middleware.etag_middleware import ETagMiddleware
+from middleware.metrics_middleware import MetricsMiddleware
+from middleware.profiler_middleware import ProfilerMiddleware
 
 from utils.serializer import MsgSpecJSONResponse
 from api.router import router as main_router
@@ -23,11 +36,17 @@ async def register_init(app: FastAPI):
     :return:
     """
     print("Run app")
+    jwt_keys.validate()
+    await redis_client.open()
+    await redis_pubsub.start()
+    password_hash_pool.start()
 
     yield
 
     print("Stop app")
-    #await redis_client.close()
+    password_hash_pool.shutdown()
+    await redis_pubsub.stop()
+    await redis_client.aclose()
 
 
 def register_app():
@@ -166,6 +185,8 @@ def register_app():
     register_static_file(app)
     register_middleware(app)
     register_router(app)
+    register_metrics(app)
+    register_health(app)
 
     return app
 
@@ -188,6 +209,26 @@ def register_static_file(app: FastAPI):
 
 
 def register_middleware(app: FastAPI):
+    # ETag / If-None-Match: inside compression, hashes the identity body
+    if settings.MIDDLEWARE_ETAG:
+        app.add_middleware(ETagMiddleware)
+
+    # Response compression: inside access log, so Server-Timing includes it
+    if settings.MIDDLEWARE_COMPRESSION:
+        app.add_middleware(CompressionMiddleware)
+
+    # Adaptive concurrency limit: shed requests are still counted by metrics and access log
+    if settings.MIDDLEWARE_CONCURRENCY_LIMIT:
+        app.add_middleware(ConcurrencyLimitMiddleware)
+
+    # On-demand request profiler, artifacts in log/profiles
+    if settings.PROFILER_ENABLED:
+        app.add_middleware(ProfilerMiddleware)
+
+    # Metrics by route template
+    if settings.METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware)
+
     # Access log handler
     if settings.MIDDLEWARE_ACCESS:
         app.add_middleware(AccessMiddleware)
@@ -206,3 +247,20 @@ def register_middleware(app: FastAPI):
 def register_router(app: FastAPI):
     # register api endpoints here.
     app.include_router(main_router)
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+
+def register_metrics(app: FastAPI):
+    if settings.METRICS_ENABLED:
+        app.add_route(settings.METRICS_URL, metrics_endpoint, include_in_schema=False)
+
+
+async def health_endpoint(request: Request) -> Response:
+    return Response('ok', media_type='text/plain')
+
+
+def register_health(app: FastAPI):
+    app.add_route(settings.HEALTH_URL, health_endpoint, include_in_schema=False)
@@ -1,23 +1,70 @@
+import time
 import traceback
-from datetime import datetime
 
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
-from fastapi import Request, Response
+from starlette.datastructures import MutableHeaders
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from common.log import log
-from utils.timezone import timezone
+from utils.request_timing import (
+    finish_request_timing,
+    get_request_timings,
+    server_timing_header,
+    start_request_timing,
+)
 
 
-class AccessMiddleware(BaseHTTPMiddleware):
+class AccessMiddleware:
+    """
+    Журнал доступа и заголовок Server-Timing (total, db, redis, serialization).
 
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
+    Чистый ASGI middleware: тело ответа не буферизуется, потоковые ответы
+    проходят без изменений. Строка журнала пишется после отправки ответа.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        timing_token = start_request_timing()
+        status_code = 500
+        response_started = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, response_started
+            if message['type'] == 'http.response.start':
+                response_started = True
+                status_code = message['status']
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    'Server-Timing',
+                    server_timing_header(time.perf_counter() - started, get_request_timings()).decode('latin-1'),
+                )
+            await send(message)
+
+        client = scope.get('client')
+        host = client[0] if client else '-'
         try:
-            start_time = timezone.now()
-            response = await call_next(request)
-            end_time = timezone.now()
-            log.info(f'{response.status_code} {request.client.host} {request.method} {request.url} {end_time - start_time}')
-            return response
-        except Exception as e:
-            log.error(f'{request.client.host} {request.method} {request.url}')
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            log.error('{} {} {}', host, scope['method'], scope['path'])
             log.error(traceback.format_exc())
-            return Response(status_code=500)
+            if response_started:
+                raise
+            await Response(status_code=500)(scope, receive, send)
+        finally:
+            finish_request_timing(timing_token)
+
+        log.info(
+            '{} {} {} {} {:.2f}ms',
+            status_code,
+            host,
+            scope['method'],
+            scope['path'],
+            (time.perf_counter() - started) * 1000,
+        )
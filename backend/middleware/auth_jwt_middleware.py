@@ -1,12 +1,23 @@
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi import Request, HTTPException
+from fastapi import Depends, Request, HTTPException
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from common.security.jwt import decode_jwt
+from common.security.jwt import decode_jwt, decode_jwt_stateless
+from core.config import settings
+from core.db import get_db
+from models.user import User
 
 
 class JWTBearer(HTTPBearer):
-    def __init__(self, auto_error: bool = True):
+    def __init__(self, auto_error: bool = True, stateless: bool | None = None):
+        """
+        :param auto_error:
+        :param stateless: verify only signature and expiry of the access token, without Redis.
+            Defaults to settings.JWT_STATELESS_VERIFY
+        """
         super(JWTBearer, self).__init__(auto_error=False)  # Disable auto_error to control manually
+        self.stateless = settings.JWT_STATELESS_VERIFY if stateless is None else stateless
 
     async def __call__(self, request: Request):
         authorization = request.headers.get("Authorization")
@@ -35,10 +46,26 @@ class JWTBearer(HTTPBearer):
         isTokenValid: bool = False
 
         try:
-            payload = await decode_jwt(jwtoken)
+            payload = decode_jwt_stateless(jwtoken) if self.stateless else await decode_jwt(jwtoken)
         except:
             payload = None
         if payload:
             isTokenValid = True
             request.state.user_id = payload["user_id"]
         return isTokenValid
+
+
+class StaffJWTBearer(JWTBearer):
+    """
+    JWTBearer for administrative endpoints: the token owner must be a superuser or staff.
+    The flags are read from the primary, so a revoked privilege takes effect at once.
+    """
+
+    async def __call__(self, request: Request, db: AsyncSession = Depends(get_db)):
+        token = await super().__call__(request)
+        allowed = await db.scalar(
+            select(or_(User.is_superuser, User.is_staff)).where(User.id == request.state.user_id)
+        )
+        if not allowed:
+            raise HTTPException(status_code=403, detail="Superuser or staff privileges required")
+        return token
@@ -0,0 +1,221 @@
+import zlib
+from typing import Any, Callable
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.config import settings
+from utils.request_timing import timed
+
+try:
+    import zstandard
+except ImportError:  # zstd включается только при установленном пакете zstandard
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:  # br включается только при установленном пакете brotli
+    brotli = None
+
+
+class _ZlibCompressor:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliCompressor:
+    def __init__(self, level: int):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _ZstdCompressor:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+# Content-Encoding -> фабрика потокового компрессора. Кодеки без установленного пакета пропускаются
+CODECS: dict[str, Callable[[int], Any]] = {'gzip': _ZlibCompressor}
+if brotli is not None:
+    CODECS['br'] = _BrotliCompressor
+if zstandard is not None:
+    CODECS['zstd'] = _ZstdCompressor
+
+# Уровень кодека, для которого COMPRESSION_LEVELS не задает свой
+DEFAULT_LEVELS: dict[str, int] = {'zstd': 3, 'br': 4, 'gzip': 6}
+
+
+def negotiate_encoding(accept_encoding: str, preferred: list[str]) -> str | None:
+    """
+    Выбрать кодек по Accept-Encoding: максимальный q, при равенстве - порядок preferred
+
+    :param accept_encoding: значение заголовка
+    :param preferred: доступные кодеки в порядке предпочтения сервера
+    :return: None, если клиент не принимает ни один из них
+    """
+    weights: dict[str, float] = {}
+    for item in accept_encoding.lower().split(','):
+        name, _, params = item.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip()] = q
+
+    best, best_q = None, 0.0
+    for name in preferred:
+        q = weights.get(name, weights.get('*', 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+class CompressionMiddleware:
+    """
+    Потоковое сжатие ответов zstd / br / gzip по Accept-Encoding.
+
+    Не сжимаются тела меньше COMPRESSION_MIN_SIZE, ответы с Content-Encoding
+    и уже сжатые типы (COMPRESSION_EXCLUDED_TYPES). Уровень задается по кодеку
+    (COMPRESSION_LEVELS) и может переопределяться по префиксу пути (COMPRESSION_ROUTE_LEVELS).
+    Куски от COMPRESSION_THREAD_MIN_SIZE сжимаются в пуле потоков, чтобы не держать event loop:
+    zlib, brotli и zstandard отпускают GIL.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int | None = None,
+        thread_minimum_size: int | None = None,
+        encodings: list[str] | None = None,
+        levels: dict[str, int] | None = None,
+        route_levels: dict[str, dict[str, int]] | None = None,
+        excluded_types: list[str] | None = None,
+    ):
+        self.app = app
+        self.minimum_size = settings.COMPRESSION_MIN_SIZE if minimum_size is None else minimum_size
+        self.thread_minimum_size = (
+            settings.COMPRESSION_THREAD_MIN_SIZE if thread_minimum_size is None else thread_minimum_size
+        )
+        self.encodings = [
+            name for name in (encodings or settings.COMPRESSION_ENCODINGS) if name in CODECS
+        ]
+        self.levels = {**DEFAULT_LEVELS, **(levels or settings.COMPRESSION_LEVELS)}
+        route_levels = settings.COMPRESSION_ROUTE_LEVELS if route_levels is None else route_levels
+        # Самый длинный префикс проверяется первым
+        self.route_levels = sorted(route_levels.items(), key=lambda item: len(item[0]), reverse=True)
+        self.excluded_types = tuple(
+            settings.COMPRESSION_EXCLUDED_TYPES if excluded_types is None else excluded_types
+        )
+
+    def level_for(self, path: str, encoding: str) -> int:
+        for prefix, levels in self.route_levels:
+            if path.startswith(prefix) and encoding in levels:
+                return levels[encoding]
+        return self.levels[encoding]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get('accept-encoding', ''), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(self, encoding, self.level_for(scope['path'], encoding), send)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, level: int, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.level = level
+        self.downstream = send
+        self.start_message: Message | None = None
+        self.compressor = None
+        self.passthrough = False
+
+    async def _compress(self, data: bytes, finish: bool) -> bytes:
+        compressor = self.compressor
+
+        def run() -> bytes:
+            chunk = compressor.compress(data)
+            return chunk + compressor.finish() if finish else chunk
+
+        with timed('compression'):
+            if len(data) >= self.middleware.thread_minimum_size:
+                return await anyio.to_thread.run_sync(run)
+            return run()
+
+    def _compressible(self, headers: Headers) -> bool:
+        if 'content-encoding' in headers:
+            return False
+        content_type = headers.get('content-type', '').lower()
+        return not content_type.startswith(self.middleware.excluded_types)
+
+    async def send(self, message: Message) -> None:
+        if self.passthrough:
+            await self.downstream(message)
+            return
+
+        if message['type'] == 'http.response.start':
+            # Заголовки отправляются вместе с первым куском тела, когда станет ясно, сжимать ли его
+            self.start_message = message
+            if not self._compressible(Headers(raw=message['headers'])):
+                self.passthrough = True
+                await self.downstream(message)
+            return
+
+        if message['type'] != 'http.response.body':
+            await self.downstream(message)
+            return
+
+        body = message.get('body', b'')
+        more_body = message.get('more_body', False)
+
+        if self.compressor is None:
+            if not more_body and len(body) < self.middleware.minimum_size:
+                self.passthrough = True
+                await self.downstream(self.start_message)
+                await self.downstream(message)
+                return
+
+            self.compressor = CODECS[self.encoding](self.level)
+            headers = MutableHeaders(raw=self.start_message['headers'])
+            headers['Content-Encoding'] = self.encoding
+            headers.add_vary_header('Accept-Encoding')
+            body = await self._compress(body, finish=not more_body)
+            if more_body:
+                del headers['Content-Length']
+            else:
+                headers['Content-Length'] = str(len(body))
+            await self.downstream(self.start_message)
+            await self.downstream({'type': 'http.response.body', 'body': body, 'more_body': more_body})
+            return
+
+        body = await self._compress(body, finish=not more_body)
+        if body or not more_body:
+            await self.downstream({'type': 'http.response.body', 'body': body, 'more_body': more_body})
@@ -0,0 +1,149 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.config import settings
+from utils.serializer import MsgSpecJSONResponse
+
+__all__ = ['AIMDLimiter', 'ConcurrencyLimitMiddleware', 'concurrency_limiters', 'PRIORITY_GROUP', 'DEFAULT_GROUP']
+
+PRIORITY_GROUP = 'priority'
+DEFAULT_GROUP = 'default'
+
+
+class AIMDLimiter:
+    """
+    Адаптивный лимит одновременных запросов (additive increase / multiplicative decrease).
+
+    Быстрый успешный ответ при загрузке не меньше половины лимита поднимает лимит на
+    ``1 / limit``: за окно из ``limit`` ответов (примерно один круг запросов) лимит растет на 1,
+    а не на число ответов, и после снижения возвращается постепенно.
+    Ответ медленнее ``latency_target`` или 5xx умножает лимит на ``backoff_ratio``, но не чаще
+    раза за ``latency_target``: иначе одна пачка медленных ответов сразу роняет лимит до минимума.
+    Когда Postgres замедляется, лимит падает, и лишние запросы сразу получают 503,
+    а не ждут в event loop до таймаута.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int,
+        min_limit: int,
+        max_limit: int,
+        latency_target: float,
+        backoff_ratio: float,
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.backoff_ratio = backoff_ratio
+        self.in_flight = 0
+        self.accepted = 0
+        self.shed = 0
+        self._backoff_at = 0.0
+
+    def try_acquire(self) -> bool:
+        if self.in_flight >= int(self.limit):
+            self.shed += 1
+            return False
+        self.in_flight += 1
+        self.accepted += 1
+        return True
+
+    def release(self, latency: float, dropped: bool = False) -> None:
+        """
+        :param latency: сек от начала запроса до заголовков ответа
+        :param dropped: ответ 5xx или исключение
+        :return:
+        """
+        in_flight = self.in_flight
+        self.in_flight -= 1
+        if dropped or latency > self.latency_target:
+            now = time.monotonic()
+            if now - self._backoff_at >= self.latency_target:
+                self._backoff_at = now
+                self.limit = max(float(self.min_limit), self.limit * self.backoff_ratio)
+        elif in_flight * 2 >= self.limit:
+            self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+
+
+def make_limiter() -> AIMDLimiter:
+    return AIMDLimiter(
+        initial_limit=settings.CONCURRENCY_INITIAL_LIMIT,
+        min_limit=settings.CONCURRENCY_MIN_LIMIT,
+        max_limit=settings.CONCURRENCY_MAX_LIMIT,
+        latency_target=settings.CONCURRENCY_LATENCY_TARGET_MS / 1000,
+        backoff_ratio=settings.CONCURRENCY_BACKOFF_RATIO,
+    )
+
+
+# Группа маршрутов -> лимитер. Общие для воркера, читаются в /metrics
+concurrency_limiters: dict[str, AIMDLimiter] = {}
+
+
+class ConcurrencyLimitMiddleware:
+    """
+    Адаптивный лимит одновременных запросов по группам маршрутов.
+
+    Группа определяется по самому длинному префиксу пути из CONCURRENCY_ROUTE_GROUPS.
+    Пути из CONCURRENCY_PRIORITY_PATHS (health, обновление токена, метрики) идут
+    в отдельную группу и не конкурируют с обычными запросами. Сверх лимита сразу
+    отвечаем 503 с Retry-After.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        route_groups: dict[str, str] | None = None,
+        priority_paths: list[str] | None = None,
+        limiters: dict[str, AIMDLimiter] | None = None,
+    ):
+        self.app = app
+        route_groups = settings.CONCURRENCY_ROUTE_GROUPS if route_groups is None else route_groups
+        self.route_groups = sorted(route_groups.items(), key=lambda item: len(item[0]), reverse=True)
+        self.priority_paths = frozenset(
+            settings.CONCURRENCY_PRIORITY_PATHS if priority_paths is None else priority_paths
+        )
+        self.limiters = concurrency_limiters if limiters is None else limiters
+        for group in {PRIORITY_GROUP, DEFAULT_GROUP, *route_groups.values()}:
+            self.limiters.setdefault(group, make_limiter())
+
+    def group_for(self, path: str) -> str:
+        if path in self.priority_paths:
+            return PRIORITY_GROUP
+        for prefix, group in self.route_groups:
+            if path.startswith(prefix):
+                return group
+        return DEFAULT_GROUP
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        limiter = self.limiters[self.group_for(scope['path'])]
+        if not limiter.try_acquire():
+            response = MsgSpecJSONResponse(
+                {'detail': 'Service Unavailable'},
+                status_code=503,
+                headers={'Retry-After': str(settings.CONCURRENCY_RETRY_AFTER)},
+            )
+            await response(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        latency = None
+        dropped = True
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal latency, dropped
+            if message['type'] == 'http.response.start':
+                # Задержка до заголовков: длинная потоковая выгрузка не должна снижать лимит
+                latency = time.perf_counter() - started
+                dropped = message['status'] >= 500
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            limiter.release(time.perf_counter() - started if latency is None else latency, dropped)
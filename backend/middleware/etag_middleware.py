@@ -0,0 +1,62 @@
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from utils.etag import etag_matches, make_etag
+
+# Заголовки, которые сохраняются в ответе 304 (RFC 9110, 15.4.5)
+NOT_MODIFIED_HEADERS = frozenset((b'cache-control', b'content-location', b'date', b'etag', b'expires', b'vary'))
+
+
+class ETagMiddleware:
+    """
+    Слабый ETag для успешных GET ответов и 304 по If-None-Match.
+
+    ETag берется из заголовка ответа, из request.state.etag (см. utils.etag.etag_validator)
+    или считается по телу. Потоковые ответы (тело из нескольких сообщений) проходят без ETag.
+    Стоит ближе к приложению, чем сжатие, чтобы хэш считался по несжатому телу.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http' or scope['method'] not in ('GET', 'HEAD'):
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = Headers(scope=scope).get('if-none-match')
+        start_message: Message | None = None
+        passthrough = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message['type'] == 'http.response.start':
+                if message['status'] != 200:
+                    passthrough = True
+                    await send(message)
+                else:
+                    start_message = message
+                return
+
+            if message.get('more_body', False):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start_message['headers'])
+            etag = headers.get('etag') or scope.get('state', {}).get('etag') or make_etag(message.get('body', b''))
+            headers['ETag'] = etag
+            if etag_matches(if_none_match, etag):
+                raw = [(name, value) for name, value in start_message['headers'] if name in NOT_MODIFIED_HEADERS]
+                await send({'type': 'http.response.start', 'status': 304, 'headers': raw})
+                await send({'type': 'http.response.body', 'body': b''})
+                return
+            await send(start_message)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,49 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.metrics import http_request_duration_seconds, http_requests_total
+
+UNMATCHED_ROUTE = '<unmatched>'
+
+
+class MetricsMiddleware:
+    """
+    Число ответов и гистограмма задержки по шаблону маршрута (/user/{id}, а не /user/7),
+    чтобы число серий не зависело от значений в пути.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._route_paths: dict | None = None
+
+    def _route_path(self, scope: Scope) -> str:
+        # Роутер кладет в scope только endpoint, шаблон пути берется из таблицы маршрутов
+        if self._route_paths is None:
+            self._route_paths = {
+                route.endpoint: route.path
+                for route in scope['app'].routes
+                if getattr(route, 'endpoint', None) is not None
+            }
+        return self._route_paths.get(scope.get('endpoint'), UNMATCHED_ROUTE)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = self._route_path(scope)
+            http_request_duration_seconds.labels(scope['method'], route).observe(time.perf_counter() - started)
+            http_requests_total.labels(scope['method'], route, status_code).inc()
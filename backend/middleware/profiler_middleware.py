@@ -0,0 +1,123 @@
+import os
+import re
+import threading
+import time
+
+import anyio
+from sqlalchemy import select
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from common.log import log
+from common.security.jwt import decode_jwt
+from core.config import settings
+from core.db import async_db_session
+from core.path_conf import PROFILE_DIR
+from models.user import User
+from utils.profiler import PROFILE_FORMATS, StackSampler, write_collapsed, write_speedscope
+from utils.request_timing import (
+    finish_request_timing,
+    get_request_timings,
+    server_timing_header,
+    start_request_timing,
+)
+from utils.timezone import timezone
+
+
+class ProfilerMiddleware:
+    """
+    Профилирование отдельного запроса по заголовку PROFILER_HEADER.
+
+    Разрешено при ENVIRONMENT='dev' или суперпользователю (по Bearer токену).
+    Запрос выполняется под сэмплирующим профилировщиком, профиль пишется в
+    PROFILE_DIR в формате speedscope или collapsed (значение заголовка).
+    В ответе: X-Profile-Artifact - путь к файлу, X-Profile-Breakdown - время
+    обработчика, SQL, Redis и сериализации в формате Server-Timing.
+    Одновременно в воркере профилируется только один запрос.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._active = False
+        self._header = settings.PROFILER_HEADER.lower()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http' or self._active:
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        requested = headers.get(self._header)
+        if not requested or not await self._allowed(headers):
+            await self.app(scope, receive, send)
+            return
+
+        self._active = True
+        try:
+            await self._profile(scope, receive, send, requested.strip().lower())
+        finally:
+            self._active = False
+
+    @staticmethod
+    async def _allowed(headers: Headers) -> bool:
+        """
+        Профилировать можно в dev или по access токену суперпользователя.
+        Ошибка проверки (БД, Redis) не должна ронять запрос: он выполняется без профиля
+        """
+        if settings.ENVIRONMENT == 'dev':
+            return True
+        scheme, _, token = headers.get('authorization', '').partition(' ')
+        if scheme.lower() != 'bearer' or not token.strip():
+            return False
+        try:
+            payload = await decode_jwt(token.strip())
+            if not payload:
+                return False
+            async with async_db_session() as session:
+                return bool(await session.scalar(select(User.is_superuser).where(User.id == payload['user_id'])))
+        except Exception as e:
+            log.warning('Profiler access check failed, request is not profiled: {}', e)
+            return False
+
+    async def _profile(self, scope: Scope, receive: Receive, send: Send, requested: str) -> None:
+        profile_format = requested if requested in PROFILE_FORMATS else settings.PROFILER_FORMAT
+        extension = 'speedscope.json' if profile_format == 'speedscope' else 'collapsed.txt'
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', scope['path']).strip('_') or 'root'
+        filename = f"{timezone.now().strftime('%Y%m%d-%H%M%S-%f')}-{scope['method']}-{slug}.{extension}"
+        path = os.path.join(PROFILE_DIR, filename)
+
+        timing_token = start_request_timing() if get_request_timings() is None else None
+        timings = get_request_timings()
+        started = time.perf_counter()
+        sampler = StackSampler(threading.get_ident(), settings.PROFILER_INTERVAL_MS / 1000)
+        breakdown = ''
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal breakdown
+            if message['type'] == 'http.response.start':
+                total = time.perf_counter() - started
+                # Время обработчика - все, что не SQL, Redis, сериализация и сжатие
+                handler = max(0.0, total - sum(timings.values()))
+                breakdown = server_timing_header(total, {'handler': handler, **timings}).decode('latin-1')
+                headers = MutableHeaders(scope=message)
+                headers.append('X-Profile-Artifact', os.path.join('profiles', filename))
+                headers.append('X-Profile-Breakdown', breakdown)
+            await send(message)
+
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.stop()
+            if timing_token is not None:
+                finish_request_timing(timing_token)
+            name = f"{scope['method']} {scope['path']} {breakdown}"
+            await anyio.to_thread.run_sync(self._write, path, sampler, profile_format, name)
+            log.info('Profile of {} {} written to {}', scope['method'], scope['path'], path)
+
+    @staticmethod
+    def _write(path: str, sampler: StackSampler, profile_format: str, name: str) -> None:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        if profile_format == 'speedscope':
+            write_speedscope(path, sampler, name)
+        else:
+            write_collapsed(path, sampler)
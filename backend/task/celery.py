@@ -1,6 +1,11 @@
+import time
+from collections import OrderedDict
+
 from celery import Celery
+from celery.signals import after_task_publish, before_task_publish
 
 from core.config import settings
+from core.metrics import observe_backend
 from task.conf import task_settings
 
 
@@ -59,5 +64,26 @@ def init_celery() -> Celery:
     return app
 
 
+# Время отправки задачи в брокер, по id задачи. Celery не шлет сигнал при ошибке публикации,
+# поэтому записи неудачных отправок вытесняются старейшими, когда их больше _PUBLISH_STARTED_MAXSIZE
+_PUBLISH_STARTED_MAXSIZE = 1024
+_publish_started: OrderedDict[str, float] = OrderedDict()
+
+
+@before_task_publish.connect
+def _before_task_publish(sender: str | None = None, headers: dict | None = None, **kwargs) -> None:
+    if headers and 'id' in headers:
+        _publish_started[headers['id']] = time.perf_counter()
+        while len(_publish_started) > _PUBLISH_STARTED_MAXSIZE:
+            _publish_started.popitem(last=False)
+
+
+@after_task_publish.connect
+def _after_task_publish(sender: str | None = None, headers: dict | None = None, **kwargs) -> None:
+    started = _publish_started.pop(headers.get('id'), None) if headers else None
+    if started is not None:
+        observe_backend('celery', f'publish:{sender}', time.perf_counter() - started)
+
+
 # 创建 celery 实例
 celery_app = init_celery()
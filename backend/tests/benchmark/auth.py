@@ -0,0 +1,278 @@
+"""
+Микро-бенчмарк горячего пути аутентификации.
+
+    python -m tests.benchmark.auth --iterations 2000 --output auth.json
+
+Redis и Postgres заменены локальными заглушками в памяти, HTTP запросы идут
+через ASGITransport без сети, поэтому измеряется только код приложения:
+подпись и проверка JWT, зависимость JWTBearer, bcrypt в пуле процессов
+и полные обработчики /user/login и /user/me. Результат - JSON со списком
+{name, iterations, rps, p50_ms, p99_ms, mean_ms} для сравнения между релизами.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import sys
+import time
+from contextlib import ExitStack
+from datetime import datetime
+from typing import Awaitable, Callable
+from unittest.mock import patch
+
+from httpx import ASGITransport, AsyncClient
+from starlette.requests import Request
+
+from common.security.jwt import decode_jwt, sign_jwt
+from common.security.password import hash_password, password_hash_pool
+from common.security.token_cache import token_cache
+from core.config import settings
+from core.db import get_db, get_db_read
+from core.db_redis import redis_client
+from middleware.auth_jwt_middleware import JWTBearer
+from models.user import User
+
+BENCH_EMAIL = 'bench@example.com'
+BENCH_PASSWORD = 'bench-Passw0rd'
+
+
+class FakePipeline:
+    def __init__(self, redis: 'FakeRedis'):
+        self._redis = redis
+        self._commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name: str):
+        def command(*args, **kwargs):
+            self._commands.append((name, args, kwargs))
+            return self
+        return command
+
+    async def execute(self) -> list:
+        return [await getattr(self._redis, name)(*args, **kwargs) for name, args, kwargs in self._commands]
+
+
+class FakeRedis:
+    """Команды Redis, которые вызываются на измеряемом пути, поверх dict"""
+
+    def __init__(self):
+        self.data: dict[str, object] = {}
+
+    async def get(self, key: str):
+        return self.data.get(key)
+
+    async def setex(self, key: str, ttl: int, value):
+        self.data[key] = value
+        return True
+
+    async def delete(self, *keys: str) -> int:
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    async def zadd(self, key: str, mapping: dict) -> int:
+        self.data.setdefault(key, {}).update(mapping)
+        return len(mapping)
+
+    async def zrem(self, key: str, *members: str) -> int:
+        index = self.data.get(key, {})
+        return sum(index.pop(member, None) is not None for member in members)
+
+    async def zremrangebyscore(self, key: str, low, high) -> int:
+        return 0
+
+    async def expire(self, key: str, ttl: int) -> bool:
+        return True
+
+    async def publish(self, channel: str, message: str) -> int:
+        return 0
+
+    async def evalsha(self, sha: str, numkeys: int, *keys_and_args):
+        # Единственный скрипт на пути входа - ограничение попыток: лимит не исчерпан
+        return [0] * numkeys
+
+    def pipeline(self, transaction: bool = True) -> FakePipeline:
+        return FakePipeline(self)
+
+
+class FakeResult:
+    def __init__(self, value):
+        self._value = value
+
+    def scalar(self):
+        return self._value
+
+    def scalar_one_or_none(self):
+        return self._value
+
+    def one(self):
+        # Строка версии для etag_validator на /user/me: (число строк, время изменения)
+        return 1, self._value.updated_time or self._value.created_time
+
+
+class FakeSession:
+    """AsyncSession, который на любой запрос возвращает одного пользователя"""
+
+    def __init__(self, user: User):
+        self.user = user
+        self.info = {}
+
+    async def execute(self, *args, **kwargs) -> FakeResult:
+        return FakeResult(self.user)
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+def make_user() -> User:
+    user = User(
+        username='bench',
+        email=BENCH_EMAIL,
+        password=hash_password(BENCH_PASSWORD),
+        refresh_token=None,
+    )
+    user.id = 1
+    user.created_time = datetime(2024, 1, 1)
+    user.updated_time = None
+    user.permissions = []
+    return user
+
+
+def summarize(name: str, timings: list[float], total: float) -> dict:
+    timings = sorted(timings)
+    return {
+        'name': name,
+        'iterations': len(timings),
+        'rps': round(len(timings) / total, 1),
+        'p50_ms': round(statistics.median(timings) * 1000, 4),
+        'p99_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000, 4),
+        'mean_ms': round(statistics.fmean(timings) * 1000, 4),
+    }
+
+
+async def measure(name: str, fn: Callable[[], Awaitable], iterations: int, warmup: int = 10) -> dict:
+    """
+    Последовательные вызовы fn: задержка каждого вызова и пропускная способность
+
+    :param name:
+    :param fn:
+    :param iterations:
+    :param warmup: вызовы до начала замеров
+    :return:
+    """
+    for _ in range(warmup):
+        await fn()
+    timings = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        call_started = time.perf_counter()
+        await fn()
+        timings.append(time.perf_counter() - call_started)
+    return summarize(name, timings, time.perf_counter() - started)
+
+
+def make_request(token: str) -> Request:
+    return Request({
+        'type': 'http',
+        'method': 'GET',
+        'path': f'{settings.API_V1_STR}/user/me',
+        'headers': [(b'authorization', f'Bearer {token}'.encode())],
+        'query_string': b'',
+    })
+
+
+async def run(iterations: int, password_iterations: int) -> list[dict]:
+    from core.register import register_app
+
+    fake_redis = FakeRedis()
+    user = make_user()
+
+    async def override_get_db():
+        yield FakeSession(user)
+
+    app = register_app()
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_db_read] = override_get_db
+
+    results = []
+    with ExitStack() as stack:
+        for name in ('get', 'setex', 'delete', 'publish', 'evalsha', 'pipeline'):
+            stack.enter_context(patch.object(redis_client, name, getattr(fake_redis, name)))
+        password_hash_pool.start()
+        try:
+            token = (await sign_jwt(user_id=user.id))['access_token']
+            bearer = JWTBearer()
+
+            results.append(await measure('sign_jwt', lambda: sign_jwt(user_id=user.id), iterations))
+
+            async def decode_cold():
+                token_cache.clear()
+                await decode_jwt(token)
+
+            results.append(await measure('decode_jwt_cold', decode_cold, iterations))
+            results.append(await measure('decode_jwt_cached', lambda: decode_jwt(token), iterations))
+            results.append(await measure('jwt_bearer', lambda: bearer(make_request(token)), iterations))
+
+            from common.security.jwt import password_verify
+            results.append(await measure(
+                'password_verify',
+                lambda: password_verify(BENCH_PASSWORD, user.password),
+                password_iterations,
+                warmup=2,
+            ))
+
+            transport = ASGITransport(app=app, client=('127.0.0.1', 50000))
+            async with AsyncClient(transport=transport, base_url='http://bench') as client:
+                login_body = {'email': BENCH_EMAIL, 'password': BENCH_PASSWORD}
+
+                async def login():
+                    response = await client.post(f'{settings.API_V1_STR}/user/login', json=login_body)
+                    assert response.status_code == 200, response.text
+
+                async def me():
+                    response = await client.get(
+                        f'{settings.API_V1_STR}/user/me',
+                        headers={'Authorization': f'Bearer {token}'},
+                    )
+                    assert response.status_code == 200, response.text
+
+                results.append(await measure('http_login', login, password_iterations, warmup=2))
+                results.append(await measure('http_me', me, iterations))
+        finally:
+            password_hash_pool.shutdown()
+    return results
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description='Authentication hot path benchmark')
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--password-iterations', type=int, default=50, help='for bcrypt based cases')
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args(argv)
+
+    report = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'password_hash_scheme': settings.PASSWORD_HASH_SCHEME,
+        'results': asyncio.run(run(args.iterations, args.password_iterations)),
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        sys.stdout.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -14,7 +14,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from tests.utils.db import get_db_for_test
 from tests.utils.logger_project import logging_config
-from core.db import get_db
+from core.db import get_db, get_db_read
 
 PYTEST_EMAIL = 'admin@mail.ru'
 PYTEST_PASSWORD = '123123'
@@ -96,6 +96,7 @@ def app(apply_migrations: None) -> TestClient:
 
     app = register_app()
     app.dependency_overrides[get_db] = get_db_for_test
+    app.dependency_overrides[get_db_read] = get_db_for_test
     return  TestClient(app)
 
 
@@ -0,0 +1,68 @@
+import unittest
+
+from httpx import ASGITransport, AsyncClient
+from starlette.applications import Starlette
+from starlette.responses import StreamingResponse
+from starlette.routing import Route
+
+from middleware.access_middleware import AccessMiddleware
+from utils.request_timing import add_timing, get_request_timings
+from utils.serializer import MsgSpecJSONResponse
+
+
+async def json_endpoint(request):
+    add_timing('db', 0.25)
+    return MsgSpecJSONResponse({'ok': True})
+
+
+async def stream_endpoint(request):
+    async def body():
+        yield b'first\n'
+        yield b'second\n'
+    return StreamingResponse(body(), media_type='text/plain')
+
+
+async def failing_endpoint(request):
+    raise RuntimeError('boom')
+
+
+app = Starlette(routes=[
+    Route('/json', json_endpoint),
+    Route('/stream', stream_endpoint),
+    Route('/fail', failing_endpoint),
+])
+app.add_middleware(AccessMiddleware)
+
+
+class TestAccessMiddleware(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.client = AsyncClient(transport=ASGITransport(app=app), base_url='http://test')
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    async def test_server_timing_header(self):
+        # act
+        response = await self.client.get('/json')
+
+        # assert
+        server_timing = response.headers['server-timing']
+        self.assertTrue(server_timing.startswith('total;dur='))
+        self.assertIn('db;dur=250.0', server_timing)
+        self.assertIn('serialization;dur=', server_timing)
+        self.assertIsNone(get_request_timings())
+
+    async def test_streaming_response_passes_through(self):
+        # act
+        response = await self.client.get('/stream')
+
+        # assert
+        self.assertEqual(b'first\nsecond\n', response.content)
+        self.assertIn('server-timing', response.headers)
+
+    async def test_unhandled_error_returns_500(self):
+        # act
+        response = await self.client.get('/fail')
+
+        # assert
+        self.assertEqual(500, response.status_code)
@@ -0,0 +1,103 @@
+import gzip
+import unittest
+
+from httpx import ASGITransport, AsyncClient
+from starlette.applications import Starlette
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+
+from middleware.compression_middleware import CompressionMiddleware, negotiate_encoding
+
+LARGE_BODY = b'{"items": [' + b'{"name": "permission"},' * 200 + b'{}]}'
+
+
+async def large_endpoint(request):
+    return Response(LARGE_BODY, media_type='application/json')
+
+
+async def small_endpoint(request):
+    return Response(b'{"ok": true}', media_type='application/json')
+
+
+async def image_endpoint(request):
+    return Response(LARGE_BODY, media_type='image/png')
+
+
+async def stream_endpoint(request):
+    async def body():
+        for _ in range(3):
+            yield LARGE_BODY
+    return StreamingResponse(body(), media_type='application/json')
+
+
+app = Starlette(routes=[
+    Route('/large', large_endpoint),
+    Route('/small', small_endpoint),
+    Route('/image', image_endpoint),
+    Route('/stream', stream_endpoint),
+])
+compressed_app = CompressionMiddleware(
+    app,
+    minimum_size=500,
+    thread_minimum_size=1024,
+    encodings=['gzip'],
+    levels={'gzip': 6},
+    route_levels={'/stream': {'gzip': 1}},
+)
+
+
+class CompressionMiddlewareTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.client = AsyncClient(transport=ASGITransport(app=compressed_app), base_url='http://test')
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    async def test_large_body_is_gzipped(self):
+        # act
+        response = await self.client.get('/large', headers={'Accept-Encoding': 'gzip'})
+
+        # assert
+        self.assertEqual(response.headers['content-encoding'], 'gzip')
+        self.assertEqual(response.headers['vary'], 'Accept-Encoding')
+        self.assertLess(int(response.headers['content-length']), len(LARGE_BODY))
+        self.assertEqual(response.content, LARGE_BODY)
+
+    async def test_small_and_compressed_types_are_untouched(self):
+        # act
+        small = await self.client.get('/small', headers={'Accept-Encoding': 'gzip'})
+        image = await self.client.get('/image', headers={'Accept-Encoding': 'gzip'})
+        identity = await self.client.get('/large', headers={'Accept-Encoding': 'identity'})
+
+        # assert
+        for response in (small, image, identity):
+            self.assertNotIn('content-encoding', response.headers)
+        self.assertEqual(image.content, LARGE_BODY)
+
+    async def test_streaming_body_is_compressed_in_chunks(self):
+        # act
+        async with self.client.stream('GET', '/stream', headers={'Accept-Encoding': 'gzip'}) as response:
+            raw = b''.join([chunk async for chunk in response.aiter_raw()])
+
+        # assert
+        self.assertEqual(response.headers['content-encoding'], 'gzip')
+        self.assertNotIn('content-length', response.headers)
+        self.assertEqual(gzip.decompress(raw), LARGE_BODY * 3)
+
+    def test_level_falls_back_to_codec_default(self):
+        # arrange
+        middleware = CompressionMiddleware(app, encodings=['gzip'], levels={'br': 5}, route_levels={})
+
+        # act
+        level = middleware.level_for('/large', 'gzip')
+
+        # assert
+        self.assertEqual(level, 6)
+
+    def test_negotiate_encoding(self):
+        # assert
+        self.assertEqual(negotiate_encoding('gzip, br, zstd', ['zstd', 'br', 'gzip']), 'zstd')
+        self.assertEqual(negotiate_encoding('zstd;q=0.5, gzip', ['zstd', 'gzip']), 'gzip')
+        self.assertEqual(negotiate_encoding('*', ['br', 'gzip']), 'br')
+        self.assertIsNone(negotiate_encoding('gzip;q=0', ['gzip']))
+        self.assertIsNone(negotiate_encoding('', ['gzip']))
@@ -0,0 +1,106 @@
+import asyncio
+import unittest
+
+from httpx import ASGITransport, AsyncClient
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from middleware.concurrency_middleware import AIMDLimiter, ConcurrencyLimitMiddleware
+
+release = asyncio.Event()
+
+
+async def slow_endpoint(request):
+    await release.wait()
+    return PlainTextResponse('slow')
+
+
+async def health_endpoint(request):
+    return PlainTextResponse('ok')
+
+
+app = Starlette(routes=[
+    Route('/api/slow', slow_endpoint),
+    Route('/health', health_endpoint),
+])
+
+
+def limiter(initial_limit: int = 2) -> AIMDLimiter:
+    return AIMDLimiter(initial_limit=initial_limit, min_limit=1, max_limit=4, latency_target=0.5, backoff_ratio=0.5)
+
+
+class AIMDLimiterTestCase(unittest.TestCase):
+    def test_fast_responses_under_load_raise_limit(self):
+        # arrange
+        aimd = limiter()
+
+        # act
+        for _ in range(10):
+            aimd.try_acquire()
+            aimd.try_acquire()
+            aimd.release(0.01)
+            aimd.release(0.01)
+
+        # assert
+        self.assertEqual(aimd.limit, 4)
+
+    def test_sustained_fast_burst_raises_limit_by_about_one_per_window(self):
+        # arrange
+        aimd = AIMDLimiter(initial_limit=10, min_limit=10, max_limit=1000, latency_target=0.5, backoff_ratio=0.9)
+
+        # act
+        for _ in range(1000):
+            while aimd.try_acquire():
+                pass
+            aimd.release(0.01)
+
+        # assert
+        # Каждый ответ добавляет 1 / limit: ~sqrt(2 * 1000) за 1000 ответов, а не +1000
+        self.assertGreater(aimd.limit, 40)
+        self.assertLess(aimd.limit, 60)
+
+    def test_slow_or_failed_response_backs_off_once_per_window(self):
+        # arrange
+        aimd = limiter(initial_limit=4)
+
+        # act
+        for _ in range(3):
+            aimd.try_acquire()
+        aimd.release(1.0)
+        aimd.release(0.01, dropped=True)
+
+        # assert
+        self.assertEqual(aimd.limit, 2)
+        self.assertTrue(aimd.try_acquire())
+        self.assertFalse(aimd.try_acquire())
+        self.assertEqual(aimd.shed, 1)
+
+
+class ConcurrencyLimitMiddlewareTestCase(unittest.IsolatedAsyncioTestCase):
+    async def test_requests_over_limit_are_shed_but_priority_lane_is_not(self):
+        # arrange
+        release.clear()
+        limiters = {'default': limiter(initial_limit=1), 'priority': limiter(initial_limit=1)}
+        middleware = ConcurrencyLimitMiddleware(
+            app, route_groups={}, priority_paths=['/health'], limiters=limiters
+        )
+
+        async with AsyncClient(transport=ASGITransport(app=middleware), base_url='http://test') as client:
+            first = asyncio.create_task(client.get('/api/slow'))
+            while limiters['default'].in_flight == 0:
+                await asyncio.sleep(0)
+
+            # act
+            shed = await client.get('/api/slow')
+            health = await client.get('/health')
+            release.set()
+            accepted = await first
+
+        # assert
+        self.assertEqual(shed.status_code, 503)
+        self.assertEqual(shed.headers['retry-after'], '1')
+        self.assertEqual(health.status_code, 200)
+        self.assertEqual(accepted.status_code, 200)
+        self.assertEqual(limiters['default'].shed, 1)
+        self.assertEqual(limiters['default'].in_flight, 0)
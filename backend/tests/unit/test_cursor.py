@@ -0,0 +1,17 @@
+import unittest
+
+from utils.cursor import decode_cursor, encode_cursor
+
+
+class TestCursor(unittest.TestCase):
+    def test_round_trip(self):
+        token = encode_cursor(after_id=42)
+
+        self.assertEqual(decode_cursor(token), {'after_id': 42})
+        self.assertNotIn('=', token)
+
+    def test_invalid_cursor(self):
+        for token in ('not a cursor', 'MTIz', '!!!'):
+            with self.subTest(token=token):
+                with self.assertRaises(ValueError):
+                    decode_cursor(token)
@@ -0,0 +1,36 @@
+import unittest
+from unittest.mock import MagicMock
+
+from sqlalchemy import exc
+from sqlalchemy.util import greenlet_spawn
+
+from core.db_pool import InstrumentedAsyncQueuePool
+
+
+class TestInstrumentedAsyncQueuePool(unittest.IsolatedAsyncioTestCase):
+    async def test_records_acquisitions(self):
+        # arrange
+        pool = InstrumentedAsyncQueuePool(MagicMock, pool_size=1, max_overflow=0, timeout=0.01)
+
+        # act
+        connection = await greenlet_spawn(pool.connect)
+
+        # assert
+        self.assertEqual(pool.stats.acquisitions, 1)
+        self.assertEqual(pool.checkedout(), 1)
+        await greenlet_spawn(connection.close)
+        self.assertEqual(pool.checkedout(), 0)
+
+    async def test_records_timeouts(self):
+        # arrange
+        pool = InstrumentedAsyncQueuePool(MagicMock, pool_size=1, max_overflow=0, timeout=0.01)
+        connection = await greenlet_spawn(pool.connect)
+
+        # act
+        with self.assertRaises(exc.TimeoutError):
+            await greenlet_spawn(pool.connect)
+
+        # assert
+        self.assertEqual(pool.stats.timeouts, 1)
+        self.assertGreater(pool.stats.wait_seconds_max, 0)
+        await greenlet_spawn(connection.close)
@@ -0,0 +1,83 @@
+import time
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+from redis.exceptions import ConnectionError
+
+from core.db_replica import Replica, ReplicaRouter
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data: dict[str, float] = {}
+
+    async def set(self, key: str, value, px: int = None):
+        self.data[key] = time.monotonic() + px / 1000
+
+    async def exists(self, key: str) -> int:
+        return int(self.data.get(key, 0) > time.monotonic())
+
+
+def make_router(replicas: list[Replica], redis=None) -> ReplicaRouter:
+    return ReplicaRouter(
+        replicas,
+        redis=redis or FakeRedis(),
+        sticky_prefix='sticky',
+        sticky_seconds=60,
+        max_lag=5,
+        check_interval=60,
+        retry_seconds=60,
+    )
+
+
+def make_replica() -> Replica:
+    # next_check в будущем, чтобы тест не ходил в базу
+    return Replica(engine=MagicMock(), session_maker=MagicMock(), next_check=float('inf'))
+
+
+class TestReplicaRouter(unittest.IsolatedAsyncioTestCase):
+    async def test_without_replicas_reads_from_primary(self):
+        router = make_router([])
+
+        self.assertIsNone(await router.choose('user:1'))
+
+    async def test_round_robin(self):
+        first, second = make_replica(), make_replica()
+        router = make_router([first, second])
+
+        self.assertIs(await router.choose('user:1'), first)
+        self.assertIs(await router.choose('user:1'), second)
+
+    async def test_read_your_writes(self):
+        # arrange
+        replica = make_replica()
+        redis = FakeRedis()
+        router = make_router([replica], redis)
+        other_worker = make_router([replica], redis)
+
+        # act
+        await router.mark_write('user:1')
+
+        # assert
+        self.assertIsNone(await other_worker.choose('user:1'))
+        self.assertIs(await other_worker.choose('user:2'), replica)
+
+    async def test_redis_failure_reads_from_primary(self):
+        # arrange
+        redis = MagicMock()
+        redis.exists = AsyncMock(side_effect=ConnectionError())
+        router = make_router([make_replica()], redis)
+
+        # act / assert
+        self.assertIsNone(await router.choose('user:1'))
+
+    async def test_unavailable_replica_falls_back_to_primary(self):
+        # arrange
+        replica = make_replica()
+        router = make_router([replica])
+
+        # act
+        router.mark_unavailable(replica)
+
+        # assert
+        self.assertIsNone(await router.choose('user:1'))
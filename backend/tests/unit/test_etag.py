@@ -0,0 +1,120 @@
+import unittest
+
+from fastapi import Depends, FastAPI, Request
+from httpx import ASGITransport, AsyncClient
+from starlette.responses import StreamingResponse
+
+from core.db import get_db_read
+from middleware.etag_middleware import ETagMiddleware
+from utils.etag import PRIVATE_CACHE_HEADERS, etag_matches, etag_validator, make_etag
+from utils.serializer import MsgSpecJSONResponse
+
+calls = {'version': 0, 'handler': 0}
+
+
+async def load_version(request: Request, db) -> tuple:
+    calls['version'] += 1
+    return 3, '2024-01-02 03:04:05'
+
+
+async def override_get_db_read():
+    yield None
+
+
+app = FastAPI()
+app.dependency_overrides[get_db_read] = override_get_db_read
+
+
+@app.get('/hashed')
+async def hashed():
+    calls['handler'] += 1
+    return MsgSpecJSONResponse({'items': [1, 2, 3]})
+
+
+@app.get('/validated', dependencies=[Depends(etag_validator(load_version))])
+async def validated():
+    calls['handler'] += 1
+    return MsgSpecJSONResponse({'items': [1, 2, 3]})
+
+
+async def set_user(request: Request):
+    request.state.user_id = int(request.headers['x-user'])
+
+
+@app.get('/private', dependencies=[Depends(set_user), Depends(etag_validator(load_version, private=True))])
+async def private():
+    calls['handler'] += 1
+    return MsgSpecJSONResponse({'items': [1, 2, 3]}, headers=PRIVATE_CACHE_HEADERS)
+
+
+@app.get('/stream')
+async def stream():
+    async def body():
+        yield b'first'
+        yield b'second'
+    return StreamingResponse(body())
+
+
+class ETagTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        calls.update(version=0, handler=0)
+        self.client = AsyncClient(transport=ASGITransport(app=ETagMiddleware(app)), base_url='http://test')
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    async def test_body_hash_etag_and_not_modified(self):
+        # act
+        first = await self.client.get('/hashed')
+        second = await self.client.get('/hashed', headers={'If-None-Match': first.headers['etag']})
+
+        # assert
+        self.assertEqual(first.headers['etag'], make_etag(first.content))
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.content, b'')
+        self.assertEqual(second.headers['etag'], first.headers['etag'])
+        self.assertNotIn('content-length', second.headers)
+
+    async def test_validator_answers_304_without_running_handler(self):
+        # act
+        first = await self.client.get('/validated')
+        second = await self.client.get('/validated', headers={'If-None-Match': first.headers['etag']})
+
+        # assert
+        self.assertEqual(first.status_code, 200)
+        self.assertNotEqual(first.headers['etag'], make_etag(first.content))
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.headers['etag'], first.headers['etag'])
+        self.assertEqual(calls, {'version': 2, 'handler': 1})
+
+    async def test_private_validator_etag_depends_on_user(self):
+        # act
+        first = await self.client.get('/private', headers={'X-User': '1'})
+        other = await self.client.get('/private', headers={'X-User': '2', 'If-None-Match': first.headers['etag']})
+        second = await self.client.get('/private', headers={'X-User': '1', 'If-None-Match': first.headers['etag']})
+
+        # assert
+        self.assertEqual(other.status_code, 200)
+        self.assertNotEqual(other.headers['etag'], first.headers['etag'])
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.headers['cache-control'], 'private')
+        self.assertEqual(second.headers['vary'], 'Authorization')
+
+    async def test_streaming_response_has_no_etag(self):
+        # act
+        response = await self.client.get('/stream')
+
+        # assert
+        self.assertEqual(response.content, b'firstsecond')
+        self.assertNotIn('etag', response.headers)
+
+    def test_etag_matches(self):
+        # arrange
+        etag = make_etag(b'body')
+
+        # assert
+        self.assertTrue(etag_matches(etag.removeprefix('W/'), etag))
+        self.assertTrue(etag_matches(f'"other", {etag}', etag))
+        self.assertTrue(etag_matches('*', etag))
+        self.assertFalse(etag_matches('"other"', etag))
+        self.assertFalse(etag_matches(None, etag))
@@ -1,8 +1,30 @@
 import unittest
 import logging
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 
-from common.security.jwt import sign_jwt, decode_jwt
+import msgspec
+from fastapi import HTTPException
+from starlette.requests import Request
+
+try:
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+except ImportError:
+    serialization = None
+
+from common.exception.errors import TokenError
+from common.security.jwt_keys import JWTKeySet
+from common.security.token_cache import session_generations
+from core.config import settings
+from common.security.jwt import (
+    create_jwt_refresh_token,
+    decode_jwt,
+    decode_jwt_stateless,
+    decode_refresh_jwt,
+    rotate_token_pair_redis,
+    sign_jwt,
+)
+from middleware.auth_jwt_middleware import JWTBearer, StaffJWTBearer
 from common.log import logger
 
 
@@ -14,6 +36,15 @@ logging.basicConfig(
 )
 
 
+def _bearer_request(token: str) -> Request:
+    return Request({
+        'type': 'http',
+        'method': 'GET',
+        'path': '/api/v1/user/me',
+        'headers': [(b'authorization', f'Bearer {token}'.encode())],
+    })
+
+
 class TestJWT(unittest.IsolatedAsyncioTestCase):
     async def test_jwt(self):
         # arrange
@@ -32,10 +63,156 @@ class TestJWT(unittest.IsolatedAsyncioTestCase):
 
         # act
         with patch('common.security.jwt.redis_client') as redis_client:
-            redis_client.get.return_value = "veryVerySecretKey"
+            redis_client.get = AsyncMock(return_value="veryVerySecretKey")
             result = await decode_jwt(token_info["access_token"])
             logger.info(result)
 
         # assert
         self.assertEqual(user_id, token_info["user_id"])
         self.assertEqual(redis_client.get.call_count, 1)
+
+    async def test_decode_jwt_checks_session_generation(self):
+        # arrange
+        token_info = await sign_jwt(user_id=712)
+
+        # act
+        with patch('common.security.jwt.redis_client') as redis_client:
+            redis_client.get = AsyncMock(return_value=None)
+            result = await decode_jwt(token_info["access_token"])
+
+        # assert
+        self.assertEqual(token_info["jti"], result["jti"])
+        redis_client.get.assert_awaited_once_with(f'{settings.TOKEN_GENERATION_REDIS_PREFIX}:712')
+
+    async def test_decode_jwt_rejects_revoked_generation(self):
+        # arrange
+        token_info = await sign_jwt(user_id=713, gen=0)
+        session_generations.put(713, 1)
+
+        # act
+        with patch('common.security.jwt.redis_client') as redis_client:
+            result = await decode_jwt(token_info["access_token"])
+
+        # assert
+        self.assertEqual({}, result)
+        redis_client.get.assert_not_called()
+
+    async def test_rotate_token_pair_returns_pair_of_concurrent_refresh(self):
+        # arrange
+        old = await sign_jwt(user_id=7)
+        old_refresh = await create_jwt_refresh_token(user_id=7)
+        issued = ["access", "2024-01-01 00:00:00", "refresh", "2024-01-08 00:00:00"]
+
+        # act
+        with patch('common.security.jwt.rotate_refresh_token_script', AsyncMock(return_value=[0, msgspec.json.encode(issued).decode()])), \
+                patch('common.security.jwt.get_session_generation', AsyncMock(return_value=0)):
+            result = await rotate_token_pair_redis("7", old_refresh["refresh_token"])
+
+        # assert
+        self.assertEqual(tuple(issued), result)
+
+    async def test_rotate_token_pair_rejects_used_refresh_token(self):
+        # arrange
+        old = await sign_jwt(user_id=7)
+        old_refresh = await create_jwt_refresh_token(user_id=7)
+
+        # act / assert
+        with patch('common.security.jwt.rotate_refresh_token_script', AsyncMock(return_value=[-1])), \
+                patch('common.security.jwt.get_session_generation', AsyncMock(return_value=0)):
+            with self.assertRaises(TokenError):
+                await rotate_token_pair_redis("7", old_refresh["refresh_token"])
+
+    async def test_decode_jwt_rejects_refresh_token(self):
+        # arrange
+        refresh = await create_jwt_refresh_token(user_id=714)
+
+        # act
+        with patch('common.security.jwt.get_session_generation', AsyncMock(return_value=0)):
+            result = await decode_jwt(refresh["refresh_token"])
+
+        # assert
+        self.assertFalse(result)
+
+    async def test_decode_refresh_jwt_rejects_access_token(self):
+        # arrange
+        access = await sign_jwt(user_id=715)
+
+        # act
+        result = await decode_refresh_jwt(access["access_token"])
+
+        # assert
+        self.assertEqual({}, result)
+
+    async def test_jwt_bearer_rejects_refresh_token(self):
+        # arrange
+        refresh = await create_jwt_refresh_token(user_id=716)
+        request = _bearer_request(refresh["refresh_token"])
+
+        # act / assert
+        with patch('common.security.jwt.get_session_generation', AsyncMock(return_value=0)):
+            with self.assertRaises(HTTPException) as error:
+                await JWTBearer(stateless=False)(request)
+        self.assertEqual(401, error.exception.status_code)
+
+    async def test_rotate_token_pair_rejects_access_token_as_refresh(self):
+        # arrange
+        old = await sign_jwt(user_id=7)
+        script = AsyncMock(return_value=[1])
+
+        # act / assert
+        with patch('common.security.jwt.rotate_refresh_token_script', script), \
+                patch('common.security.jwt.get_session_generation', AsyncMock(return_value=0)):
+            with self.assertRaises(TokenError):
+                await rotate_token_pair_redis("7", old["access_token"])
+        script.assert_not_called()
+
+    async def test_stateless_jwt_bearer_rejects_refresh_token(self):
+        # arrange
+        access = await sign_jwt(user_id=717)
+        refresh = await create_jwt_refresh_token(user_id=717)
+
+        # act
+        with self.assertRaises(HTTPException) as error:
+            await JWTBearer(stateless=True)(_bearer_request(refresh["refresh_token"]))
+        token = await JWTBearer(stateless=True)(_bearer_request(access["access_token"]))
+
+        # assert
+        self.assertEqual(401, error.exception.status_code)
+        self.assertEqual(access["access_token"], token)
+
+    async def test_staff_jwt_bearer_requires_privileged_user(self):
+        # arrange
+        access = await sign_jwt(user_id=718)
+        regular, staff = MagicMock(), MagicMock()
+        regular.scalar = AsyncMock(return_value=False)
+        staff.scalar = AsyncMock(return_value=True)
+
+        # act
+        with self.assertRaises(HTTPException) as error:
+            await StaffJWTBearer(stateless=True)(_bearer_request(access["access_token"]), regular)
+        token = await StaffJWTBearer(stateless=True)(_bearer_request(access["access_token"]), staff)
+
+        # assert
+        self.assertEqual(403, error.exception.status_code)
+        self.assertEqual(access["access_token"], token)
+
+    @unittest.skipIf(serialization is None, 'cryptography is not installed')
+    async def test_stateless_decode_with_key_set_checks_token_type(self):
+        # arrange
+        pem = Ed25519PrivateKey.generate().private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        ).decode()
+        keys = JWTKeySet('EdDSA', '', signing_kid='k1', private_keys={'k1': pem})
+
+        # act
+        with patch('common.security.jwt.jwt_keys', keys):
+            access = await sign_jwt(user_id=718)
+            refresh = await create_jwt_refresh_token(user_id=718)
+            access_payload = decode_jwt_stateless(access["access_token"])
+            refresh_payload = decode_jwt_stateless(refresh["refresh_token"])
+
+        # assert
+        self.assertEqual(718, access_payload["user_id"])
+        self.assertEqual({}, refresh_payload)
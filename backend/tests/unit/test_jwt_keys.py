@@ -0,0 +1,75 @@
+import unittest
+from unittest import mock
+
+import jwt
+import msgspec
+
+try:
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+except ImportError:
+    serialization = None
+
+from common.security.jwt_keys import JWTKeySet
+
+
+def _private_pem() -> str:
+    return Ed25519PrivateKey.generate().private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+
+
+class TestJWTKeySet(unittest.TestCase):
+    @unittest.skipIf(serialization is None, 'cryptography is not installed')
+    def test_token_signed_with_retired_key_is_still_accepted(self):
+        # arrange
+        old_pem, new_pem = _private_pem(), _private_pem()
+        old_keys = JWTKeySet('EdDSA', '', signing_kid='old', private_keys={'old': old_pem})
+        token = old_keys.encode({'user_id': 1})
+        old_public_pem = serialization.load_pem_private_key(old_pem.encode(), None).public_key().public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        ).decode()
+        keys = JWTKeySet('EdDSA', '', signing_kid='new', private_keys={'new': new_pem}, public_keys={'old': old_public_pem})
+
+        # act
+        payload = keys.decode(token)
+        new_token = keys.encode({'user_id': 2})
+
+        # assert
+        self.assertEqual(1, payload['user_id'])
+        self.assertEqual('new', jwt.get_unverified_header(new_token)['kid'])
+        self.assertEqual({'new', 'old'}, {key['kid'] for key in msgspec.json.decode(keys.jwks())['keys']})
+
+    @unittest.skipIf(serialization is None, 'cryptography is not installed')
+    def test_unknown_kid_is_rejected(self):
+        # arrange
+        token = JWTKeySet('EdDSA', '', signing_kid='other', private_keys={'other': _private_pem()}).encode({})
+        keys = JWTKeySet('EdDSA', '', signing_kid='main', private_keys={'main': _private_pem()})
+
+        # act / assert
+        with self.assertRaises(jwt.PyJWTError):
+            keys.decode(token)
+
+    def test_hs256_keeps_shared_secret_and_empty_jwks(self):
+        # arrange
+        keys = JWTKeySet('HS256', 'secret')
+
+        # act
+        payload = keys.decode(keys.encode({'user_id': 3}))
+
+        # assert
+        self.assertEqual(3, payload['user_id'])
+        self.assertEqual({'keys': []}, msgspec.json.decode(keys.jwks()))
+
+    def test_validate_fails_without_cryptography(self):
+        # arrange
+        keys = JWTKeySet('EdDSA', '', signing_kid='main', private_keys={'main': 'unused'})
+
+        # act / assert
+        with mock.patch('common.security.jwt_keys.serialization', None):
+            with self.assertRaises(RuntimeError):
+                keys.validate()
+        JWTKeySet('HS256', 'secret').validate()
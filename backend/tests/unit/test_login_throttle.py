@@ -0,0 +1,42 @@
+import unittest
+from unittest.mock import AsyncMock
+
+from common.exception.errors import TooManyRequestsError
+from common.security.login_throttle import LoginThrottle
+
+
+def throttle() -> LoginThrottle:
+    return LoginThrottle(prefix='test', window=60, email_limit=3, ip_limit=10, local_cache_size=100)
+
+
+class TestLoginThrottle(unittest.IsolatedAsyncioTestCase):
+    async def test_allowed_attempt_counts_email_and_ip(self):
+        # arrange
+        login_throttle = throttle()
+        login_throttle._script = AsyncMock(return_value=[0, 0])
+
+        # act
+        await login_throttle.check('John@Example.com', '10.0.0.1')
+
+        # assert
+        kwargs = login_throttle._script.await_args.kwargs
+        self.assertEqual(['test:email:john@example.com', 'test:ip:10.0.0.1'], kwargs['keys'])
+        self.assertEqual([3, 10], kwargs['args'][3:])
+        self.assertEqual(1, login_throttle.stats.allowed)
+
+    async def test_blocked_key_is_rejected_without_redis(self):
+        # arrange
+        login_throttle = throttle()
+        login_throttle._script = AsyncMock(side_effect=[[30_000, 0], [0, 0]])
+
+        # act
+        with self.assertRaises(TooManyRequestsError) as first:
+            await login_throttle.check('john@example.com', '10.0.0.1')
+        with self.assertRaises(TooManyRequestsError):
+            await login_throttle.check('john@example.com', '10.0.0.2')
+        await login_throttle.check('jane@example.com', '10.0.0.1')
+
+        # assert
+        self.assertEqual('31', first.exception.headers['Retry-After'])
+        self.assertEqual(2, login_throttle._script.await_count)
+        self.assertEqual((2, 1), (login_throttle.stats.rejected, login_throttle.stats.rejected_locally))
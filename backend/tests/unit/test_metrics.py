@@ -0,0 +1,46 @@
+import unittest
+
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from core.metrics import observe_backend, registry, render_metrics
+from middleware.metrics_middleware import MetricsMiddleware
+
+app = FastAPI()
+app.add_middleware(MetricsMiddleware)
+
+
+@app.get('/items/{item_id}')
+async def get_item(item_id: int):
+    return {'id': item_id}
+
+
+class TestMetrics(unittest.IsolatedAsyncioTestCase):
+    async def test_requests_are_labelled_by_route_template(self):
+        # arrange
+        labels = {'method': 'GET', 'route': '/items/{item_id}', 'status': '200'}
+        before = registry.get_sample_value('http_requests_total', labels) or 0
+
+        # act
+        async with AsyncClient(transport=ASGITransport(app=app), base_url='http://test') as client:
+            await client.get('/items/1')
+            await client.get('/items/2')
+            await client.get('/missing')
+
+        # assert
+        self.assertEqual(before + 2, registry.get_sample_value('http_requests_total', labels))
+        self.assertIsNotNone(registry.get_sample_value(
+            'http_requests_total', {'method': 'GET', 'route': '<unmatched>', 'status': '404'}
+        ))
+
+    def test_render_includes_backend_and_pool_metrics(self):
+        # arrange
+        observe_backend('redis', 'GET', 0.001)
+
+        # act
+        text = render_metrics().decode()
+
+        # assert
+        self.assertIn('backend_call_duration_seconds_count{backend="redis",operation="GET"}', text)
+        self.assertIn('db_pool_checked_out{engine="primary"}', text)
+        self.assertIn('password_hash_completed_total', text)
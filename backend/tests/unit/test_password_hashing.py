@@ -0,0 +1,31 @@
+import unittest
+
+from common.security.password import build_pwd_context
+
+
+class TestPasswordContext(unittest.TestCase):
+    def test_hash_with_other_rounds_needs_update(self):
+        # arrange
+        old_hash = build_pwd_context(bcrypt_rounds=4).hash('secret')
+        pwd_context = build_pwd_context(bcrypt_rounds=5)
+
+        # act / assert
+        self.assertTrue(pwd_context.verify('secret', old_hash))
+        self.assertTrue(pwd_context.needs_update(old_hash))
+        self.assertFalse(pwd_context.needs_update(pwd_context.hash('secret')))
+
+    def test_bcrypt_hash_is_upgraded_to_argon2(self):
+        # arrange
+        old_hash = build_pwd_context(bcrypt_rounds=4).hash('secret')
+        pwd_context = build_pwd_context(scheme='argon2', argon2_time_cost=1, argon2_memory_cost=1024, argon2_parallelism=1)
+
+        # act
+        new_hash = pwd_context.hash('secret')
+
+        # assert
+        self.assertTrue(pwd_context.needs_update(old_hash))
+        self.assertTrue(new_hash.startswith('$argon2'))
+
+    def test_unknown_scheme_is_rejected(self):
+        with self.assertRaises(ValueError):
+            build_pwd_context(scheme='md5_crypt')
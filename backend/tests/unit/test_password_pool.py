@@ -0,0 +1,41 @@
+import unittest
+
+from common.exception.errors import ServiceUnavailableError
+from common.security.password import PasswordHashPool, hash_password, verify_password
+
+
+class TestPasswordHashPool(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.pool = PasswordHashPool(workers=1, max_queue=0)
+
+    async def asyncTearDown(self):
+        self.pool.shutdown()
+
+    async def test_hash_and_verify(self):
+        # act
+        password_hash = await self.pool.run(hash_password, '123123')
+        is_verify = await self.pool.run(verify_password, '123123', password_hash)
+
+        # assert
+        self.assertTrue(is_verify)
+        self.assertEqual(self.pool.stats.completed, 2)
+        self.assertGreater(self.pool.stats.hash_seconds_total, 0)
+
+    async def test_rejects_when_queue_is_full(self):
+        # arrange
+        self.pool.stats.in_flight = 1
+
+        # act
+        with self.assertRaises(ServiceUnavailableError):
+            await self.pool.run(hash_password, '123123')
+
+        # assert
+        self.assertEqual(self.pool.stats.rejected, 1)
+
+    async def test_run_many_keeps_order(self):
+        # act
+        hashes = await self.pool.run_many(hash_password, [('first_password',), ('second_password',)])
+
+        # assert
+        self.assertTrue(verify_password('first_password', hashes[0]))
+        self.assertTrue(verify_password('second_password', hashes[1]))
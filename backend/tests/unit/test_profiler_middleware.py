@@ -0,0 +1,112 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from httpx import ASGITransport, AsyncClient
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from common.security.jwt import create_jwt_refresh_token, sign_jwt
+from middleware import profiler_middleware
+from middleware.profiler_middleware import ProfilerMiddleware
+from utils.request_timing import add_timing
+
+
+def busy_handler():
+    deadline = time.perf_counter() + 0.03
+    while time.perf_counter() < deadline:
+        pass
+
+
+async def slow_endpoint(request):
+    busy_handler()
+    add_timing('db', 0.01)
+    return PlainTextResponse('done')
+
+
+app = ProfilerMiddleware(Starlette(routes=[Route('/slow', slow_endpoint)]))
+
+
+class ProfilerMiddlewareTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.profile_dir = tempfile.TemporaryDirectory()
+        self.patch = patch.object(profiler_middleware, 'PROFILE_DIR', self.profile_dir.name)
+        self.patch.start()
+        self.client = AsyncClient(transport=ASGITransport(app=app), base_url='http://test')
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+        self.patch.stop()
+        self.profile_dir.cleanup()
+
+    async def test_speedscope_profile_and_breakdown(self):
+        # act
+        response = await self.client.get('/slow', headers={'X-Profile': 'speedscope'})
+
+        # assert
+        artifact = response.headers['x-profile-artifact']
+        self.assertTrue(artifact.startswith('profiles/'))
+        self.assertIn('handler;dur=', response.headers['x-profile-breakdown'])
+        self.assertIn('db;dur=10.0', response.headers['x-profile-breakdown'])
+        with open(os.path.join(self.profile_dir.name, os.path.basename(artifact))) as f:
+            document = json.load(f)
+        frame_names = {frame['name'] for frame in document['shared']['frames']}
+        self.assertIn('busy_handler', frame_names)
+        self.assertEqual(document['profiles'][0]['type'], 'sampled')
+
+    async def test_collapsed_profile(self):
+        # act
+        response = await self.client.get('/slow', headers={'X-Profile': 'collapsed'})
+
+        # assert
+        with open(os.path.join(self.profile_dir.name, os.path.basename(response.headers['x-profile-artifact']))) as f:
+            lines = f.read().splitlines()
+        self.assertTrue(any('busy_handler' in line for line in lines))
+        self.assertTrue(all(line.rsplit(' ', 1)[1].isdigit() for line in lines))
+
+    async def test_request_without_header_is_not_profiled(self):
+        # act
+        response = await self.client.get('/slow')
+
+        # assert
+        self.assertNotIn('x-profile-artifact', response.headers)
+        self.assertEqual(os.listdir(self.profile_dir.name), [])
+
+    async def test_refresh_token_does_not_allow_profiling(self):
+        # arrange
+        refresh = await create_jwt_refresh_token(user_id=1)
+        db_session = MagicMock()
+
+        # act
+        with patch.object(profiler_middleware.settings, 'ENVIRONMENT', 'prod'), \
+                patch.object(profiler_middleware, 'async_db_session', db_session), \
+                patch('common.security.jwt.get_session_generation', AsyncMock(return_value=0)):
+            response = await self.client.get(
+                '/slow', headers={'X-Profile': 'speedscope', 'Authorization': f'Bearer {refresh["refresh_token"]}'}
+            )
+
+        # assert
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('x-profile-artifact', response.headers)
+        db_session.assert_not_called()
+
+    async def test_failed_access_check_serves_request_without_profile(self):
+        # arrange
+        access = await sign_jwt(user_id=1)
+
+        # act
+        with patch.object(profiler_middleware.settings, 'ENVIRONMENT', 'prod'), \
+                patch.object(profiler_middleware, 'async_db_session', MagicMock(side_effect=OSError('db is down'))), \
+                patch('common.security.jwt.get_session_generation', AsyncMock(return_value=0)):
+            response = await self.client.get(
+                '/slow', headers={'X-Profile': 'speedscope', 'Authorization': f'Bearer {access["access_token"]}'}
+            )
+
+        # assert
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.text, 'done')
+        self.assertNotIn('x-profile-artifact', response.headers)
@@ -0,0 +1,223 @@
+import asyncio
+import unittest
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, patch
+
+from fastapi import Depends, FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from common.response.response_chema import response_base
+from common.response.response_code import CustomResponseCode
+from core.db import get_db_read
+from core.db_redis import redis_client
+from utils import response_cache as response_cache_module
+from utils.response_cache import LocalResponseCache, cache_response, response_cache
+
+calls = {'items': 0, 'failing': 0, 'slow': 0}
+sessions = {'request': [], 'handler': [], 'flight': []}
+
+app = FastAPI()
+
+
+async def override_get_db_read():
+    session = AsyncSession()
+    if calls.get('pinned'):
+        session.info['has_writes'] = True
+    sessions['request'].append(session)
+    yield session
+
+
+app.dependency_overrides[get_db_read] = override_get_db_read
+
+
+@asynccontextmanager
+async def flight_session():
+    session = AsyncSession()
+    sessions['flight'].append(session)
+    yield session
+
+
+@app.get('/items')
+@cache_response(ttl=60, tags=('items',))
+async def get_items(limit: int = 10):
+    calls['items'] += 1
+    return await response_base.success(data=list(range(limit)))
+
+
+@app.get('/slow')
+@cache_response(ttl=60)
+async def get_slow():
+    calls['slow'] += 1
+    await asyncio.sleep(0.05)
+    return await response_base.success(data='slow')
+
+
+@app.get('/session')
+@cache_response(ttl=60)
+async def get_with_session(db: AsyncSession = Depends(get_db_read)):
+    sessions['handler'].append(db)
+    return await response_base.success(data='session')
+
+
+@app.get('/failing')
+@cache_response(ttl=60, tags=('items',))
+async def get_failing():
+    calls['failing'] += 1
+    return await response_base.fail(res=CustomResponseCode.HTTP_500, data='boom')
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data: dict[str, str] = {}
+
+    async def get(self, key: str):
+        return self.data.get(key)
+
+    async def mget(self, keys: list[str]):
+        return [self.data.get(key) for key in keys]
+
+    async def set(self, key: str, value: str, px: int = None, nx: bool = False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    async def release(self, keys: list[str], args: list):
+        if self.data.get(keys[0]) == args[0]:
+            del self.data[keys[0]]
+
+    async def store(self, keys: list[str], args: list):
+        self.data[keys[0]] = args[0]
+        return 1
+
+
+class LocalResponseCacheTestCase(unittest.TestCase):
+    def test_invalidated_tag_drops_entries_and_stale_puts(self):
+        # arrange
+        cache = LocalResponseCache(maxsize=10, max_ttl=5)
+        before = cache.generations(('users',))
+        cache.put('a', 'body', 60, ('users',), before)
+
+        # act
+        cache.handle_message('tag:users')
+        cache.put('b', 'stale', 60, ('users',), before)
+
+        # assert
+        self.assertIsNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(len(cache), 0)
+
+    def test_lru_is_bounded(self):
+        # arrange
+        cache = LocalResponseCache(maxsize=2, max_ttl=5)
+
+        # act
+        for key in ('a', 'b', 'c'):
+            cache.put(key, key, 60, (), ())
+
+        # assert
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('c'), 'c')
+
+
+class CacheResponseTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        calls.update(items=0, failing=0, slow=0, pinned=False)
+        for used in sessions.values():
+            used.clear()
+        response_cache.local.clear()
+        self.redis = FakeRedis()
+        self.patches = [
+            patch.object(redis_client, 'get', self.redis.get),
+            patch.object(redis_client, 'mget', self.redis.mget),
+            patch.object(redis_client, 'set', self.redis.set),
+            patch.object(response_cache_module, 'release_lock_script', self.redis.release),
+            patch.object(response_cache_module, 'store_response_script', self.redis.store),
+            patch.object(response_cache_module, 'invalidate_tags_script', AsyncMock()),
+            patch.object(response_cache_module.redis_pubsub, 'publish', AsyncMock()),
+            patch('utils.singleflight.get_read_session_maker', AsyncMock(return_value=flight_session)),
+        ]
+        for item in self.patches:
+            item.start()
+        self.client = AsyncClient(transport=ASGITransport(app=app), base_url='http://test')
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+        for item in self.patches:
+            item.stop()
+        response_cache.local.clear()
+
+    async def test_response_is_served_from_cache_until_invalidated(self):
+        # act
+        first = await self.client.get('/items', params={'limit': 3})
+        second = await self.client.get('/items', params={'limit': 3})
+        other_query = await self.client.get('/items', params={'limit': 2})
+        response_cache.local.clear()
+        from_redis = await self.client.get('/items', params={'limit': 3})
+        await response_cache.invalidate('items')
+        self.redis.data.clear()
+        after_write = await self.client.get('/items', params={'limit': 3})
+
+        # assert
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first.content, from_redis.content)
+        self.assertEqual(other_query.json()['data'], [0, 1])
+        self.assertEqual(after_write.json()['data'], [0, 1, 2])
+        self.assertEqual(calls['items'], 3)
+
+    async def test_concurrent_misses_run_handler_once(self):
+        # act
+        responses = await asyncio.gather(*(self.client.get('/slow') for _ in range(5)))
+
+        # assert
+        self.assertEqual({response.json()['data'] for response in responses}, {'slow'})
+        self.assertEqual(calls['slow'], 1)
+
+    async def test_miss_waits_for_other_worker_holding_the_lock(self):
+        # arrange
+        first = await self.client.get('/slow')
+        cached_key = next(key for key in self.redis.data if not key.endswith(':lock'))
+        body = self.redis.data.pop(cached_key)
+        response_cache.local.clear()
+        self.redis.data[f'{cached_key}:lock'] = 'other-worker'
+
+        async def other_worker_fills():
+            await asyncio.sleep(0.05)
+            self.redis.data[cached_key] = body
+
+        # act
+        _, second = await asyncio.gather(other_worker_fills(), self.client.get('/slow'))
+
+        # assert
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(calls['slow'], 1)
+
+    async def test_failed_response_is_not_cached(self):
+        # act
+        await self.client.get('/failing')
+        await self.client.get('/failing')
+
+        # assert
+        self.assertEqual(calls['failing'], 2)
+        self.assertEqual(self.redis.data, {})
+
+    async def test_fill_runs_handler_in_its_own_session(self):
+        # act
+        await self.client.get('/session')
+
+        # assert
+        self.assertEqual(sessions['handler'], sessions['flight'])
+        self.assertNotIn(sessions['handler'][0], sessions['request'])
+
+    async def test_request_pinned_to_primary_bypasses_cache(self):
+        # arrange
+        await self.client.get('/session')
+        calls['pinned'] = True
+
+        # act
+        await self.client.get('/session')
+
+        # assert
+        self.assertEqual(2, len(sessions['handler']))
+        self.assertIs(sessions['handler'][1], sessions['request'][1])
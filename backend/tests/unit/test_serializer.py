@@ -0,0 +1,74 @@
+import unittest
+from datetime import datetime
+
+import msgspec
+
+from common.response.response_chema import ApiResponse, response_base
+from common.schema import SchemaBase
+from core.config import settings
+from models.user import User
+from utils.serializer import json_encoder, orm_payload
+
+
+class EventSchema(SchemaBase):
+    name: str
+    created_time: datetime
+
+
+class SerializerTestCase(unittest.IsolatedAsyncioTestCase):
+    async def test_success_is_encoded_without_jsonable_encoder(self):
+        # arrange
+        created = datetime(2024, 1, 2, 3, 4, 5)
+        data = EventSchema(name='login', created_time=created)
+
+        # act
+        response = await response_base.success(data=data)
+
+        # assert
+        self.assertIsInstance(response, ApiResponse)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(msgspec.json.decode(response.body), {
+            'code': 200,
+            'msg': 'OK',
+            'data': {'name': 'login', 'created_time': created.strftime(settings.DATETIME_FORMAT)},
+        })
+
+    def test_orm_object_uses_loaded_attributes_only(self):
+        # arrange
+        user = User(username='alice', email='alice@example.com', password=None, refresh_token=None)
+        user.id = 1
+        user.created_time = datetime(2024, 1, 2, 3, 4, 5)
+
+        # act
+        encoded = msgspec.json.decode(json_encoder.encode(orm_payload(user)))
+
+        # assert
+        self.assertEqual(encoded['username'], 'alice')
+        self.assertEqual(encoded['created_time'], user.created_time.strftime(settings.DATETIME_FORMAT))
+        self.assertNotIn('permissions', encoded)
+
+    def test_orm_object_omits_secret_columns(self):
+        # arrange
+        user = User(username='alice', email='alice@example.com', password='$2b$12$hash', refresh_token='token')
+        user.id = 1
+
+        # act
+        encoded = msgspec.json.decode(json_encoder.encode(orm_payload([user])))
+
+        # assert
+        self.assertEqual('alice', encoded[0]['username'])
+        self.assertNotIn('password', encoded[0])
+        self.assertNotIn('refresh_token', encoded[0])
+
+    def test_schema_inside_container_is_encoded_as_raw_json(self):
+        # arrange
+        created = datetime(2024, 1, 2, 3, 4, 5)
+
+        # act
+        encoded = msgspec.json.decode(json_encoder.encode({'items': [EventSchema(name='login', created_time=created)]}))
+
+        # assert
+        self.assertEqual(
+            {'items': [{'name': 'login', 'created_time': created.strftime(settings.DATETIME_FORMAT)}]},
+            encoded,
+        )
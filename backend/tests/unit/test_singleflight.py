@@ -0,0 +1,140 @@
+import asyncio
+import unittest
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, patch
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from utils.singleflight import SingleFlight, singleflight
+
+
+def _read_session_maker(sessions: list[AsyncSession]) -> AsyncMock:
+    @asynccontextmanager
+    async def session_maker():
+        session = AsyncSession()
+        sessions.append(session)
+        yield session
+
+    return AsyncMock(return_value=session_maker)
+
+
+class SingleFlightTestCase(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_calls_share_one_run(self):
+        # arrange
+        flight = SingleFlight()
+        runs = 0
+
+        async def load():
+            nonlocal runs
+            runs += 1
+            await asyncio.sleep(0.01)
+            return 'value'
+
+        # act
+        results = await asyncio.gather(*(flight.do('key', load) for _ in range(10)))
+
+        # assert
+        self.assertEqual(results, ['value'] * 10)
+        self.assertEqual(runs, 1)
+        self.assertEqual(flight.shared, 9)
+        self.assertEqual(len(flight), 0)
+
+    async def test_exception_is_shared_and_next_call_runs_again(self):
+        # arrange
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError('boom')
+
+        # act
+        results = await asyncio.gather(flight.do('key', fail), flight.do('key', fail), return_exceptions=True)
+        again = await flight.do('key', lambda: asyncio.sleep(0, result='ok'))
+
+        # assert
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        self.assertEqual(again, 'ok')
+        self.assertEqual(flight.calls, 2)
+
+    async def test_cancelled_waiter_does_not_cancel_shared_call(self):
+        # arrange
+        flight = SingleFlight()
+
+        async def load():
+            await asyncio.sleep(0.02)
+            return 'value'
+
+        first = asyncio.create_task(flight.do('key', load))
+        second = asyncio.create_task(flight.do('key', load))
+        await asyncio.sleep(0)
+
+        # act
+        first.cancel()
+
+        # assert
+        self.assertEqual(await second, 'value')
+
+    async def test_decorator_ignores_session_argument(self):
+        # arrange
+        runs = []
+
+        @singleflight()
+        async def get_item(db, item_id: int):
+            runs.append(item_id)
+            await asyncio.sleep(0.01)
+            return item_id
+
+        # act
+        with patch('utils.singleflight.get_read_session_maker', _read_session_maker([])):
+            results = await asyncio.gather(
+                get_item(AsyncSession(), 1), get_item(AsyncSession(), 1), get_item(AsyncSession(), 2)
+            )
+
+        # assert
+        self.assertEqual(results, [1, 1, 2])
+        self.assertEqual(sorted(runs), [1, 2])
+
+    async def test_shared_call_uses_its_own_session(self):
+        # arrange
+        flight_sessions = []
+        used = []
+        callers = [AsyncSession(), AsyncSession()]
+
+        @singleflight()
+        async def get_item(db, item_id: int):
+            used.append(db)
+            await asyncio.sleep(0.01)
+            return item_id
+
+        # act
+        with patch('utils.singleflight.get_read_session_maker', _read_session_maker(flight_sessions)):
+            first = asyncio.create_task(get_item(callers[0], 1))
+            second = asyncio.create_task(get_item(callers[1], 1))
+            await asyncio.sleep(0)
+            first.cancel()
+            result = await second
+
+        # assert
+        self.assertEqual(result, 1)
+        self.assertEqual(used, flight_sessions)
+        self.assertNotIn(used[0], callers)
+
+    async def test_session_pinned_to_primary_is_not_coalesced(self):
+        # arrange
+        used = []
+        pinned = AsyncSession()
+        pinned.info['has_writes'] = True
+
+        @singleflight()
+        async def get_item(db, item_id: int):
+            used.append(db)
+            await asyncio.sleep(0.01)
+            return item_id
+
+        # act
+        with patch('utils.singleflight.get_read_session_maker', _read_session_maker([])):
+            await asyncio.gather(get_item(AsyncSession(), 1), get_item(pinned, 1))
+
+        # assert
+        self.assertEqual(2, len(used))
+        self.assertIn(pinned, used)
@@ -0,0 +1,47 @@
+import time
+import unittest
+
+from common.security.token_cache import SessionGenerationCache, VerifiedTokenCache
+
+
+def payload(user_id: int, expires_in: float = 60) -> dict:
+    return {'user_id': user_id, 'expires': time.time() + expires_in}
+
+
+class TestVerifiedTokenCache(unittest.TestCase):
+    def test_hit_and_miss(self):
+        cache = VerifiedTokenCache(maxsize=10, max_ttl=30)
+        cache.put('token', payload(1))
+
+        self.assertEqual(cache.get('token')['user_id'], 1)
+        self.assertIsNone(cache.get('other'))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_expired_token_is_not_returned(self):
+        cache = VerifiedTokenCache(maxsize=10, max_ttl=30)
+        cache.put('token', payload(1, expires_in=-1))
+
+        self.assertIsNone(cache.get('token'))
+        self.assertEqual(len(cache), 0)
+
+    def test_lru_eviction(self):
+        cache = VerifiedTokenCache(maxsize=2, max_ttl=30)
+        cache.put('first', payload(1))
+        cache.put('second', payload(2))
+        cache.get('first')
+
+        cache.put('third', payload(3))
+
+        self.assertIsNotNone(cache.get('first'))
+        self.assertIsNone(cache.get('second'))
+
+
+class TestSessionGenerationCache(unittest.TestCase):
+    def test_generation_from_message_is_not_rolled_back(self):
+        cache = SessionGenerationCache(maxsize=10, max_ttl=30)
+        cache.handle_message('gen:1:3')
+
+        cache.put(1, 2)
+
+        self.assertEqual(cache.get(1), 3)
+        self.assertIsNone(cache.get(2))
@@ -0,0 +1,78 @@
+import unittest
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+import msgspec
+
+from api.user.handler import get_users
+from api.user.schemas import PaginationSchema
+from models.permission import Permission
+from models.user import User
+from utils.cursor import encode_cursor
+
+
+def _user(user_id: int, *permissions: str) -> User:
+    user = User(username=f'user{user_id}', email=f'user{user_id}@mail.ru', password='$2b$12$hash', refresh_token='token')
+    user.id = user_id
+    user.created_time = datetime(2024, 1, 15, 10, 30)
+    user.permissions = [Permission(name=name) for name in permissions]
+    return user
+
+
+def _db(users: list[User]) -> MagicMock:
+    result = MagicMock()
+    result.scalars.return_value.all.return_value = users
+    db = MagicMock()
+    db.execute = AsyncMock(return_value=result)
+    return db
+
+
+class TestGetUsersByCursor(unittest.IsolatedAsyncioTestCase):
+    async def test_cursor_page_returns_list_items_without_secrets(self):
+        # arrange
+        db = _db([_user(3, 'read', 'write'), _user(2), _user(1)])
+
+        # act
+        # __wrapped__ - обработчик без cache_response
+        response = await get_users.__wrapped__(PaginationSchema(limit=2, cursor=''), db)
+        body = msgspec.json.decode(response.body)
+
+        # assert
+        self.assertEqual(200, body['code'])
+        items = body['data']['items']
+        self.assertEqual([3, 2], [item['id'] for item in items])
+        self.assertEqual(['read', 'write'], items[0]['permissions'])
+        self.assertEqual(
+            {'id', 'email', 'username', 'is_superuser', 'is_staff', 'created_time', 'updated_time', 'permissions'},
+            set(items[0]),
+        )
+        self.assertEqual(encode_cursor(after_id=2), body['data']['next_cursor'])
+
+    async def test_cursor_with_bool_position_is_rejected(self):
+        # arrange
+        db = _db([])
+
+        # act
+        response = await get_users.__wrapped__(PaginationSchema(cursor=encode_cursor(after_id=True)), db)
+        body = msgspec.json.decode(response.body)
+
+        # assert
+        self.assertEqual(400, body['code'])
+        db.execute.assert_not_called()
+
+
+class TestGetUsersByPage(unittest.IsolatedAsyncioTestCase):
+    async def test_page_returns_list_items_without_secrets(self):
+        # arrange
+        db = _db([_user(2, 'read'), _user(1)])
+
+        # act
+        response = await get_users.__wrapped__(PaginationSchema(page=1, limit=2), db)
+        body = msgspec.json.decode(response.body)
+
+        # assert
+        self.assertEqual(200, body['code'])
+        self.assertEqual([2, 1], [item['id'] for item in body['data']])
+        self.assertEqual(['read'], body['data'][0]['permissions'])
+        self.assertNotIn('password', body['data'][0])
+        self.assertNotIn('refresh_token', body['data'][0])
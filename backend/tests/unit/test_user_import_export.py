@@ -0,0 +1,165 @@
+import unittest
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import msgspec
+from sqlalchemy.exc import SQLAlchemyError
+
+from api.user.service import UserService
+from common.exception.errors import PayloadTooLargeError
+from models.user import User
+
+
+async def _stream(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+def _db() -> MagicMock:
+    db = MagicMock()
+    db.rollback = AsyncMock()
+    return db
+
+
+async def _insert_all(rows: list[dict], db) -> set[str]:
+    return {row['email'] for row in rows}
+
+
+class TestUserImport(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        patches = [
+            patch('api.user.service.get_hash_passwords', AsyncMock(side_effect=lambda passwords: ['hash'] * len(passwords))),
+            patch('api.user.service.response_cache.invalidate', AsyncMock()),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    async def test_ndjson_lines_split_across_chunks(self):
+        # arrange
+        body = (
+            b'{"email": "a@mail.ru", "password": "123456", "username": "\xd0\xb0a"}\n'
+            b'not json\n'
+            b'{"email": "b@mail.ru", "password": "123456", "username": "b_user"}'
+        )
+        chunks = [body[i:i + 7] for i in range(0, len(body), 7)]
+
+        # act
+        with patch.object(UserService, '_insert_users', AsyncMock(side_effect=_insert_all)):
+            report = await UserService.bulk_import(_stream(*chunks), 'ndjson', _db())
+
+        # assert
+        self.assertEqual(3, report.total)
+        self.assertEqual(1, report.inserted)
+        self.assertEqual([1, 2], sorted(issue.line for issue in report.errors))
+
+    async def test_privilege_fields_are_not_imported(self):
+        # arrange
+        body = b'{"email": "a@mail.ru", "password": "123456", "username": "a_user", "is_superuser": true, "is_staff": true}'
+        insert = AsyncMock(side_effect=_insert_all)
+
+        # act
+        with patch.object(UserService, '_insert_users', insert):
+            report = await UserService.bulk_import(_stream(body), 'ndjson', _db())
+
+        # assert
+        self.assertEqual(1, report.inserted)
+        row = insert.await_args.args[0][0]
+        self.assertNotIn('is_superuser', row)
+        self.assertNotIn('is_staff', row)
+
+    async def test_csv_quoted_newline_stays_in_one_row(self):
+        # arrange
+        body = b'email,password,username\n"a@mail.ru","pass\nword",a_user\nb@mail.ru,123456,b_user\n'
+        insert = AsyncMock(side_effect=_insert_all)
+
+        # act
+        with patch.object(UserService, '_insert_users', insert):
+            report = await UserService.bulk_import(_stream(body[:30], body[30:]), 'csv', _db())
+
+        # assert
+        self.assertEqual(2, report.total)
+        self.assertEqual(2, report.inserted)
+        self.assertEqual(0, report.errors_count)
+
+    async def test_line_over_limit_is_rejected_with_committed_count(self):
+        # arrange
+        row = b'{"email": "a@mail.ru", "password": "123456", "username": "a_user"}\n'
+
+        # act / assert
+        with patch('api.user.service.settings.USER_IMPORT_MAX_LINE_BYTES', 100), \
+                patch('api.user.service.settings.USER_IMPORT_BATCH_SIZE', 1), \
+                patch.object(UserService, '_insert_users', AsyncMock(side_effect=_insert_all)):
+            with self.assertRaises(PayloadTooLargeError) as error:
+                await UserService.bulk_import(_stream(row, b'x' * 60, b'x' * 60), 'ndjson', _db())
+        self.assertEqual(413, error.exception.status_code)
+        self.assertIn('1 users were imported', error.exception.detail)
+
+    async def test_rejected_batch_is_retried_row_by_row(self):
+        # arrange
+        async def insert(rows: list[dict], db) -> set[str]:
+            if len(rows) > 1 or rows[0]['email'] == 'bad@mail.ru':
+                raise SQLAlchemyError('value too long for type character varying(50)')
+            return {rows[0]['email']}
+
+        body = b''.join(
+            msgspec.json.encode({'email': email, 'password': '123456', 'username': email.split('@')[0]}) + b'\n'
+            for email in ('aa@mail.ru', 'bad@mail.ru', 'cc@mail.ru')
+        )
+        db = _db()
+
+        # act
+        with patch.object(UserService, '_insert_users', AsyncMock(side_effect=insert)):
+            report = await UserService.bulk_import(_stream(body), 'ndjson', db)
+
+        # assert
+        self.assertEqual(2, report.inserted)
+        self.assertEqual([(2, 'bad@mail.ru')], [(issue.line, issue.email) for issue in report.errors])
+        self.assertEqual(0, report.conflicts_count)
+        self.assertEqual(2, db.rollback.await_count)
+
+
+class TestUserExport(unittest.IsolatedAsyncioTestCase):
+    def _session_maker(self, users: list[User]) -> AsyncMock:
+        async def partitions():
+            yield users
+
+        result = MagicMock()
+        result.partitions = partitions
+        session = MagicMock()
+        session.stream_scalars = AsyncMock(return_value=result)
+        session_maker = MagicMock()
+        session_maker.return_value.__aenter__ = AsyncMock(return_value=session)
+        session_maker.return_value.__aexit__ = AsyncMock(return_value=False)
+        return AsyncMock(return_value=session_maker)
+
+    def _users(self) -> list[User]:
+        user = User(username='a_user', email='a@mail.ru', password='hash', refresh_token=None)
+        user.id = 1
+        user.created_time = datetime(2024, 1, 15, 10, 30)
+        return [user]
+
+    async def _export(self, export_format: str) -> bytes:
+        with patch('api.user.service.get_read_session_maker', self._session_maker(self._users())), \
+                patch.object(UserService, '_get_permission_names', AsyncMock(return_value={1: ['read', 'write']})):
+            return b''.join([chunk async for chunk in UserService.export_users(export_format)])
+
+    async def test_ndjson_export_has_no_secrets(self):
+        # act
+        body = await self._export('ndjson')
+
+        # assert
+        rows = [msgspec.json.decode(line) for line in body.splitlines()]
+        self.assertEqual(1, len(rows))
+        self.assertEqual(['read', 'write'], rows[0]['permissions'])
+        self.assertNotIn('password', rows[0])
+
+    async def test_csv_export_has_header_and_joined_permissions(self):
+        # act
+        body = await self._export('csv')
+
+        # assert
+        lines = body.decode().splitlines()
+        self.assertEqual('id,email,username,is_superuser,is_staff,created_time,updated_time,permissions', lines[0])
+        self.assertTrue(lines[1].startswith('1,a@mail.ru,a_user,'))
+        self.assertTrue(lines[1].endswith(',read|write'))
@@ -0,0 +1,34 @@
+import base64
+import binascii
+
+import msgspec
+
+__all__ = ['encode_cursor', 'decode_cursor']
+
+
+def encode_cursor(**values: int | str) -> str:
+    """
+    Упаковать позицию keyset-пагинации в непрозрачный токен
+
+    :param values: например after_id=10
+    :return:
+    """
+    return base64.urlsafe_b64encode(msgspec.json.encode(values)).rstrip(b'=').decode()
+
+
+def decode_cursor(token: str) -> dict:
+    """
+    Распаковать токен, созданный encode_cursor
+
+    :param token:
+    :return:
+    :raises ValueError: токен поврежден
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = msgspec.json.decode(raw)
+    except (binascii.Error, msgspec.DecodeError) as e:
+        raise ValueError('Invalid cursor') from e
+    if not isinstance(values, dict):
+        raise ValueError('Invalid cursor')
+    return values
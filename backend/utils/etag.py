@@ -0,0 +1,93 @@
+from hashlib import blake2b
+from typing import Any, Awaitable, Callable
+
+import msgspec
+from fastapi import Depends, Request
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from common.exception.errors import NotModifiedError
+from core.config import settings
+from core.db import get_db_read
+
+__all__ = ['PRIVATE_CACHE_HEADERS', 'make_etag', 'etag_matches', 'table_version', 'etag_validator']
+
+# Ответ зависит от токена: общие кэши его не хранят, браузер различает по Authorization
+PRIVATE_CACHE_HEADERS = {'Cache-Control': 'private', 'Vary': 'Authorization'}
+
+VersionLoader = Callable[[Request, AsyncSession], Awaitable[Any]]
+
+
+def make_etag(data: bytes) -> str:
+    """
+    Слабый ETag: тело с тем же содержимым, но другим Content-Encoding считается тем же
+
+    :param data: тело ответа или закодированная версия данных
+    :return:
+    """
+    return f'W/"{blake2b(data, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Слабое сравнение If-None-Match (RFC 9110, 13.1.2)
+
+    :param if_none_match: значение заголовка
+    :param etag:
+    :return:
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag.removeprefix('W/')
+    return any(item.strip().removeprefix('W/') == opaque for item in if_none_match.split(','))
+
+
+def table_version(model, *criteria) -> list:
+    """
+    Версия строк таблицы: число строк и последнее время изменения.
+    Удаление меняет число, вставка и обновление - время (updated_time из DateTimeMixin).
+
+    :param model: модель с DateTimeMixin
+    :param criteria: условия отбора строк
+    :return: scalar subquery для select(...)
+    """
+    changed = func.coalesce(model.updated_time, model.created_time)
+    return [
+        select(func.count()).select_from(model).where(*criteria).scalar_subquery(),
+        select(func.max(changed)).where(*criteria).scalar_subquery(),
+    ]
+
+
+def etag_validator(load_version: VersionLoader, private: bool = False):
+    """
+    Дешевая проверка If-None-Match до основного запроса.
+
+    load_version достает версию данных (обычно select(*table_version(...))), ETag считается
+    по ней, пути и query string. При совпадении сразу отвечаем 304, иначе ETag кладется
+    в request.state.etag и ETagMiddleware отдаст его вместо хэша тела.
+
+    E.g. ::
+
+        @router.get('/', dependencies=[Depends(etag_validator(PermissionService.get_permissions_version))])
+
+    :param load_version:
+    :param private: ответ свой у каждого пользователя. В ETag входит request.state.user_id,
+        304 отдается с PRIVATE_CACHE_HEADERS (ответ 200 обработчик помечает сам)
+    :return: зависимость FastAPI
+    """
+
+    async def dependency(request: Request, db: AsyncSession = Depends(get_db_read)) -> None:
+        if not settings.ETAG_CHEAP_VALIDATORS:
+            return
+        version = await load_version(request, db)
+        parts = [request.url.path, request.url.query, version]
+        if private:
+            parts.append(getattr(request.state, 'user_id', None))
+        etag = make_etag(msgspec.json.encode(parts))
+        if etag_matches(request.headers.get('if-none-match'), etag):
+            raise NotModifiedError(etag=etag, headers={'ETag': etag, **PRIVATE_CACHE_HEADERS} if private else None)
+        request.state.etag = etag
+
+    return dependency
@@ -0,0 +1,108 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+import msgspec
+
+__all__ = ['PROFILE_FORMATS', 'StackSampler', 'write_collapsed', 'write_speedscope']
+
+PROFILE_FORMATS = ('speedscope', 'collapsed')
+
+# (функция, файл, строка начала функции)
+Frame = tuple[str, str, int]
+
+
+class StackSampler:
+    """
+    Сэмплирующий профилировщик одного потока.
+
+    Фоновый поток раз в ``interval`` сек снимает стек потока ``thread_id``
+    через sys._current_frames(). Для event loop это стек всего цикла: если в этот
+    момент выполняется другой запрос, он тоже попадет в профиль, а ожидание I/O
+    видно как кадры селектора.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter[tuple[Frame, ...]] = Counter()
+        self.started = 0.0
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def start(self) -> None:
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.elapsed = time.perf_counter() - self.started
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_qualname, code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            if stack:
+                stack.reverse()
+                self.samples[tuple(stack)] += 1
+
+
+def _frame_name(frame: Frame) -> str:
+    name, filename, line = frame
+    return f'{name} ({os.path.basename(filename)}:{line})'
+
+
+def write_collapsed(path: str, sampler: StackSampler) -> None:
+    """
+    Формат flamegraph.pl / speedscope: ``кадр;кадр;кадр число_сэмплов`` на строку
+
+    :param path:
+    :param sampler:
+    :return:
+    """
+    with open(path, 'w') as f:
+        for stack, count in sampler.samples.most_common():
+            f.write(f"{';'.join(_frame_name(frame) for frame in stack)} {count}\n")
+
+
+def write_speedscope(path: str, sampler: StackSampler, name: str) -> None:
+    """
+    Файл для https://www.speedscope.app, тип профиля sampled, веса в мс
+
+    :param path:
+    :param sampler:
+    :param name: подпись профиля
+    :return:
+    """
+    frames: dict[Frame, int] = {}
+    samples, weights = [], []
+    for stack, count in sampler.samples.items():
+        samples.append([frames.setdefault(frame, len(frames)) for frame in stack])
+        weights.append(count * sampler.interval * 1000)
+    document = {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'name': name,
+        'exporter': 'fastapi request profiler',
+        'shared': {
+            'frames': [{'name': frame[0], 'file': frame[1], 'line': frame[2]} for frame in frames],
+        },
+        'profiles': [{
+            'type': 'sampled',
+            'name': name,
+            'unit': 'milliseconds',
+            'startValue': 0,
+            'endValue': sampler.elapsed * 1000,
+            'samples': samples,
+            'weights': weights,
+        }],
+    }
+    with open(path, 'wb') as f:
+        f.write(msgspec.json.encode(document))
@@ -0,0 +1,65 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Iterator
+
+__all__ = [
+    'SERVER_TIMING_METRICS',
+    'start_request_timing',
+    'finish_request_timing',
+    'get_request_timings',
+    'add_timing',
+    'timed',
+    'server_timing_header',
+]
+
+SERVER_TIMING_METRICS = ('db', 'redis', 'serialization')
+
+# Время по группам (сек) текущего запроса. None вне запроса: тогда замеры ничего не делают
+_request_timings: ContextVar[dict[str, float] | None] = ContextVar('request_timings', default=None)
+
+
+def start_request_timing() -> Token:
+    return _request_timings.set(dict.fromkeys(SERVER_TIMING_METRICS, 0.0))
+
+
+def finish_request_timing(token: Token) -> None:
+    _request_timings.reset(token)
+
+
+def get_request_timings() -> dict[str, float] | None:
+    return _request_timings.get()
+
+
+def add_timing(name: str, seconds: float) -> None:
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def timed(name: str) -> Iterator[None]:
+    """
+    Добавить время блока к группе name текущего запроса
+
+    :param name:
+    :return:
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_timing(name, time.perf_counter() - started)
+
+
+def server_timing_header(total: float, timings: dict[str, float]) -> bytes:
+    """
+    Значение заголовка Server-Timing, длительности в мс
+
+    :param total: сек
+    :param timings: сек по группам
+    :return:
+    """
+    parts = [f'total;dur={total * 1000:.1f}']
+    parts.extend(f'{name};dur={seconds * 1000:.1f}' for name, seconds in timings.items())
+    return ', '.join(parts).encode('latin-1')
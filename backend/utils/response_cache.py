@@ -0,0 +1,429 @@
+import asyncio
+import functools
+import inspect
+import secrets
+import time
+from collections import OrderedDict
+from hashlib import blake2b
+from typing import Any, Awaitable, Callable, Iterable
+
+import msgspec
+from fastapi import Request, Response
+from redis.exceptions import RedisError
+
+from common.log import log
+from core.config import settings
+from core.db_redis import redis_client
+from core.redis_pubsub import redis_pubsub
+from utils.serializer import MsgSpecJSONResponse
+from core.db import is_pinned_to_primary
+from utils.singleflight import call_in_read_session, find_session, single_flight
+
+__all__ = ['LocalResponseCache', 'ResponseCache', 'response_cache', 'cache_response']
+
+VARY_OPTIONS = ('path', 'query', 'user')
+
+# KEYS[1] - ключ ответа, KEYS[2..n] - поколения тегов, KEYS[n+1..] - множества ключей тегов
+# ARGV[1] - тело, ARGV[2] - ttl мс, ARGV[3..] - поколения тегов на момент начала запроса.
+# Если тег успели сбросить, пока считался ответ, он не сохраняется
+STORE_RESPONSE_LUA = """
+local tags = (#KEYS - 1) / 2
+for i = 1, tags do
+    if (redis.call('GET', KEYS[1 + i]) or '0') ~= ARGV[2 + i] then
+        return 0
+    end
+end
+redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+for i = 1, tags do
+    local index = KEYS[1 + tags + i]
+    redis.call('SADD', index, KEYS[1])
+    if redis.call('PTTL', index) < tonumber(ARGV[2]) then
+        redis.call('PEXPIRE', index, ARGV[2])
+    end
+end
+return 1
+"""
+store_response_script = redis_client.register_script(STORE_RESPONSE_LUA)
+
+# KEYS - пары (поколение тега, множество ключей тега)
+INVALIDATE_TAGS_LUA = """
+for i = 1, #KEYS, 2 do
+    redis.call('INCR', KEYS[i])
+    local keys = redis.call('SMEMBERS', KEYS[i + 1])
+    for j = 1, #keys, 1000 do
+        redis.call('DEL', unpack(keys, j, math.min(j + 999, #keys)))
+    end
+    redis.call('DEL', KEYS[i + 1])
+end
+return 1
+"""
+invalidate_tags_script = redis_client.register_script(INVALIDATE_TAGS_LUA)
+
+# Снять блокировку заполнения, только если она все еще наша
+RELEASE_LOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+release_lock_script = redis_client.register_script(RELEASE_LOCK_LUA)
+
+
+class ResponseSnapshot:
+    """
+    Готовый ответ, который получают все участники single-flight.
+    Каждый запрос отправляет свою копию: middleware меняют заголовки ответа на месте.
+    """
+
+    __slots__ = ('status_code', 'body', 'raw_headers')
+
+    def __init__(self, status_code: int, body: bytes, raw_headers: tuple):
+        self.status_code = status_code
+        self.body = body
+        self.raw_headers = raw_headers
+
+    @classmethod
+    def cached(cls, body: str) -> 'ResponseSnapshot':
+        return cls.of(Response(body, media_type='application/json'))
+
+    @classmethod
+    def of(cls, response: Response) -> 'ResponseSnapshot':
+        return cls(response.status_code, response.body, tuple(response.raw_headers))
+
+    def to_response(self) -> Response:
+        response = Response(status_code=self.status_code)
+        response.body = self.body
+        response.raw_headers = list(self.raw_headers)
+        return response
+
+
+class LocalResponseCache:
+    """
+    L1 закодированных ответов воркера.
+
+    Запись живет не дольше ``max_ttl`` секунд: это ограничивает устаревание,
+    если сообщение о сбросе тега потерялось. Поколения тегов воркера нужны,
+    чтобы не положить в L1 ответ, посчитанный до сброса.
+    """
+
+    def __init__(self, maxsize: int, max_ttl: float):
+        self.maxsize = maxsize
+        self.max_ttl = max_ttl
+        self._entries: OrderedDict[str, tuple[str, float, tuple[str, ...]]] = OrderedDict()
+        self._by_tag: dict[str, set[str]] = {}
+        self._generations: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> str | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def generations(self, tags: Iterable[str]) -> tuple[int, ...]:
+        return tuple(self._generations.get(tag, 0) for tag in tags)
+
+    def put(self, key: str, body: str, ttl: float, tags: tuple[str, ...], generations: tuple[int, ...]) -> None:
+        if self.generations(tags) != generations:
+            return
+        self._remove(key)
+        self._entries[key] = (body, time.monotonic() + min(ttl, self.max_ttl), tags)
+        for tag in tags:
+            self._by_tag.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.maxsize:
+            self._remove(next(iter(self._entries)))
+
+    def invalidate_tag(self, tag: str) -> None:
+        self._generations[tag] = self._generations.get(tag, 0) + 1
+        for key in self._by_tag.pop(tag, set()):
+            self._remove(key)
+
+    def clear(self) -> None:
+        for tag in list(self._by_tag):
+            self.invalidate_tag(tag)
+        self._entries.clear()
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
+    def handle_message(self, message: str) -> None:
+        """
+        Сообщение канала сброса: ``tag:{tag}``
+
+        :param message:
+        :return:
+        """
+        kind, _, value = message.partition(':')
+        if kind == 'tag':
+            self.invalidate_tag(value)
+
+
+class ResponseCache:
+    """
+    Кэш закодированных JSON ответов: L1 воркера поверх Redis.
+
+    Ответ сохраняется вместе с тегами. Запись в БД сбрасывает теги (``invalidate``):
+    ключи тега удаляются из Redis, остальные воркеры чистят L1 по pub/sub.
+    """
+
+    def __init__(self, prefix: str, local: LocalResponseCache):
+        self.prefix = prefix
+        self.local = local
+        self.hits_local = 0
+        self.hits_redis = 0
+        self.misses = 0
+        self.lock_waits = 0
+        self.lock_wait_hits = 0
+
+    def make_key(self, request: Request, route: str, vary: tuple[str, ...]) -> str:
+        parts: list[Any] = [route]
+        if 'path' in vary:
+            parts.append(request.url.path)
+        if 'query' in vary:
+            parts.append(sorted(request.query_params.multi_items()))
+        if 'user' in vary:
+            parts.append(getattr(request.state, 'user_id', None))
+        digest = blake2b(msgspec.json.encode(parts), digest_size=16).hexdigest()
+        return f'{self.prefix}:{digest}'
+
+    def _generation_key(self, tag: str) -> str:
+        return f'{self.prefix}:gen:{tag}'
+
+    def _tag_index_key(self, tag: str) -> str:
+        return f'{self.prefix}:tag:{tag}'
+
+    async def get(self, key: str, ttl: int, tags: tuple[str, ...]) -> str | None:
+        body = self.local.get(key)
+        if body is not None:
+            self.hits_local += 1
+            return body
+        generations = self.local.generations(tags)
+        body = await redis_client.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self.hits_redis += 1
+        self.local.put(key, body, ttl, tags, generations)
+        return body
+
+    async def generations(self, tags: tuple[str, ...]) -> list[str]:
+        if not tags:
+            return []
+        values = await redis_client.mget([self._generation_key(tag) for tag in tags])
+        return [value or '0' for value in values]
+
+    async def set(
+        self,
+        key: str,
+        body: str,
+        ttl: int,
+        tags: tuple[str, ...],
+        generations: list[str],
+        local_generations: tuple[int, ...],
+    ) -> None:
+        """
+        :param key:
+        :param body: тело ответа
+        :param ttl: сек
+        :param tags:
+        :param generations: поколения тегов в Redis до выполнения обработчика
+        :param local_generations: поколения тегов в L1 до выполнения обработчика
+        :return:
+        """
+        keys = [key, *(self._generation_key(tag) for tag in tags), *(self._tag_index_key(tag) for tag in tags)]
+        stored = await store_response_script(keys=keys, args=[body, ttl * 1000, *generations])
+        if stored:
+            self.local.put(key, body, ttl, tags, local_generations)
+
+    async def fill(self, key: str, ttl: int, tags: tuple[str, ...], compute: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Посчитать и сохранить ответ после промаха.
+
+        Между воркерами заполнение одного ключа защищено блокировкой в Redis:
+        не получивший ее ждет, пока ответ появится в кэше или блокировка пропадет,
+        и только потом считает сам. Внутри воркера вызов объединяется через single_flight.
+
+        :param key:
+        :param ttl: сек
+        :param tags:
+        :param compute: обработчик
+        :return: ResponseSnapshot или результат обработчика, если это не Response
+        """
+        local_generations = self.local.generations(tags)
+        lock_key, lock_token = f'{key}:lock', secrets.token_hex(8)
+        try:
+            generations = await self.generations(tags)
+            locked = await redis_client.set(lock_key, lock_token, px=settings.RESPONSE_CACHE_LOCK_MS, nx=True)
+            if not locked:
+                body = await self._wait_for_fill(key, lock_key)
+                if body is not None:
+                    self.local.put(key, body, ttl, tags, local_generations)
+                    return ResponseSnapshot.cached(body)
+                locked = await redis_client.set(lock_key, lock_token, px=settings.RESPONSE_CACHE_LOCK_MS, nx=True)
+        except RedisError as e:
+            log.error('Response cache lookup failed: {}', e)
+            response = await compute()
+            return ResponseSnapshot.of(response) if isinstance(response, Response) else response
+
+        try:
+            response = await compute()
+            if _cacheable(response):
+                try:
+                    await self.set(key, response.body.decode(), ttl, tags, generations, local_generations)
+                except RedisError as e:
+                    log.error('Response cache store failed: {}', e)
+        finally:
+            if locked:
+                try:
+                    await release_lock_script(keys=[lock_key], args=[lock_token])
+                except RedisError as e:
+                    log.error('Response cache lock release failed: {}', e)
+        return ResponseSnapshot.of(response) if isinstance(response, Response) else response
+
+    async def _wait_for_fill(self, key: str, lock_key: str) -> str | None:
+        """
+        Ждать ответ другого воркера
+
+        :param key:
+        :param lock_key:
+        :return: тело ответа или None, если блокировку сняли, а ответа нет (он не кэшируется)
+        """
+        self.lock_waits += 1
+        deadline = time.monotonic() + settings.RESPONSE_CACHE_LOCK_MS / 1000
+        while time.monotonic() < deadline:
+            await asyncio.sleep(settings.RESPONSE_CACHE_LOCK_POLL_MS / 1000)
+            body, lock = await redis_client.mget([key, lock_key])
+            if body is not None:
+                self.lock_wait_hits += 1
+                return body
+            if lock is None:
+                return None
+        return None
+
+    async def invalidate(self, *tags: str) -> None:
+        """
+        Сбросить ответы с этими тегами во всех воркерах. Вызывается после commit
+
+        :param tags:
+        :return:
+        """
+        if not settings.RESPONSE_CACHE_ENABLED or not tags:
+            return
+        for tag in tags:
+            self.local.invalidate_tag(tag)
+        try:
+            keys = [key for tag in tags for key in (self._generation_key(tag), self._tag_index_key(tag))]
+            await invalidate_tags_script(keys=keys)
+            for tag in tags:
+                await redis_pubsub.publish(settings.RESPONSE_CACHE_INVALIDATION_CHANNEL, f'tag:{tag}')
+        except RedisError as e:
+            log.error('Response cache invalidation of {} failed: {}', tags, e)
+
+
+response_cache = ResponseCache(
+    prefix=settings.RESPONSE_CACHE_REDIS_PREFIX,
+    local=LocalResponseCache(
+        maxsize=settings.RESPONSE_CACHE_LOCAL_MAXSIZE,
+        max_ttl=settings.RESPONSE_CACHE_LOCAL_TTL,
+    ),
+)
+redis_pubsub.subscribe(
+    settings.RESPONSE_CACHE_INVALIDATION_CHANNEL,
+    response_cache.local.handle_message,
+    on_reset=response_cache.local.clear,
+)
+
+
+def _cacheable(response: Any) -> bool:
+    # response_base.fail отдает HTTP 200 с кодом ошибки в теле, такие ответы не кэшируются
+    return (
+        isinstance(response, MsgSpecJSONResponse)
+        and response.status_code == 200
+        and 200 <= getattr(response, 'code', 200) < 300
+    )
+
+
+def cache_response(*, ttl: int, tags: tuple[str, ...] = (), vary: tuple[str, ...] = ('path', 'query')):
+    """
+    Кэшировать успешный JSON ответ обработчика.
+
+    Зависимости (в том числе JWTBearer) выполняются до обращения к кэшу. Кэшируются
+    только ответы MsgSpecJSONResponse (response_base) со статусом и кодом 2xx.
+    Одновременные промахи по одному ключу выполняют обработчик один раз (см. ResponseCache.fill)
+    в собственной читающей сессии. Запрос, закрепленный за primary, идет мимо кэша.
+
+    E.g. ::
+
+        @router.get('/')
+        @cache_response(ttl=60, tags=('permissions',))
+        async def get_permissions(db: CurrentReadSession) -> ResponseModel:
+            ...
+
+    :param ttl: сек
+    :param tags: теги для сброса через response_cache.invalidate
+    :param vary: из чего строится ключ: path, query, user (request.state.user_id)
+    :return:
+    """
+    unknown = set(vary) - set(VARY_OPTIONS)
+    if unknown:
+        raise ValueError(f'Unknown vary options: {unknown}')
+
+    def decorator(func: Callable) -> Callable:
+        route = f'{func.__module__}.{func.__qualname__}'
+        signature = inspect.signature(func)
+        request_param = next(
+            (name for name, param in signature.parameters.items() if param.annotation is Request), None
+        )
+        extra_param = None
+        if request_param is None:
+            # FastAPI передаст Request в дополнительный параметр, обработчик его не получит
+            extra_param = '_response_cache_request'
+            signature = signature.replace(parameters=[
+                *signature.parameters.values(),
+                inspect.Parameter(extra_param, inspect.Parameter.KEYWORD_ONLY, annotation=Request),
+            ])
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            request: Request = kwargs.pop(extra_param) if extra_param else kwargs[request_param]
+            session = find_session(args, kwargs)
+            if not settings.RESPONSE_CACHE_ENABLED or (session is not None and is_pinned_to_primary(session)):
+                # Закрепленный за primary запрос должен увидеть свою запись, а не кэш с реплики
+                return await func(*args, **kwargs)
+
+            key = response_cache.make_key(request, route, vary)
+            try:
+                body = await response_cache.get(key, ttl, tags)
+            except RedisError as e:
+                log.error('Response cache lookup failed: {}', e)
+                return await func(*args, **kwargs)
+            if body is not None:
+                return Response(body, media_type='application/json')
+
+            # Одновременные промахи по ключу в этом воркере ждут один вызов обработчика.
+            # Он идет в своей сессии: сессию первого запроса закроет get_db, если запрос отменят
+            if session is None:
+                compute = functools.partial(func, *args, **kwargs)
+            else:
+                compute = functools.partial(call_in_read_session, func, args, kwargs)
+            result = await single_flight.do(key, lambda: response_cache.fill(key, ttl, tags, compute))
+            return result.to_response() if isinstance(result, ResponseSnapshot) else result
+
+        wrapper.__signature__ = signature
+        return wrapper
+
+    return decorator
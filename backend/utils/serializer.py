@@ -1,9 +1,94 @@
+from datetime import datetime
 from typing import Any
 
+from pydantic import BaseModel
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import InstanceState
 from starlette.responses import JSONResponse
 
 import msgspec
 
+from core.config import settings
+from utils.request_timing import timed
+
+
+# Колонки, которые не попадают в ответ, даже если обработчик вернул ORM объект целиком
+SECRET_COLUMNS = frozenset(('password', 'refresh_token'))
+
+
+def _format_value(value: Any) -> Any:
+    return value.strftime(settings.DATETIME_FORMAT) if isinstance(value, datetime) else value
+
+
+def _orm_columns(state: InstanceState) -> dict:
+    return {
+        attr.key: _format_value(state.dict[attr.key])
+        for attr in state.mapper.column_attrs
+        if attr.key in state.dict and attr.key not in SECRET_COLUMNS
+    }
+
+
+def orm_to_dict(state: InstanceState) -> dict:
+    """
+    Загруженные атрибуты ORM объекта без SECRET_COLUMNS. Ленивые связи не загружаются,
+    у связанных объектов берутся только колонки, поэтому циклов нет.
+    Для ответов API лучше схема: ORM объект отдает все остальные колонки.
+
+    :param state: sqlalchemy.inspect(obj)
+    :return:
+    """
+    result = _orm_columns(state)
+    for relationship in state.mapper.relationships:
+        if relationship.key not in state.dict:
+            continue
+        value = state.dict[relationship.key]
+        if value is None:
+            result[relationship.key] = None
+        elif relationship.uselist:
+            result[relationship.key] = [_orm_columns(sa_inspect(item)) for item in value]
+        else:
+            result[relationship.key] = _orm_columns(sa_inspect(value))
+    return result
+
+
+def _orm_state(obj: Any) -> InstanceState | None:
+    state = sa_inspect(obj, raiseerr=False)
+    return state if isinstance(state, InstanceState) else None
+
+
+def orm_payload(data: Any) -> Any:
+    """
+    Модели MappedAsDataclass msgspec кодирует сам как dataclass, минуя enc_hook,
+    и при этом обращается к незагруженным связям. Поэтому ORM объекты (или список
+    ORM объектов) на верхнем уровне data заранее заменяются словарями.
+
+    :param data:
+    :return:
+    """
+    if isinstance(data, (list, tuple)):
+        if data and _orm_state(data[0]) is not None:
+            return [orm_to_dict(sa_inspect(item)) for item in data]
+        return data
+    state = _orm_state(data)
+    return orm_to_dict(state) if state is not None else data
+
+
+def enc_hook(obj: Any) -> Any:
+    """
+    Типы, которые msgspec не кодирует сам.
+    Pydantic схема сериализуется в JSON своим ядром и вставляется как есть, без
+    промежуточного дерева словарей. Даты форматируются через json_encoders SchemaBase.
+    """
+    if isinstance(obj, BaseModel):
+        return msgspec.Raw(obj.model_dump_json())
+    state = _orm_state(obj)
+    if state is not None:
+        return orm_to_dict(state)
+    raise NotImplementedError(f'Objects of type {type(obj)} are not supported')
+
+
+json_encoder = msgspec.json.Encoder(enc_hook=enc_hook)
+
 
 class MsgSpecJSONResponse(JSONResponse):
     """
@@ -11,4 +96,5 @@ class MsgSpecJSONResponse(JSONResponse):
     """
 
     def render(self, content: Any) -> bytes:
-        return msgspec.json.encode(content)
\ No newline at end of file
+        with timed('serialization'):
+            return json_encoder.encode(content)
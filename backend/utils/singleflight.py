@@ -0,0 +1,124 @@
+import asyncio
+import functools
+from typing import Any, Awaitable, Callable, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.db import get_read_session_maker, is_pinned_to_primary
+
+__all__ = ['SingleFlight', 'single_flight', 'singleflight', 'find_session', 'call_in_read_session']
+
+T = TypeVar('T')
+
+
+class SingleFlight:
+    """
+    Объединение одинаковых одновременных вызовов в воркере.
+
+    Пока вызов с ключом выполняется, остальные вызовы с тем же ключом ждут его
+    результат (или исключение) вместо собственного запуска. Общая задача защищена
+    shield: отмена одного из ожидающих не отменяет ее для остальных.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.shared = 0
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        :param key: одинаковые вызовы должны давать одинаковый ключ
+        :param fn: запускается, только если вызова с таким ключом сейчас нет
+        :return:
+        """
+        task = self._calls.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(functools.partial(self._forget, key))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Исключение получили ожидающие, иначе asyncio пишет "exception was never retrieved"
+            task.exception()
+
+
+single_flight = SingleFlight()
+
+
+def find_session(args: tuple, kwargs: dict) -> AsyncSession | None:
+    for value in (*args, *kwargs.values()):
+        if isinstance(value, AsyncSession):
+            return value
+    return None
+
+
+async def call_in_read_session(func: Callable[..., Awaitable[T]], args: tuple, kwargs: dict) -> T:
+    """
+    Вызвать func в собственной читающей сессии вместо сессии вызывающего
+
+    :param func:
+    :param args: AsyncSession среди аргументов заменяется новой сессией
+    :param kwargs:
+    :return:
+    """
+    session_maker = await get_read_session_maker()
+    async with session_maker() as session:
+        args = tuple(session if isinstance(arg, AsyncSession) else arg for arg in args)
+        kwargs = {name: session if isinstance(value, AsyncSession) else value for name, value in kwargs.items()}
+        return await func(*args, **kwargs)
+
+
+def _default_key(func: Callable, args: tuple, kwargs: dict) -> str:
+    # Сессия у каждого запроса своя и на результат не влияет
+    parts = [repr(arg) for arg in args if not isinstance(arg, AsyncSession)]
+    parts.extend(f'{name}={value!r}' for name, value in sorted(kwargs.items()) if not isinstance(value, AsyncSession))
+    return f'{func.__module__}.{func.__qualname__}({", ".join(parts)})'
+
+
+def singleflight(key: Callable[..., str] | None = None):
+    """
+    Объединять одновременные одинаковые вызовы метода сервиса.
+
+    Подходит для чтения, результат которого не привязан к сессии вызывающего:
+    pydantic схемы, а не ORM объекты. Общий вызов открывает свою сессию из
+    get_read_session_maker вместо сессии первого запроса: отмена первого запроса
+    (и закрытие его сессии в get_db) не ломает вызов остальным. Запрос, закрепленный
+    за primary (read-your-writes), не объединяется с другими и читает в своей сессии.
+
+    E.g. ::
+
+        class PermissionService:
+            @staticmethod
+            @singleflight()
+            async def get_permissions(db: AsyncSession) -> list[PermissionSchema]:
+                ...
+
+    :param key: ключ по аргументам вызова, по умолчанию имя функции и repr аргументов кроме AsyncSession
+    :return:
+    """
+
+    def decorator(func: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> T:
+            session = find_session(args, kwargs)
+            if session is not None and is_pinned_to_primary(session):
+                # Реплика общего вызова может отставать от только что записанного
+                return await func(*args, **kwargs)
+            flight_key = key(*args, **kwargs) if key is not None else _default_key(func, args, kwargs)
+            if session is None:
+                return await single_flight.do(flight_key, lambda: func(*args, **kwargs))
+            return await single_flight.do(flight_key, lambda: call_in_read_session(func, args, kwargs))
+
+        return wrapper
+
+    return decorator